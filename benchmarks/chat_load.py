@@ -0,0 +1,113 @@
+"""
+Load-test the chat API offline against the fake LLM provider.
+
+Runs the Flask app in-process with LLM_PROVIDER=fake and LLM_REPLIES=1, so
+every question is phrased by the (simulated) LLM with realistic latency,
+and drives concurrent sessions through /api/chat in SSE mode. Reports
+throughput and the latency percentiles of the first chunk and of the
+whole turn. Storage goes to a temporary directory; no network or API key
+is needed. The LLM_FAKE_* variables set the latency distribution, error
+rate and chunking (see llm_fake); the response cache is off unless
+LLM_CACHE_ENABLED=1.
+
+Usage:
+    python benchmarks/chat_load.py [--sessions N] [--turns T] [--threads C]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from concurrent import futures
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("LLM_REPLIES", "1")
+# Las conversaciones simuladas se repiten: sin caché cada pregunta llega al LLM
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", FutureWarning)
+    from app import app
+import llm_integration
+import storage
+import triage_stats
+from sqlite_storage import SQLiteBackend
+from triage_stats import TriageStats
+from turn_log import TurnLog
+
+MESSAGES = [
+    "Me siento triste",
+    "Hace dos semanas",
+    "No puedo trabajar",
+    "Sí, muchos cambios",
+    "Duermo mal",
+    "Tengo a mi familia",
+    "Nunca fui a terapia",
+    "No",
+    "No consumo nada",
+    "Salgo a caminar",
+]
+
+def run_session(turns: int):
+    """Run one conversation and return (first chunk, whole turn, completed) per turn."""
+    client = app.test_client()
+    session_id = client.post('/api/start').get_json()["session_id"]
+    timings = []
+    for message in MESSAGES[:turns]:
+        started = time.perf_counter()
+        response = client.post('/api/chat', json={"message": message, "session_id": session_id},
+                               headers={"Accept": "text/event-stream"}, buffered=False)
+        first = None
+        events = []
+        for chunk in response.response:
+            if first is None:
+                first = time.perf_counter() - started
+            events.append(chunk)
+        response.close()
+        timings.append((first, time.perf_counter() - started, b"event: done" in b"".join(events)))
+    return timings
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga del chat con el LLM falso")
+    parser.add_argument("--sessions", type=int, default=50, help="Conversaciones a simular")
+    parser.add_argument("--turns", type=int, default=5, help="Mensajes por conversación")
+    parser.add_argument("--threads", type=int, default=16, help="Conversaciones simultáneas")
+    args = parser.parse_args()
+    
+    tmpdir = tempfile.mkdtemp()
+    storage.set_backend(SQLiteBackend(os.path.join(tmpdir, "conversations.db")))
+    storage.set_turn_log(TurnLog(os.path.join(tmpdir, "turns")))
+    triage_stats.set_stats(TriageStats(os.path.join(tmpdir, "stats.db")))
+    try:
+        started = time.perf_counter()
+        with futures.ThreadPoolExecutor(max_workers=args.threads) as executor:
+            results = list(executor.map(lambda _: run_session(args.turns), range(args.sessions)))
+        elapsed = time.perf_counter() - started
+        
+        turns = [timing for session in results for timing in session]
+        first = [timing[0] for timing in turns]
+        total = [timing[1] for timing in turns]
+        print(f"Proveedor: {llm_integration.LLM_PROVIDER}, {args.sessions} sesiones, "
+              f"{args.threads} simultáneas, {len(turns)} mensajes en {elapsed:.1f}s")
+        print(f"  {'mensajes/s':<28} {len(turns) / elapsed:9.1f}")
+        for label, values in (("primer fragmento", first), ("respuesta completa", total)):
+            print(f"  {label + ' p50/p95 (ms)':<28} {percentile(values, 0.5) * 1000:9.0f} "
+                  f"{percentile(values, 0.95) * 1000:9.0f}")
+        llm = llm_integration.get_metrics()["client"]
+        print(f"  {'mensajes con error':<28} {sum(not timing[2] for timing in turns):9d}")
+        print(f"  {'llamadas al LLM / fallidas':<28} {llm['calls']:9d} {llm['failures']:9d}")
+    finally:
+        llm_integration.close_client()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compare the keyword lexicon with the previous per-keyword loops.
+
+Two measurements, in microseconds per call:
+
+* one message: the risk, follow-up and next-question checks for a single
+  message, with the lexicon cache disabled;
+* one session: every turn of a ten-answer conversation followed by symptom
+  extraction, as ChatBot does it (the old code rescanned every previous
+  answer on each turn).
+
+The lexicon still checks each keyword with `in`, so without its cache a
+single message is not faster than the old loops (it checks the whole
+lexicon, not just the words one call site needs). The session speedup
+comes from the scan cache: each answer is scanned once, not on every turn.
+
+Usage:
+    python benchmarks/keyword_matching.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from keyword_matcher import Lexicon
+from prompts import SYMPTOM_KEYWORDS, TRIAGE_LEXICON
+from chatbot import extract_symptoms
+
+RESPONSES = {
+    "main_concern": "Últimamente me siento muy triste y sola, sin ganas de hacer nada. "
+                    "Tengo miedo de no poder salir de esto y a veces siento pánico.",
+    "duration": "Hace unos tres meses que estoy así, empezó de a poco.",
+    "daily_impact": "Me cuesta concentrarme en el trabajo y evito ver a mis amigos.",
+    "mood_changes": "Sí, paso de estar bien a estar muy mal en el mismo día.",
+    "sleep": "Duermo muy poco, me despierto varias veces y casi no descanso.",
+    "support": "Tengo a mi familia, aunque no les cuento mucho.",
+    "previous_help": "Fui a un psicólogo hace años.",
+    "self_harm": "No, nunca pensé en hacerme daño.",
+    "substance_use": "Tomo alcohol los fines de semana, un poco más que antes.",
+    "coping_mechanisms": "Salgo a caminar y escucho música, eso me calma."
+}
+
+def legacy_extract_symptoms(responses):
+    symptoms = []
+    for response in responses.values():
+        response_lower = response.lower()
+        for keyword, symptom in SYMPTOM_KEYWORDS.items():
+            if keyword in response_lower and symptom not in symptoms:
+                symptoms.append(symptom)
+    if "duration" in responses:
+        if any(term in responses["duration"].lower() for term in ["semana", "mes"]):
+            symptoms.append("persistent_symptoms")
+    if "daily_impact" in responses and "trabajo" in responses["daily_impact"].lower():
+        symptoms.append("work_impact")
+    if "mood_changes" in responses and "sí" in responses["mood_changes"].lower():
+        symptoms.append("mood_changes")
+    if "sleep" in responses:
+        sleep_problems = ["mal", "poco", "mucho", "problema", "no duermo", "casi no", "dificultad"]
+        if any(term in responses["sleep"].lower() for term in sleep_problems):
+            symptoms.append("sleep_changes")
+    if "support" in responses and all(term not in responses["support"].lower() for term in ["sí", "si", "familia", "amigo"]):
+        symptoms.append("lack_of_support")
+    return symptoms
+
+def legacy_message_checks(message, responses):
+    message_lower = message.lower()
+    risk = any(keyword in message_lower for keyword in ["suicid", "morir", "muerte", "daño", "crisis"])
+    next_risk = any(word in str(responses.values()).lower() for word in ["suicid", "morir", "muerte", "daño", "crisis"])
+    acute = any(keyword in message_lower for keyword in ["suicid", "morir", "daño", "muerte"])
+    sleep = "mal" in message_lower and "dorm" in message_lower
+    work = "trabajo" in message_lower or "estudio" in message_lower
+    emotion = any(keyword in message_lower for keyword in ["triste", "ansios", "preocupa", "angustia", "miedo"])
+    return risk, next_risk, acute, sleep, work, emotion
+
+def lexicon_message_checks(lexicon, message, responses):
+    scan = lexicon.scan(message)
+    next_risk = any(lexicon.scan(response).any("risk") for response in responses.values())
+    return (scan.any("risk"), next_risk, scan.any("acute_risk"), scan.all("sleep_complaint"),
+            scan.any("work_or_study"), scan.any("emotion"))
+
+def legacy_session():
+    responses = {}
+    for key, message in RESPONSES.items():
+        responses[key] = message
+        legacy_message_checks(message, responses)
+    return legacy_extract_symptoms(responses)
+
+def lexicon_session(lexicon):
+    responses = {}
+    for key, message in RESPONSES.items():
+        responses[key] = message
+        lexicon_message_checks(lexicon, message, responses)
+    return extract_symptoms(responses)
+
+def bench(label, func, repeat):
+    seconds = min(timeit.repeat(func, number=repeat, repeat=5)) / repeat
+    print(f"  {label:<34} {seconds * 1e6:9.2f} µs")
+    return seconds
+
+def compare(title, legacy, lexicon, repeat):
+    print(title)
+    old = bench("bucles `in`", legacy, repeat)
+    new = bench("léxico", lexicon, repeat)
+    print(f"  {'aceleración':<34} {old / new:9.2f}x")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del buscador de palabras clave")
+    parser.add_argument("--repeat", type=int, default=2000, help="Iteraciones por medición")
+    args = parser.parse_args()
+    
+    message = RESPONSES["main_concern"]
+    uncached = Lexicon(TRIAGE_LEXICON.categories, cache_size=0)
+    assert extract_symptoms(RESPONSES) == legacy_extract_symptoms(RESPONSES)
+    assert lexicon_message_checks(uncached, message, RESPONSES) == legacy_message_checks(message, RESPONSES)
+    assert lexicon_session(TRIAGE_LEXICON) == legacy_session()
+    
+    print(f"Léxico: {len(TRIAGE_LEXICON.matcher.keywords)} palabras")
+    compare("Un mensaje (sin caché)",
+            lambda: legacy_message_checks(message, RESPONSES),
+            lambda: lexicon_message_checks(uncached, message, RESPONSES), args.repeat)
+    compare("Una sesión de 10 respuestas",
+            legacy_session, lambda: lexicon_session(TRIAGE_LEXICON), args.repeat)
+
+if __name__ == "__main__":
+    main()
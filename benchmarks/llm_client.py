@@ -0,0 +1,138 @@
+"""
+Measure the per-call overhead of the LLM client against a local fake Gemini.
+
+Starts an in-process gRPC server that answers GenerateContent immediately,
+so the figures isolate client-side setup and transport costs from model
+latency. Compares:
+
+- a new connection per call against the pooled LLMClient with persistent
+  channels, sequential and from several threads (over a local plaintext
+  channel, so a real TLS handshake would widen the gap),
+- many concurrent calls through AsyncLLMClient on a single thread,
+- the cost of building genai.GenerativeModel on each call, as the original
+  send_prompt did, against the client's own overhead over an in-memory
+  transport.
+
+Usage:
+    python benchmarks/llm_client.py [--calls N] [--threads T] [--concurrent C]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import warnings
+from concurrent import futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import grpc
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", FutureWarning)
+    import google.generativeai as genai
+    from llm_integration import GeminiTransport, LLMClient, AsyncGeminiTransport, AsyncLLMClient
+from google.ai import generativelanguage as glm
+
+PROMPT = "Analiza las respuestas del cuestionario de triage " * 20
+
+def start_fake_gemini():
+    """Start a local gRPC server that imitates Gemini's GenerateContent."""
+    reply = glm.GenerateContentResponse(candidates=[glm.Candidate(
+        content=glm.Content(parts=[glm.Part(text='{"urgency_level": "BAJO"}')], role="model"),
+        finish_reason=glm.Candidate.FinishReason.STOP
+    )])
+    method = grpc.unary_unary_rpc_method_handler(
+        lambda request, context: reply,
+        request_deserializer=glm.GenerateContentRequest.deserialize,
+        response_serializer=glm.GenerateContentResponse.serialize
+    )
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(
+        "google.ai.generativelanguage.v1beta.GenerativeService", {"GenerateContent": method}
+    ),))
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, f"127.0.0.1:{port}"
+
+class MemoryTransport:
+    """Transport that answers without any I/O."""
+    
+    def generate(self, model_name: str, prompt: str, timeout=None) -> str:
+        return '{"urgency_level": "BAJO"}'
+    
+    def close(self) -> None:
+        pass
+
+def per_call(label: str, calls: int, func) -> float:
+    """Run func calls times and print the average time per call."""
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    seconds = (time.perf_counter() - started) / calls
+    print(f"  {label:<44} {seconds * 1e6:9.1f} µs/llamada")
+    return seconds
+
+def threaded(label: str, calls: int, threads: int, func) -> None:
+    """Run func calls times over a thread pool and print the throughput."""
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: func(), range(calls)))
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<44} {calls / elapsed:9.0f} llamadas/s")
+
+async def concurrent_async(target: str, calls: int, max_concurrency: int) -> None:
+    """Issue calls concurrently from one event loop and print the throughput."""
+    def factory():
+        return AsyncGeminiTransport(channels=[grpc.aio.insecure_channel(target) for _ in range(4)])
+    async with AsyncLLMClient(max_concurrency=max_concurrency, transport_factory=factory) as client:
+        await asyncio.gather(*(client.generate(PROMPT) for _ in range(20)))
+        started = time.perf_counter()
+        await asyncio.gather(*(client.generate(PROMPT) for _ in range(calls)))
+        elapsed = time.perf_counter() - started
+    label = f"AsyncLLMClient, {calls} llamadas a la vez"
+    print(f"  {label:<44} {calls / elapsed:9.0f} llamadas/s")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del cliente LLM")
+    parser.add_argument("--calls", type=int, default=500, help="Llamadas por medición")
+    parser.add_argument("--threads", type=int, default=8, help="Hilos para la medición concurrente")
+    parser.add_argument("--concurrent", type=int, default=1000, help="Llamadas asíncronas simultáneas")
+    args = parser.parse_args()
+    
+    server, target = start_fake_gemini()
+    try:
+        def new_connection_per_call():
+            transport = GeminiTransport(channels=[grpc.insecure_channel(target)])
+            try:
+                return transport.generate("gemini-pro", PROMPT)
+            finally:
+                transport.close()
+        
+        pool = [grpc.insecure_channel(target, options=[("grpc.use_local_subchannel_pool", 1)])
+                for _ in range(4)]
+        client = LLMClient(transport_factory=lambda: GeminiTransport(channels=pool)).start()
+        memory = LLMClient(transport_factory=MemoryTransport).start()
+        
+        # Calentamiento de las conexiones del pool
+        for _ in range(20):
+            client.generate(PROMPT)
+        
+        print("Servidor gRPC local (sin latencia del modelo)")
+        fresh = per_call("conexión nueva por llamada", args.calls, new_connection_per_call)
+        pooled = per_call("LLMClient con pool persistente", args.calls, lambda: client.generate(PROMPT))
+        print(f"  {'aceleración':<44} {fresh / pooled:9.1f}x")
+        threaded(f"LLMClient, {args.threads} hilos", args.calls * 4, args.threads,
+                 lambda: client.generate(PROMPT))
+        asyncio.run(concurrent_async(target, args.concurrent, args.concurrent))
+        
+        print("Sobrecarga en el proceso")
+        per_call("genai.GenerativeModel() en cada llamada", args.calls * 10,
+                 lambda: genai.GenerativeModel("gemini-pro"))
+        per_call("LLMClient.generate (transporte en memoria)", args.calls * 10,
+                 lambda: memory.generate(PROMPT))
+        client.close()
+    finally:
+        server.stop(None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure the memory held by each live chat session.
+
+Creates N sessions in a SessionStore, runs the first turns of a triage
+conversation in each and reports the bytes allocated per session with
+tracemalloc. User messages are created once and shared, so the figure
+excludes user text.
+
+Usage:
+    python benchmarks/session_memory.py [--sessions N] [--turns T]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import storage
+from chatbot import ChatBot
+from session_store import SessionStore
+
+MESSAGES = [
+    "Me siento triste",
+    "Hace dos semanas",
+    "No puedo trabajar",
+    "Sí, muchos cambios",
+    "Duermo mal",
+    "Tengo a mi familia",
+    "No",
+    "No",
+    "No"
+]
+
+def measure(sessions: int, turns: int) -> float:
+    """
+    Measure the average bytes allocated per session.
+    
+    Args:
+        sessions (int): Number of sessions to create
+        turns (int): User messages processed in each session
+    
+    Returns:
+        float: Bytes per session
+    """
+    # El log de turnos no forma parte del estado en memoria
+    storage.append_turns = lambda conversation_id, records: True
+    messages = MESSAGES[:turns]
+    store = SessionStore(ChatBot, max_sessions=sessions + 1)
+    
+    def run_session() -> None:
+        session_id, _ = store.create()
+        with store.session(session_id) as chatbot:
+            chatbot.start_conversation()
+            for message in messages:
+                chatbot.process_message(message)
+            chatbot.checkpoint()
+    
+    # Calentar cachés e internados antes de medir
+    run_session()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(sessions):
+        run_session()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return allocated / sessions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memoria por sesión de chat")
+    parser.add_argument("--sessions", type=int, default=10000, help="Sesiones a crear")
+    parser.add_argument("--turns", type=int, default=5, help="Mensajes del usuario por sesión")
+    args = parser.parse_args()
+    
+    per_session = measure(args.sessions, args.turns)
+    print(f"Sesiones: {args.sessions}, turnos: {args.turns}")
+    print(f"Memoria por sesión (sin texto del usuario): {per_session:.0f} bytes")
+
+if __name__ == "__main__":
+    main()
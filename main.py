@@ -1,17 +1,237 @@
 """
 Main entry point for the Mental Health Triage Chatbot.
 """
+import argparse
+import os
+import sys
+from datetime import datetime
+
 from dotenv import load_dotenv
 
+# Project modules are imported as top-level modules from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+def migrate_shards(args: argparse.Namespace) -> None:
+    """
+    Move flat `<id>.json` conversation files into the sharded layout.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    import storage
+    
+    backend = storage.JSONFileBackend(args.directory or storage.CONVERSATIONS_DIR, layout='sharded')
+    migrated = backend.migrate_to_sharded()
+    print(f"Conversaciones migradas: {migrated}")
+
+def compact_archive(args: argparse.Namespace) -> None:
+    """
+    Move conversations older than N days into the compressed segment archive
+    and delete the turn logs of abandoned conversations.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    import storage
+    
+    archived = storage.compact_archive(args.days)
+    stats = storage.get_archive().stats()
+    print(f"Conversaciones archivadas: {archived}")
+    print(f"Archivo: {stats['conversations']} conversaciones en {stats['segments']} segmentos ({stats['bytes']} bytes)")
+    swept = storage.sweep_turn_logs(args.turn_log_days * 24 * 3600)
+    print(f"Logs de turnos abandonados eliminados: {swept}")
+
+def iso_date(value: str) -> str:
+    """
+    Validate and normalize an ISO date argument.
+    
+    Args:
+        value (str): Date or datetime in ISO format
+    
+    Returns:
+        str: Normalized ISO datetime, comparable with stored timestamps
+    """
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha inválida: {value}")
+
+def export_conversations(args: argparse.Namespace) -> None:
+    """
+    Stream conversations as NDJSON to a file, optionally gzip-compressed.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    import storage
+    import conversation_export
+    
+    filters = storage.SummaryFilter(
+        urgency_level=args.urgency,
+        date_from=args.date_from,
+        date_to=args.date_to
+    )
+    if args.resume and args.gzip:
+        sys.exit("--resume solo admite exportaciones sin comprimir; use --after con el último cursor")
+    
+    after = args.after
+    mode = 'wb'
+    if args.resume and os.path.exists(args.output):
+        # Continue after the last complete line, dropping a truncated tail
+        after, valid_bytes = conversation_export.last_exported_cursor(args.output)
+        with open(args.output, 'r+b') as f:
+            f.truncate(valid_bytes)
+        mode = 'ab'
+    
+    with open(args.output, mode) as f:
+        count, cursor = conversation_export.write_export(
+            f, after=after, filters=None if filters.is_empty() else filters, compress=args.gzip
+        )
+    print(f"Conversaciones exportadas: {count}")
+    if cursor:
+        print(f"Último cursor: {cursor}")
+
+def rebuild_stats(args: argparse.Namespace) -> None:
+    """
+    Recompute the triage statistics from every stored and archived conversation.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    import triage_stats
+    
+    processed = triage_stats.rebuild_from_storage()
+    print(f"Estadísticas recalculadas con {processed} conversaciones")
+
+def batch_triage(args: argparse.Namespace) -> None:
+    """
+    Score a JSONL file of intake responses with the rule-based pipeline.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    import time
+    import batch_triage as batch
+    
+    started = time.monotonic()
+    input_file = sys.stdin.buffer if args.input == "-" else open(args.input, 'rb')
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, 'wb')
+    try:
+        totals = batch.run_batch(input_file, output, workers=args.workers, chunk_lines=args.chunk_size)
+    finally:
+        if input_file is not sys.stdin.buffer:
+            input_file.close()
+        if output is not sys.stdout.buffer:
+            output.close()
+    elapsed = time.monotonic() - started
+    # Summary on stderr so that stdout can carry the NDJSON output
+    rate = totals["processed"] / elapsed * 60 if elapsed else 0
+    print(f"Cuestionarios analizados: {totals['processed']} ({totals['errors']} con error) "
+          f"en {elapsed:.1f}s, {rate:.0f} por minuto", file=sys.stderr)
+
+def replay_conversations(args: argparse.Namespace) -> None:
+    """
+    Re-run every stored conversation through the current rules and report the differences.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+    """
+    import json
+    import replay
+    
+    report = replay.replay_storage(workers=args.workers, chunk_size=args.chunk_size,
+                                   sample_limit=args.samples)
+    print(replay.format_report(report))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Reporte completo guardado en {args.report}")
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command line parser.
+    
+    Returns:
+        argparse.ArgumentParser: Parser with one subcommand per maintenance task
+    """
+    parser = argparse.ArgumentParser(description="Mental Health Triage Chatbot")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    migrate = subparsers.add_parser(
+        "migrate-shards",
+        help="Reubica los archivos de conversaciones en subdirectorios por prefijo de ID"
+    )
+    migrate.add_argument("--directory", help="Directorio de conversaciones (por defecto data/conversations)")
+    migrate.set_defaults(handler=migrate_shards)
+    
+    compact = subparsers.add_parser(
+        "compact",
+        help="Mueve las conversaciones antiguas al archivo comprimido"
+    )
+    compact.add_argument("--days", type=int, default=30, help="Antigüedad mínima en días (por defecto 30)")
+    compact.add_argument("--turn-log-days", type=float, default=1,
+                         help="Antigüedad de los logs de turnos abandonados a eliminar (por defecto 1)")
+    compact.set_defaults(handler=compact_archive)
+    
+    export = subparsers.add_parser(
+        "export",
+        help="Exporta las conversaciones completas como NDJSON"
+    )
+    export.add_argument("--output", required=True, help="Archivo de destino")
+    export.add_argument("--gzip", action="store_true", help="Comprimir la salida con gzip")
+    export.add_argument("--urgency", choices=["ALTO", "MEDIO", "BAJO"], help="Filtrar por nivel de urgencia")
+    export.add_argument("--from", dest="date_from", type=iso_date, help="Fecha mínima (ISO, inclusiva)")
+    export.add_argument("--to", dest="date_to", type=iso_date, help="Fecha máxima (ISO, exclusiva)")
+    resume = export.add_mutually_exclusive_group()
+    resume.add_argument("--after", help="Cursor desde el que continuar")
+    resume.add_argument("--resume", action="store_true",
+                        help="Continuar una exportación sin comprimir interrumpida en --output")
+    export.set_defaults(handler=export_conversations)
+    
+    stats = subparsers.add_parser(
+        "rebuild-stats",
+        help="Recalcula las estadísticas de triage desde todas las conversaciones"
+    )
+    stats.set_defaults(handler=rebuild_stats)
+    
+    triage = subparsers.add_parser(
+        "triage",
+        help="Analiza por reglas un archivo JSONL de cuestionarios y escribe NDJSON"
+    )
+    triage.add_argument("--input", required=True, help="Archivo JSONL de respuestas ('-' para stdin)")
+    triage.add_argument("--output", default="-", help="Archivo NDJSON de salida ('-' para stdout, por defecto)")
+    triage.add_argument("--workers", type=int, help="Procesos en paralelo (por defecto uno por CPU)")
+    triage.add_argument("--chunk-size", type=int, default=2000, help="Líneas por bloque enviado a cada proceso")
+    triage.set_defaults(handler=batch_triage)
+    
+    replay = subparsers.add_parser(
+        "replay",
+        help="Reanaliza las conversaciones guardadas con las reglas actuales y resume los cambios"
+    )
+    replay.add_argument("--workers", type=int, help="Procesos en paralelo (por defecto uno por CPU)")
+    replay.add_argument("--chunk-size", type=int, default=1000, help="Conversaciones por bloque enviado a cada proceso")
+    replay.add_argument("--samples", type=int, default=20, help="Ejemplos de conversaciones con cambios (por defecto 20)")
+    replay.add_argument("--report", help="Archivo JSON donde guardar el reporte completo")
+    replay.set_defaults(handler=replay_conversations)
+    
+    return parser
+
 def main():
     """
-    Main function to run the Mental Health Triage Chatbot.
+    Run the maintenance subcommand given on the command line.
+    
+    Without a subcommand, print the usage and exit with status 2.
     """
     # Load environment variables
     load_dotenv()
     
-    # TODO: Initialize and run the chatbot
-    pass
+    parser = build_parser()
+    args = parser.parse_args()
+    if not getattr(args, "handler", None):
+        # The chatbot itself is served by the web app (src/app.py)
+        parser.print_help()
+        sys.exit(2)
+    args.handler(args)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,140 @@
+"""
+Module for the content-addressed cache of rule-based analyses.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from prompts import SYMPTOM_WEIGHTS, DIAGNOSTIC_CRITERIA, URGENCY_CRITERIA, TRIAGE_LEXICON
+
+# Cantidad máxima de análisis recordados
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '10000'))
+
+def rules_version(*tables: Any) -> str:
+    """
+    Calcula la versión de un conjunto de tablas de reglas.
+    
+    Args:
+        *tables (Any): Tablas serializables como JSON
+    
+    Returns:
+        str: Hash del contenido canónico de las tablas
+    """
+    canonical = json.dumps(tables, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+# Versión de las reglas con las que se compilaron el léxico y el motor de
+# puntuación: cambia con cualquier palabra clave, peso, umbral o criterio
+RULES_VERSION = rules_version(SYMPTOM_WEIGHTS, DIAGNOSTIC_CRITERIA, URGENCY_CRITERIA, TRIAGE_LEXICON.categories)
+
+def normalize_responses(responses: Dict[str, str]) -> List[Tuple[str, str]]:
+    """
+    Normaliza las respuestas para compararlas por contenido.
+    
+    Las reglas comparan en minúsculas y ninguna palabra clave empieza ni
+    termina en espacio, así que se ignoran las mayúsculas y los espacios de
+    los extremos. El orden de las respuestas se conserva porque determina el
+    orden de los síntomas (y los motivos principales) del análisis.
+    
+    Args:
+        responses (Dict[str, str]): Respuestas por ID de pregunta
+    
+    Returns:
+        List[Tuple[str, str]]: Pares (ID, texto normalizado) en orden
+    """
+    return [(key, value.strip().lower()) for key, value in responses.items()]
+
+def analysis_key(responses: Dict[str, str], version: str = RULES_VERSION) -> Tuple[str, str]:
+    """
+    Calcula la clave de caché de un análisis.
+    
+    Args:
+        responses (Dict[str, str]): Respuestas por ID de pregunta
+        version (str): Versión de las reglas
+    
+    Returns:
+        Tuple[str, str]: Versión de las reglas y hash de las respuestas normalizadas
+    """
+    # Los separadores son caracteres de control que los mensajes no admiten
+    # (ver INVALID_CHARS_PATTERN en chatbot)
+    canonical = "\x1e".join(f"{key}\x1f{value}" for key, value in normalize_responses(responses))
+    return version, hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+class AnalysisCache:
+    """
+    Caché LRU de análisis por contenido de las respuestas.
+    
+    La versión de las reglas forma parte de la clave: cuando cambian las
+    tablas, los análisis anteriores dejan de coincidir y salen de la caché
+    por antigüedad. Los valores retornados son compartidos y no deben
+    modificarse.
+    """
+    
+    def __init__(self, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Obtiene un análisis en caché.
+        
+        Args:
+            key (Hashable): Clave calculada con analysis_key
+        
+        Returns:
+            Optional[Any]: Valor guardado o None si no está
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Guarda un análisis, desalojando el usado hace más tiempo si hace falta.
+        
+        Args:
+            key (Hashable): Clave calculada con analysis_key
+            value (Any): Análisis a guardar
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """Vacía la caché."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Retorna los contadores de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "rules_version": RULES_VERSION
+            }
+
+# Caché compartida por todas las sesiones del proceso
+ANALYSIS_CACHE = AnalysisCache()
@@ -1,13 +1,21 @@
 """
 Aplicación Flask para el sistema de triage en salud mental.
 """
-from flask import Flask, request, jsonify, render_template, url_for
+from flask import Flask, Response, request, jsonify, render_template, url_for
+from contextlib import ExitStack
 from datetime import datetime
+from typing import Optional
+import atexit
 import json
 import logging
 
-from chatbot import ChatBot
+from chatbot import ChatBot, LLM_REPLIES
 import storage
+import conversation_export
+import triage_stats
+import llm_integration
+from session_store import SessionStore, SessionNotFoundError
+from analysis_cache import ANALYSIS_CACHE
 
 # Configurar logging
 logging.basicConfig(
@@ -17,7 +25,73 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-chatbot = ChatBot()
+
+def discard_abandoned(chatbot: ChatBot) -> None:
+    """Elimina el log de turnos de una sesión que expiró sin terminar."""
+    if chatbot.conversation_id is not None:
+        storage.discard_turns(chatbot.conversation_id)
+
+sessions = SessionStore(ChatBot, on_evict=discard_abandoned)
+triage_stats.enable()
+
+def start_llm_client(llm_replies: Optional[bool] = None) -> None:
+    """
+    Abre la conexión con el LLM al iniciar la aplicación, si redacta las
+    preguntas, y la cierra al terminar el proceso.
+    
+    Args:
+        llm_replies (Optional[bool]): Preguntas redactadas por el LLM (por defecto LLM_REPLIES)
+    """
+    if not (LLM_REPLIES if llm_replies is None else llm_replies):
+        return
+    atexit.register(llm_integration.close_client)
+    try:
+        llm_integration.start_client()
+    except Exception as e:
+        # La primera pregunta vuelve a intentarlo y, si falla, usa la pregunta fija
+        logger.error(f"Error al iniciar el cliente del LLM: {str(e)}")
+
+start_llm_client()
+
+# Paginación del historial
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+URGENCY_LEVELS = ("ALTO", "MEDIO", "BAJO")
+
+def parse_history_filters(args) -> storage.SummaryFilter:
+    """
+    Construye los filtros del historial a partir de los parámetros de la URL.
+    
+    Args:
+        args: Parámetros (`urgency_level`, `from`, `to`, `main_concern`)
+        
+    Returns:
+        storage.SummaryFilter: Filtros normalizados
+        
+    Raises:
+        ValueError: Si la urgencia o las fechas no son válidas
+    """
+    urgency_level = args.get('urgency_level') or None
+    if urgency_level is not None:
+        urgency_level = urgency_level.upper()
+        if urgency_level not in URGENCY_LEVELS:
+            raise ValueError(f"Nivel de urgencia inválido: {urgency_level}")
+    
+    # Las fechas se normalizan a ISO para compararlas con los timestamps guardados
+    date_from = args.get('from') or None
+    date_to = args.get('to') or None
+    if date_from is not None:
+        date_from = datetime.fromisoformat(date_from).isoformat()
+    if date_to is not None:
+        date_to = datetime.fromisoformat(date_to).isoformat()
+    
+    main_concern = (args.get('main_concern') or '').strip() or None
+    return storage.SummaryFilter(
+        urgency_level=urgency_level,
+        date_from=date_from,
+        date_to=date_to,
+        main_concern=main_concern
+    )
 
 @app.route('/')
 def index():
@@ -36,11 +110,15 @@ def history():
 
 @app.route('/api/start', methods=['POST'])
 def start_conversation():
-    """Inicia una nueva conversación."""
+    """Inicia una nueva conversación y retorna el ID de su sesión."""
     try:
-        initial_message = chatbot.start_conversation()
+        session_id, chatbot = sessions.create()
+        with sessions.session(session_id):
+            initial_message = chatbot.start_conversation()
+            chatbot.checkpoint()
         return jsonify({
             "message": initial_message,
+            "session_id": session_id,
             "status": "success"
         })
     except Exception as e:
@@ -50,19 +128,97 @@ def start_conversation():
             "status": "error"
         }), 500
 
+def wants_event_stream(data: dict) -> bool:
+    """Indica si /api/chat debe responder con Server-Sent Events."""
+    if data.get('stream'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'text/event-stream'])
+    return best == 'text/event-stream'
+
+def format_event(event: str, data: dict) -> str:
+    """Serializa un evento de Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_chat(session_id: str, chatbot: ChatBot, message: str, stack: ExitStack):
+    """
+    Genera los eventos de una respuesta de /api/chat en streaming.
+    
+    Emite un evento `chunk` por cada fragmento del mensaje y termina con
+    `done`, que lleva la misma respuesta que el modo JSON, o con `error`.
+    
+    Args:
+        session_id (str): ID de la sesión
+        chatbot (ChatBot): Estado de la sesión, con su lock tomado
+        message (str): Mensaje del usuario
+        stack (ExitStack): Libera el lock de la sesión al terminar
+    """
+    try:
+        for event, data in chatbot.stream_message(message):
+            if event == "chunk":
+                yield format_event("chunk", {"text": data})
+                continue
+            
+            # Checkpoint del turno; al terminar se guarda el documento completo
+            chatbot.checkpoint()
+            if "analysis" in data:
+                storage.finalize_conversation(chatbot.to_document())
+                sessions.discard(session_id)
+            yield format_event("done", data)
+    except Exception as e:
+        logger.error(f"Error al procesar mensaje: {str(e)}")
+        yield format_event("error", {"error": "Error al procesar el mensaje", "status": "error"})
+    finally:
+        stack.close()
+
 @app.route('/api/chat', methods=['POST'])
 def chat_message():
-    """Procesa los mensajes del chat."""
+    """
+    Procesa un mensaje de la sesión indicada en `session_id`.
+    
+    Con `"stream": true` o `Accept: text/event-stream` la respuesta se
+    envía como Server-Sent Events (ver stream_chat).
+    """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         if not data or 'message' not in data:
             return jsonify({
                 "error": "Mensaje no proporcionado",
                 "status": "error"
             }), 400
+        session_id = data.get('session_id')
+        if not session_id:
+            return jsonify({
+                "error": "Sesión no proporcionada",
+                "status": "error"
+            }), 400
 
-        response = chatbot.process_message(data['message'])
+        if wants_event_stream(data):
+            # El lock de la sesión se toma antes de responder (una sesión
+            # inexistente sigue siendo un 404) y se libera al cerrar el stream
+            stack = ExitStack()
+            chatbot = stack.enter_context(sessions.session(session_id))
+            response = Response(
+                stream_chat(session_id, chatbot, data['message'], stack),
+                mimetype='text/event-stream',
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+            response.call_on_close(stack.close)
+            return response
+        
+        with sessions.session(session_id) as chatbot:
+            response = chatbot.process_message(data['message'])
+            
+            # Checkpoint del turno; al terminar se guarda el documento completo
+            chatbot.checkpoint()
+            if "analysis" in response:
+                storage.finalize_conversation(chatbot.to_document())
+                sessions.discard(session_id)
         return jsonify(response)
+    except SessionNotFoundError:
+        return jsonify({
+            "error": "Sesión no encontrada o expirada",
+            "status": "error"
+        }), 404
     except Exception as e:
         logger.error(f"Error al procesar mensaje: {str(e)}")
         return jsonify({
@@ -72,22 +228,43 @@ def chat_message():
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Obtiene el historial de conversaciones."""
+    """
+    Obtiene una página del historial de conversaciones.
+    
+    Parámetros: `limit`, `after` (cursor) y los filtros opcionales
+    `urgency_level`, `from`, `to` y `main_concern`.
+    """
     try:
-        conversations = storage.get_conversation_history()
-        formatted_conversations = []
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+            after = request.args.get('after')
+            if after:
+                storage.decode_cursor(after)
+            filters = parse_history_filters(request.args)
+        except ValueError:
+            return jsonify({
+                "error": "Parámetros del historial inválidos",
+                "status": "error"
+            }), 400
         
-        for conv in conversations:
-            formatted_conv = {
-                "id": conv["metadata"]["conversation_id"],
-                "date": conv["metadata"]["timestamp"],
-                "main_concern": conv["conversation"]["responses"].get("main_concern", ""),
-                "urgency_level": conv["conversation"]["analysis"].get("urgency_level", "BAJO") if conv["conversation"].get("analysis") else "BAJO"
+        # Se pide un resumen extra para saber si existe una página siguiente
+        summaries = list(storage.iter_conversation_summaries(
+            after=after, limit=limit + 1, filters=None if filters.is_empty() else filters
+        ))
+        page = summaries[:limit]
+        formatted_conversations = [
+            {
+                "id": summary["id"],
+                "date": summary["timestamp"],
+                "main_concern": summary["main_concern"],
+                "urgency_level": summary["urgency_level"]
             }
-            formatted_conversations.append(formatted_conv)
+            for summary in page
+        ]
         
         return jsonify({
             "conversations": formatted_conversations,
+            "next_cursor": storage.encode_cursor(page[-1]) if len(summaries) > limit else None,
             "status": "success"
         })
     except Exception as e:
@@ -97,6 +274,71 @@ def get_history():
             "status": "error"
         }), 500
 
+@app.route('/api/export', methods=['GET'])
+def export_conversations():
+    """
+    Exporta las conversaciones completas como NDJSON en streaming.
+    
+    Acepta los filtros del historial, `after` para retomar una descarga
+    cortada desde el cursor de la última línea recibida y `gzip=1` para
+    comprimir la respuesta.
+    """
+    try:
+        after = request.args.get('after')
+        if after:
+            storage.decode_cursor(after)
+        filters = parse_history_filters(request.args)
+    except ValueError:
+        return jsonify({
+            "error": "Parámetros de exportación inválidos",
+            "status": "error"
+        }), 400
+    
+    lines = conversation_export.iter_ndjson(after=after, filters=None if filters.is_empty() else filters)
+    if request.args.get('gzip') == '1':
+        return Response(
+            conversation_export.iter_gzip(lines),
+            mimetype='application/gzip',
+            headers={"Content-Disposition": "attachment; filename=conversations.ndjson.gz"}
+        )
+    return Response(
+        lines,
+        mimetype='application/x-ndjson',
+        headers={"Content-Disposition": "attachment; filename=conversations.ndjson"}
+    )
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """
+    Obtiene las estadísticas de triage (`?from=&to=&granularity=day|month|year`).
+    
+    Se leen de contadores agregados por día que se actualizan en cada guardado.
+    """
+    try:
+        try:
+            filters = parse_history_filters(request.args)
+            granularity = request.args.get('granularity', 'day')
+            if granularity not in triage_stats.GRANULARITIES:
+                raise ValueError(f"Granularidad inválida: {granularity}")
+        except ValueError:
+            return jsonify({
+                "error": "Parámetros de estadísticas inválidos",
+                "status": "error"
+            }), 400
+        
+        stats = triage_stats.get_stats().query(
+            date_from=filters.date_from,
+            date_to=filters.date_to,
+            granularity=granularity
+        )
+        return jsonify({"stats": stats, "status": "success"})
+    except Exception as e:
+        logger.error(f"Error al obtener estadísticas: {str(e)}")
+        return jsonify({
+            "error": "Error al obtener las estadísticas",
+            "status": "error"
+        }), 500
+
 @app.route('/api/conversation/<conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
     """Obtiene una conversación específica por ID."""
@@ -149,6 +391,18 @@ def generate_report(conversation_id):
             "status": "error"
         }), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Retorna métricas internas del almacenamiento, las sesiones y el LLM."""
+    return jsonify({
+        "conversation_cache": storage.get_cache_stats(),
+        "write_queue": storage.get_write_queue_stats(),
+        "sessions": sessions.stats(),
+        "analysis_cache": ANALYSIS_CACHE.stats(),
+        "llm": llm_integration.get_metrics(),
+        "status": "success"
+    })
+
 @app.errorhandler(404)
 def not_found_error(error):
     """Maneja errores 404."""
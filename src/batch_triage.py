@@ -0,0 +1,171 @@
+"""
+Module for offline rule-based triage of intake questionnaires in bulk.
+"""
+import os
+import json
+from multiprocessing import Pool
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from symptom_state import SymptomState
+from chatbot import rule_based_analyses
+
+# Líneas por bloque enviado a cada proceso: amortiza el costo de comunicación
+BATCH_CHUNK_LINES = int(os.getenv('BATCH_CHUNK_LINES', '2000'))
+
+def parse_record(record: Dict) -> Tuple[Dict[str, str], Optional[object]]:
+    """
+    Obtiene las respuestas y el ID opcional de un cuestionario.
+    
+    El registro puede ser directamente el diccionario de respuestas o un
+    objeto con la clave "responses" y, opcionalmente, un "id" que se copia
+    al resultado.
+    
+    Args:
+        record (Dict): Cuestionario de entrada
+    
+    Returns:
+        Tuple[Dict[str, str], Optional[object]]: Respuestas e ID
+    
+    Raises:
+        ValueError: Si las respuestas no son un diccionario de textos
+    """
+    responses = record.get("responses", record) if isinstance(record, dict) else None
+    if not isinstance(responses, dict) or not all(isinstance(value, str) for value in responses.values()):
+        raise ValueError("Las respuestas deben ser un objeto con textos")
+    return responses, (record.get("id") if responses is not record else None)
+
+def triage_records(records: List[Dict]) -> List[Dict]:
+    """
+    Analiza cuestionarios con las reglas del chatbot, sin llamar al LLM.
+    
+    Todo el lote se puntúa con una sola pasada del motor vectorizado.
+    
+    Args:
+        records (List[Dict]): Cuestionarios válidos (ver parse_record)
+    
+    Returns:
+        List[Dict]: Síntomas y análisis (con el formato de rule_based_analysis)
+    
+    Raises:
+        ValueError: Si algún cuestionario no es válido
+    """
+    parsed = [parse_record(record) for record in records]
+    states = [SymptomState.from_responses(responses) for responses, _ in parsed]
+    results = []
+    for (_, record_id), state, analysis in zip(parsed, states, rule_based_analyses(states)):
+        result = {"symptoms": state.symptoms, "analysis": analysis}
+        if record_id is not None:
+            result = {"id": record_id, **result}
+        results.append(result)
+    return results
+
+def triage_record(record: Dict) -> Dict:
+    """
+    Analiza un único cuestionario (ver triage_records).
+    
+    Args:
+        record (Dict): Cuestionario de entrada
+    
+    Returns:
+        Dict: Síntomas y análisis
+    """
+    return triage_records([record])[0]
+
+def score_chunk(chunk: Tuple[int, List[bytes]]) -> Tuple[bytes, int, int]:
+    """
+    Procesa un bloque de líneas JSONL y lo serializa como NDJSON.
+    
+    Se ejecuta en los procesos del pool: recibe y devuelve bytes para que el
+    intercambio con el proceso principal sea barato. Las líneas válidas del
+    bloque se puntúan juntas.
+    
+    Args:
+        chunk (Tuple[int, List[bytes]]): Número de la primera línea y líneas del bloque
+    
+    Returns:
+        Tuple[bytes, int, int]: Salida NDJSON, registros analizados y con error
+    """
+    first_line, lines = chunk
+    output: List[Optional[Dict]] = []
+    valid: List[Tuple[int, Dict]] = []
+    errors = 0
+    for offset, line in enumerate(lines):
+        if not line.strip():
+            continue
+        line_number = first_line + offset
+        try:
+            record = json.loads(line)
+            parse_record(record)
+        except ValueError as e:
+            # json.JSONDecodeError es un ValueError
+            output.append({"line": line_number, "error": str(e)})
+            errors += 1
+            continue
+        valid.append((len(output), record))
+        output.append({"line": line_number})
+    
+    for (position, _), result in zip(valid, triage_records([record for _, record in valid])):
+        output[position].update(result)
+    if not output:
+        return b"", 0, 0
+    data = "\n".join(json.dumps(result, ensure_ascii=False) for result in output) + "\n"
+    return data.encode('utf-8'), len(valid), errors
+
+def iter_chunks(lines: BinaryIO, chunk_lines: int = BATCH_CHUNK_LINES) -> Iterator[Tuple[int, List[bytes]]]:
+    """
+    Agrupa las líneas de la entrada en bloques numerados desde 1.
+    
+    Args:
+        lines (BinaryIO): Archivo JSONL abierto en modo binario
+        chunk_lines (int): Líneas por bloque
+    
+    Returns:
+        Iterator[Tuple[int, List[bytes]]]: Número de la primera línea y líneas
+    """
+    chunk: List[bytes] = []
+    first_line = 1
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_lines:
+            yield first_line, chunk
+            first_line += len(chunk)
+            chunk = []
+    if chunk:
+        yield first_line, chunk
+
+def run_batch(input_file: BinaryIO, output: BinaryIO, workers: Optional[int] = None,
+              chunk_lines: int = BATCH_CHUNK_LINES) -> Dict[str, int]:
+    """
+    Analiza un archivo JSONL de cuestionarios y escribe los resultados como NDJSON.
+    
+    La salida conserva el orden de la entrada; cada línea lleva el número de
+    línea de origen, y las líneas inválidas producen un registro con "error"
+    en lugar de detener el lote. La entrada se lee por bloques, así que la
+    memoria no depende del tamaño del archivo.
+    
+    Args:
+        input_file (BinaryIO): Entrada JSONL en modo binario
+        output (BinaryIO): Salida en modo binario
+        workers (Optional[int]): Procesos del pool (por defecto, uno por CPU;
+            1 procesa en el proceso actual)
+        chunk_lines (int): Líneas por bloque
+    
+    Returns:
+        Dict[str, int]: Registros analizados y con error
+    """
+    workers = workers or os.cpu_count() or 1
+    totals = {"processed": 0, "errors": 0}
+    chunks = iter_chunks(input_file, chunk_lines)
+    
+    def write(results) -> None:
+        for data, processed, errors in results:
+            output.write(data)
+            totals["processed"] += processed
+            totals["errors"] += errors
+    
+    if workers == 1:
+        write(map(score_chunk, chunks))
+    else:
+        with Pool(processes=workers) as pool:
+            write(pool.imap(score_chunk, chunks))
+    return totals
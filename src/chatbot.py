@@ -1,25 +1,30 @@
 """
 Module for the ChatBot implementation that handles the conversation flow.
 """
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Iterator, Optional, List, Sequence, Tuple
 import json
+import os
 from datetime import datetime
 import logging
 import re
+import uuid
 
 from prompts import (
     get_conversation_prompt,
+    get_reply_prompt,
     format_analysis_prompt,
-    calculate_urgency_level,
-    validate_diagnosis,
-    SYMPTOM_WEIGHTS,
-    DIAGNOSTIC_CRITERIA,
-    REQUIRED_TOPICS
+    REQUIRED_TOPICS,
+    TRIAGE_LEXICON
 )
+from symptom_state import SymptomState
+from question_flow import QUESTION_FLOW
+from scoring_engine import SCORING_ENGINE
+from analysis_cache import ANALYSIS_CACHE, analysis_key
 from diagnosis_parser import (
     parse_llm_response,
     format_json_response,
     format_diagnosis,
+    copy_analysis,
     AnalysisResult
 )
 import storage
@@ -38,6 +43,57 @@ QUESTION_MAP = {
     "coping_mechanisms": "¿Qué haces cuando te sientes así? ¿Qué te ayuda?"
 }
 
+# Mensajes fijos del chatbot
+INITIAL_MESSAGE = ("Hola, soy un asistente especializado en salud mental. "
+                   "Estoy aquí para escucharte y ayudarte. ¿Podrías contarme "
+                   "qué te trae por aquí hoy?")
+CLOSING_MESSAGE = ("Gracias por compartir todo esto conmigo. Con la información que me has dado, "
+                   "puedo preparar un análisis de la situación y recomendaciones específicas. "
+                   "¿Hay algo más que quieras agregar antes de proceder con el análisis?")
+
+# Toda pregunta del flujo configurado debe tener su texto
+_unknown_questions = set(QUESTION_FLOW.sequence) - set(QUESTION_MAP)
+if _unknown_questions:
+    raise ValueError(f"Preguntas del flujo sin texto en QUESTION_MAP: {sorted(_unknown_questions)}")
+
+# Un bit por tema requerido: los temas cubiertos se guardan en un entero
+TOPIC_BITS = {topic: 1 << index for index, topic in enumerate(REQUIRED_TOPICS)}
+
+# Mensajes del bot referenciados por índice en el historial de cada sesión,
+# en lugar de guardar una tupla con el texto en cada turno
+BOT_MESSAGES: List[Tuple[str, str]] = (
+    [("SYSTEM", INITIAL_MESSAGE)]
+    + [("ASSISTANT", question) for question in QUESTION_MAP.values()]
+    + [("ASSISTANT", CLOSING_MESSAGE)]
+)
+BOT_MESSAGE_IDS = {turn: index for index, turn in enumerate(BOT_MESSAGES)}
+
+def encode_turn(role: str, message: str):
+    """
+    Codifica un turno del historial en su forma compacta.
+    
+    Los mensajes del usuario se guardan como el propio texto, los mensajes
+    fijos del bot como su índice en BOT_MESSAGES y cualquier otro como tupla.
+    
+    Args:
+        role (str): "SYSTEM", "ASSISTANT" o "USER"
+        message (str): Texto del mensaje
+    
+    Returns:
+        Union[str, int, Tuple[str, str]]: Turno codificado
+    """
+    if role == "USER":
+        return message
+    return BOT_MESSAGE_IDS.get((role, message), (role, message))
+
+def decode_turn(turn) -> Tuple[str, str]:
+    """Decodifica un turno de encode_turn a la tupla (rol, mensaje)."""
+    if turn.__class__ is str:
+        return ("USER", turn)
+    if turn.__class__ is int:
+        return BOT_MESSAGES[turn]
+    return turn
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -45,10 +101,99 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Recomendaciones según el nivel de urgencia
+URGENCY_RECOMMENDATIONS = {
+    "ALTO": (
+        "Buscar ayuda profesional inmediata - contactar servicios de emergencia",
+        "No permanecer solo/a - contactar a un familiar o amigo de confianza"
+    ),
+    "MEDIO": (
+        "Programar consulta profesional en los próximos días",
+        "Mantener contacto regular con red de apoyo"
+    ),
+    "BAJO": (
+        "Programar una evaluación profesional cuando sea conveniente",
+        "Mantener registro de síntomas y su frecuencia"
+    )
+}
+
 # Constantes para validación
 MAX_MESSAGE_LENGTH = 1000
 INVALID_CHARS_PATTERN = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
 
+# Redactar con el LLM las preguntas del cuestionario (LLM_REPLIES=1). Si el
+# LLM no responde se usa el texto fijo de QUESTION_MAP.
+LLM_REPLIES = os.getenv('LLM_REPLIES', '0') == '1'
+
+def extract_symptoms(responses: Dict[str, str]) -> list:
+    """
+    Extrae síntomas de las respuestas del usuario.
+    
+    Args:
+        responses (Dict[str, str]): Respuestas del usuario
+    
+    Returns:
+        list: Lista de síntomas identificados
+    """
+    return SymptomState.from_responses(responses).symptoms
+
+def rule_based_analyses(states: Sequence[SymptomState]) -> List[Dict]:
+    """
+    Genera el análisis por reglas de varias conversaciones a la vez.
+    
+    La urgencia y los diagnósticos de todo el lote salen de una sola
+    puntuación vectorizada con SCORING_ENGINE. Lo usan tanto el chatbot al
+    cerrar la conversación como el triage por lotes, así que ambos producen
+    el mismo resultado.
+    
+    Args:
+        states (Sequence[SymptomState]): Síntomas y factores de cada conversación
+    
+    Returns:
+        List[Dict]: Análisis con el formato que valida parse_llm_response
+    """
+    symptom_sets = [state.symptoms for state in states]
+    scores = SCORING_ENGINE.score(symptom_sets)
+    analyses = []
+    for row, (state, symptoms) in enumerate(zip(states, symptom_sets)):
+        urgency_level = scores.urgency_level(row)
+        
+        # Identificar factores de riesgo
+        risk_factors = []
+        if "self_harm" in symptoms or "suicidal_ideation" in symptoms:
+            risk_factors.append("Riesgo de autolesión o ideación suicida")
+        if "substance_use" in symptoms:
+            risk_factors.append("Uso problemático de sustancias")
+        if "isolation" in symptoms:
+            risk_factors.append("Aislamiento social significativo")
+        
+        # Identificar factores protectores
+        protective_factors = []
+        if state.protective_support:
+            protective_factors.append("Red de apoyo social disponible")
+        
+        analyses.append({
+            "urgency_level": urgency_level,
+            "main_concerns": [s.replace("_", " ").title() for s in symptoms[:3]],
+            "preliminary_diagnoses": scores.diagnoses(row, symptoms),
+            "risk_factors": risk_factors,
+            "protective_factors": protective_factors,
+            "recommendations": list(URGENCY_RECOMMENDATIONS[urgency_level])
+        })
+    return analyses
+
+def rule_based_analysis(state: SymptomState) -> Dict:
+    """
+    Genera el análisis por reglas de una conversación.
+    
+    Args:
+        state (SymptomState): Síntomas, urgencia y factores de la conversación
+    
+    Returns:
+        Dict: Análisis con el formato que valida parse_llm_response
+    """
+    return rule_based_analyses([state])[0]
+
 class ChatBotError(Exception):
     """Clase base para excepciones del chatbot."""
     pass
@@ -70,14 +215,113 @@ class ChatBot:
     Clase que maneja la conversación con el usuario y la interacción con el LLM.
     """
     
+    # Sin __dict__ por instancia: con miles de sesiones en memoria el estado
+    # fijo de cada una ocupa pocos cientos de bytes
+    __slots__ = (
+        "responses",
+        "conversation_active",
+        "conversation_id",
+        "analysis",
+        "_turns",
+        "_topic_mask",
+        "_started_at",
+        "_logged_turns",
+        "_logged_values",
+        "_logged_extra",
+        "_logged_analysis",
+        "_symptom_state",
+        "_state_responses",
+        "_current_question",
+        "_answered_mask"
+    )
+    
     def __init__(self):
         """Inicializa el chatbot."""
         self.responses: Dict[str, str] = {}
         self.conversation_active = False
         self.conversation_id: Optional[str] = None
         self.analysis: Optional[AnalysisResult] = None
-        self.chat_history: List[Tuple[str, str]] = []  # [(user_message, bot_response), ...]
-        self.covered_topics: Dict[str, bool] = {topic: False for topic in REQUIRED_TOPICS}
+        # Historial compacto: ver encode_turn
+        self._turns: list = []
+        self._topic_mask = 0
+        self._started_at: Optional[float] = None
+        # Estado del log de turnos: qué parte de la conversación ya se persistió.
+        # _logged_values sigue el orden de REQUIRED_TOPICS; otras claves van a _logged_extra.
+        self._logged_turns = 0
+        self._logged_values: Tuple = ()
+        self._logged_extra: Optional[Dict[str, str]] = None
+        self._logged_analysis = False
+        # Síntomas, riesgo y urgencia actualizados con cada respuesta, y las
+        # respuestas que el estado ya tiene en cuenta
+        self._symptom_state = SymptomState()
+        self._state_responses: Dict[str, str] = {}
+        # Posición en QUESTION_FLOW: pregunta pendiente de respuesta (None si
+        # el último mensaje del bot no es una pregunta del flujo) y máscara
+        # de preguntas respondidas
+        self._current_question: Optional[str] = None
+        self._answered_mask = 0
+    
+    @property
+    def chat_history(self) -> List[Tuple[str, str]]:
+        """Historial de la conversación como lista de tuplas (rol, mensaje)."""
+        return [decode_turn(turn) for turn in self._turns]
+    
+    @property
+    def covered_topics(self) -> Dict[str, bool]:
+        """Temas cubiertos, derivados de la máscara de bits."""
+        return {topic: bool(self._topic_mask & bit) for topic, bit in TOPIC_BITS.items()}
+    
+    @property
+    def started_at(self) -> Optional[str]:
+        """Fecha de inicio de la conversación en formato ISO."""
+        if self._started_at is None:
+            return None
+        return datetime.fromtimestamp(self._started_at).isoformat()
+    
+    @property
+    def urgency_level(self) -> str:
+        """Nivel de urgencia según las respuestas recibidas hasta ahora."""
+        return self._current_symptom_state().urgency_level
+    
+    def _current_symptom_state(self) -> SymptomState:
+        """
+        Retorna el estado de síntomas de las respuestas actuales.
+        
+        El estado se actualiza en _set_response; si self.responses se
+        reemplazó o modificó por fuera (aunque sea con la misma cantidad de
+        respuestas), se recalcula desde cero.
+        """
+        if self._state_responses != self.responses:
+            self._symptom_state = SymptomState.from_responses(self.responses)
+            self._state_responses = dict(self.responses)
+        return self._symptom_state
+    
+    def _set_response(self, key: str, message: str) -> None:
+        """
+        Registra la respuesta a una pregunta y actualiza el estado de síntomas.
+        
+        Args:
+            key (str): ID de la pregunta
+            message (str): Respuesta del usuario
+        """
+        # Reemplazar una respuesta puede quitar síntomas, y un estado que no
+        # refleja las respuestas actuales no se puede actualizar: se recalcula todo
+        rebuild = key in self.responses or self._state_responses != self.responses
+        self.responses[key] = message
+        self._cover_topic(key)
+        self._answered_mask |= QUESTION_FLOW.bits.get(key, 0)
+        if rebuild:
+            self._symptom_state = SymptomState.from_responses(self.responses)
+            self._state_responses = dict(self.responses)
+        else:
+            self._symptom_state.add_response(key, message)
+            self._state_responses[key] = message
+    
+    def _cover_topic(self, topic: str) -> None:
+        self._topic_mask |= TOPIC_BITS.get(topic, 0)
+    
+    def _is_topic_covered(self, topic: str) -> bool:
+        return bool(self._topic_mask & TOPIC_BITS.get(topic, 0))
     
     def start_conversation(self) -> str:
         """
@@ -90,15 +334,18 @@ class ChatBot:
         self.conversation_active = True
         self.conversation_id = None
         self.analysis = None
-        self.chat_history = []
-        self.covered_topics = {topic: False for topic in REQUIRED_TOPICS}
-        
-        initial_message = ("Hola, soy un asistente especializado en salud mental. "
-                         "Estoy aquí para escucharte y ayudarte. ¿Podrías contarme "
-                         "qué te trae por aquí hoy?")
-        
-        self.chat_history.append(("SYSTEM", initial_message))
-        return initial_message
+        self._turns = [BOT_MESSAGE_IDS[("SYSTEM", INITIAL_MESSAGE)]]
+        self._topic_mask = 0
+        self._started_at = datetime.now().timestamp()
+        self._logged_turns = 0
+        self._logged_values = ()
+        self._logged_extra = None
+        self._logged_analysis = False
+        self._symptom_state = SymptomState()
+        self._state_responses = {}
+        self._current_question = None
+        self._answered_mask = 0
+        return INITIAL_MESSAGE
     
     def process_message(self, user_message: str) -> Dict:
         """
@@ -125,61 +372,39 @@ class ChatBot:
                 return {"message": "La conversación no está activa. Por favor, inicia una nueva conversación."}
             
             # Guardar el mensaje del usuario en el historial
-            self.chat_history.append(("USER", user_message))
+            self._turns.append(user_message)
             
-            # Buscar la última pregunta del bot
-            last_question = None
-            last_question_id = None
-            for i in range(len(self.chat_history) - 2, -1, -1):
-                if self.chat_history[i][0] == "ASSISTANT":
-                    last_question = self.chat_history[i][1]
-                    # Encontrar el ID de la pregunta
-                    for q_id, q_text in QUESTION_MAP.items():
-                        if q_text in last_question:
-                            last_question_id = q_id
-                            break
-                    break
+            # Pregunta que responde este mensaje, según el estado del flujo
+            last_question_id = self._current_question
             
             # Si es la primera respuesta o no encontramos la pregunta anterior
             if not self.responses or not last_question_id:
-                self.responses["main_concern"] = user_message
-                self.covered_topics["main_concern"] = True
+                self._set_response("main_concern", user_message)
             else:
                 # Actualizar respuestas solo si encontramos la pregunta correspondiente
                 if last_question_id and last_question_id not in self.responses:
-                    self.responses[last_question_id] = user_message
-                    self.covered_topics[last_question_id] = True
+                    self._set_response(last_question_id, user_message)
             
             # Si es una respuesta con señales de riesgo, marcar self_harm
-            message_lower = user_message.lower()
-            risk_keywords = ["suicid", "morir", "muerte", "daño", "crisis"]
-            if any(keyword in message_lower for keyword in risk_keywords) and "self_harm" not in self.responses:
-                self.responses["self_harm"] = user_message
-                self.covered_topics["self_harm"] = True
+            if TRIAGE_LEXICON.scan(user_message).any("risk") and "self_harm" not in self.responses:
+                self._set_response("self_harm", user_message)
             
             # Obtener la siguiente pregunta
             next_question_id = self._get_next_question()
             
+            # El flujo nunca elige una pregunta ya respondida, así que no se
+            # repite la anterior
             if next_question_id:
                 next_question = QUESTION_MAP[next_question_id]
-                # Verificar que no estamos repitiendo la última pregunta
-                if last_question and last_question == next_question:
-                    # Si la pregunta se repetiría, buscar la siguiente
-                    for q_id in QUESTION_MAP:
-                        if q_id not in self.responses and q_id != next_question_id:
-                            next_question_id = q_id
-                            next_question = QUESTION_MAP[q_id]
-                            break
-                
-                # Si aún tenemos una pregunta válida, enviarla
-                if next_question_id and next_question_id not in self.responses:
-                    self.chat_history.append(("ASSISTANT", next_question))
-                    return {"message": next_question}
+                self._turns.append(encode_turn("ASSISTANT", next_question))
+                self._current_question = next_question_id
+                return {"message": next_question, "urgency_level": self.urgency_level}
             
-            # Si no hay más preguntas o no encontramos una válida, proceder con el análisis
+            # Si no hay más preguntas, proceder con el análisis
             final_message = self._prepare_for_analysis()
             analysis = self._analyze_responses()
-            self.chat_history.append(("ASSISTANT", final_message))
+            self._turns.append(encode_turn("ASSISTANT", final_message))
+            self._current_question = None
             self.analysis = analysis  # Guardar el análisis en el objeto
             return {
                 "message": final_message,
@@ -189,44 +414,69 @@ class ChatBot:
             logger.error(f"Error al procesar mensaje: {str(e)}")
             return {"error": "Error interno al procesar el mensaje"}
     
+    def stream_message(self, user_message: str, llm_replies: Optional[bool] = None) -> Iterator[Tuple[str, object]]:
+        """
+        Procesa el mensaje del usuario entregando la respuesta a medida que se genera.
+        
+        Con llm_replies la siguiente pregunta del cuestionario la redacta el
+        LLM y cada fragmento se entrega apenas llega. Sin LLM, o si falla antes
+        de enviar texto, se entrega el mensaje fijo en un solo fragmento.
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            llm_replies (Optional[bool]): Redactar la pregunta con el LLM (por defecto LLM_REPLIES)
+        
+        Yields:
+            Tuple[str, object]: ("chunk", texto) por cada fragmento y al final
+                ("done", respuesta), con la misma respuesta que process_message
+        """
+        response = self.process_message(user_message)
+        question = response.get("message")
+        if llm_replies is None:
+            llm_replies = LLM_REPLIES
+        
+        # Solo se redactan las preguntas del flujo, no el cierre con el análisis
+        if llm_replies and question and "urgency_level" in response:
+            chunks = []
+            try:
+                for chunk in self._stream_llm_reply(user_message, question):
+                    chunks.append(chunk)
+                    yield "chunk", chunk
+            except Exception as e:
+                logger.warning(f"No se pudo redactar la respuesta con el LLM: {str(e)}")
+                if chunks:
+                    # La respuesta quedó cortada: se completa con la pregunta fija
+                    chunks.append(f"\n\n{question}")
+                    yield "chunk", chunks[-1]
+            if not chunks:
+                chunks.append(question)
+                yield "chunk", question
+            response["message"] = "".join(chunks)
+            self._turns[-1] = encode_turn("ASSISTANT", response["message"])
+        elif question:
+            yield "chunk", question
+        
+        yield "done", response
+    
+    def _stream_llm_reply(self, user_message: str, question: str) -> Iterator[str]:
+        """Pide al LLM la siguiente pregunta redactada y retorna sus fragmentos."""
+        # Importación diferida: el SDK del LLM solo se carga si se usa
+        import llm_integration
+        
+        prompt = get_reply_prompt(
+            user_message, self.chat_history[:-2], self.covered_topics, self.responses, question
+        )
+        return llm_integration.send_prompt(prompt, stream=True)
+    
     def _get_next_question(self) -> Optional[str]:
         """
-        Determina la siguiente pregunta basada en las respuestas y temas cubiertos.
+        Determina la siguiente pregunta según QUESTION_FLOW.
         
         Returns:
             Optional[str]: ID de la siguiente pregunta o None si no hay más
         """
-        # Lista de preguntas en orden
-        question_sequence = [
-            "main_concern",
-            "duration",
-            "daily_impact",
-            "mood_changes",
-            "sleep",
-            "support",
-            "previous_help",
-            "self_harm",
-            "substance_use",
-            "coping_mechanisms"
-        ]
-        
-        # Si no hay respuestas, comenzar con la primera pregunta
-        if not self.responses:
-            return question_sequence[0]
-        
-        # Priorizar preguntas de seguridad si hay indicadores de riesgo y no se ha preguntado aún
-        if ("self_harm" not in self.responses and
-            any(risk_word in str(self.responses.values()).lower() 
-                for risk_word in ["suicid", "morir", "muerte", "daño", "crisis"])):
-            return "self_harm"
-        
-        # Encontrar la siguiente pregunta no respondida
-        for question in question_sequence:
-            if question not in self.responses:
-                return question
-        
-        # Si todas las preguntas han sido respondidas
-        return None
+        signals = ("risk",) if self._current_symptom_state().risk else ()
+        return QUESTION_FLOW.next_question(self._answered_mask, signals)
     
     def _generate_follow_up_question(self, user_message: str) -> str:
         """
@@ -239,28 +489,26 @@ class ChatBot:
             str: Pregunta de seguimiento
         """
         # Analizar el mensaje para identificar temas mencionados
-        message_lower = user_message.lower()
+        scan = TRIAGE_LEXICON.scan(user_message)
         
         # Verificar si hay señales de riesgo que requieran atención inmediata
-        risk_keywords = ["suicid", "morir", "daño", "muerte"]
-        if any(keyword in message_lower for keyword in risk_keywords) and not self.covered_topics["self_harm"]:
-            self.covered_topics["self_harm"] = True
+        if scan.any("acute_risk") and not self._is_topic_covered("self_harm"):
+            self._cover_topic("self_harm")
             return ("Me preocupa lo que me cuentas. ¿Podrías decirme más sobre estos pensamientos? "
                    "Es importante que sepas que hay ayuda disponible y personas que se preocupan por ti.")
         
         # Priorizar temas no cubiertos basados en el contexto
-        if "mal" in message_lower and "dorm" in message_lower and not self.covered_topics["sleep"]:
-            self.covered_topics["sleep"] = True
+        if scan.all("sleep_complaint") and not self._is_topic_covered("sleep"):
+            self._cover_topic("sleep")
             return "¿Hace cuánto tiempo que tienes dificultades con el sueño? ¿Cómo afecta esto tu día a día?"
         
-        if ("trabajo" in message_lower or "estudio" in message_lower) and not self.covered_topics["daily_impact"]:
-            self.covered_topics["daily_impact"] = True
+        if scan.any("work_or_study") and not self._is_topic_covered("daily_impact"):
+            self._cover_topic("daily_impact")
             return "¿Cómo está afectando esta situación tu desempeño en el trabajo/estudio? ¿Has notado cambios significativos?"
         
         # Si se mencionan emociones, indagar más
-        emotion_keywords = ["triste", "ansios", "preocupa", "angustia", "miedo"]
-        if any(keyword in message_lower for keyword in emotion_keywords) and not self.covered_topics["mood_changes"]:
-            self.covered_topics["mood_changes"] = True
+        if scan.any("emotion") and not self._is_topic_covered("mood_changes"):
+            self._cover_topic("mood_changes")
             return "¿Podrías contarme más sobre estos sentimientos? ¿Hace cuánto tiempo te sientes así?"
         
         # Buscar el primer tema no cubierto
@@ -282,8 +530,8 @@ class ChatBot:
             str: Pregunta formulada naturalmente
         """
         # Verificar si la pregunta ya está en el historial
-        for _, message in self.chat_history:
-            if message in QUESTION_MAP.values():
+        for turn in self._turns:
+            if decode_turn(turn)[1] in QUESTION_MAP.values():
                 # Si la pregunta ya se hizo, usar una variante
                 if topic == "main_concern":
                     return "¿Podrías decirme más sobre lo que te preocupa?"
@@ -316,22 +564,10 @@ class ChatBot:
         Args:
             user_message (str): Mensaje del usuario
         """
-        # Identificar el tema más probable basado en el último intercambio
-        last_bot_message = None
-        for i in range(len(self.chat_history) - 2, -1, -1):
-            if self.chat_history[i][0] == "ASSISTANT":
-                last_bot_message = self.chat_history[i][1]
-                break
-        
-        if not last_bot_message:
-            return
-            
-        # Buscar a qué pregunta corresponde la respuesta
-        for topic, question in QUESTION_MAP.items():
-            if question in last_bot_message and topic not in self.responses:
-                self.responses[topic] = user_message
-                self.covered_topics[topic] = True
-                break
+        # La pregunta pendiente se sigue en el estado del flujo
+        topic = self._current_question
+        if topic and topic not in self.responses:
+            self._set_response(topic, user_message)
     
     def _is_response_relevant_to_topic(self, question: str, answer: str, topic: str) -> bool:
         """
@@ -345,22 +581,9 @@ class ChatBot:
         Returns:
             bool: True si la respuesta es relevante para el tema
         """
-        # Implementar lógica de relevancia basada en palabras clave y contexto
-        topic_keywords = {
-            "main_concern": ["preocupa", "problema", "motivo", "razón"],
-            "duration": ["tiempo", "desde", "hace", "cuando"],
-            "daily_impact": ["afecta", "impacto", "trabajo", "estudio", "relaciones"],
-            "mood_changes": ["ánimo", "cambios", "sientes", "emociones"],
-            "sleep": ["dormir", "sueño", "descanso", "insomnio"],
-            "support": ["apoyo", "familia", "amigos", "cerca"],
-            "previous_help": ["ayuda", "profesional", "terapeuta", "psicólogo"],
-            "self_harm": ["daño", "morir", "suicid", "lastimar"],
-            "substance_use": ["alcohol", "drogas", "sustancias", "consumo"],
-            "coping_mechanisms": ["ayuda", "calma", "mejora", "alivio"]
-        }
-        
-        keywords = topic_keywords.get(topic, [])
-        return any(keyword in question.lower() or keyword in answer.lower() for keyword in keywords)
+        # Palabras clave por tema definidas en TOPIC_KEYWORDS
+        category = f"topic:{topic}"
+        return TRIAGE_LEXICON.scan(question).any(category) or TRIAGE_LEXICON.scan(answer).any(category)
     
     def _prepare_for_analysis(self) -> str:
         """
@@ -369,9 +592,7 @@ class ChatBot:
         Returns:
             str: Mensaje de cierre
         """
-        return ("Gracias por compartir todo esto conmigo. Con la información que me has dado, "
-                "puedo preparar un análisis de la situación y recomendaciones específicas. "
-                "¿Hay algo más que quieras agregar antes de proceder con el análisis?")
+        return CLOSING_MESSAGE
     
     def _extract_symptoms(self, responses: Dict[str, str]) -> list:
         """
@@ -383,62 +604,7 @@ class ChatBot:
         Returns:
             list: Lista de síntomas identificados
         """
-        symptoms = []
-        
-        # Mapeo de palabras clave a síntomas
-        keyword_mapping = {
-            "triste": "depressed_mood",
-            "deprimid": "depressed_mood",
-            "sin esperanza": "hopelessness",
-            "sin ganas": "loss_of_interest",
-            "ansios": "excessive_worry",
-            "preocupad": "excessive_worry",
-            "dormir": "sleep_changes",
-            "duerm": "sleep_changes",
-            "insomnio": "sleep_changes",
-            "cansad": "fatigue",
-            "sin energía": "energy_loss",
-            "sol": "isolation",
-            "aislad": "isolation",
-            "miedo": "fear",
-            "pánico": "panic_attacks",
-            "daño": "self_harm",
-            "morir": "suicidal_ideation",
-            "suicid": "suicidal_ideation",
-            "concentr": "concentration_problems",
-            "trabajar": "work_impact",
-            "relacion": "relationship_impact"
-        }
-        
-        # Buscar palabras clave en las respuestas
-        for response in responses.values():
-            response_lower = response.lower()
-            for keyword, symptom in keyword_mapping.items():
-                if keyword in response_lower and symptom not in symptoms:
-                    symptoms.append(symptom)
-        
-        # Análisis específico por tipo de pregunta
-        if "duration" in responses:
-            duration = responses["duration"].lower()
-            if any(term in duration for term in ["semana", "mes"]):
-                symptoms.append("persistent_symptoms")
-        
-        if "daily_impact" in responses and "trabajo" in responses["daily_impact"].lower():
-            symptoms.append("work_impact")
-            
-        if "mood_changes" in responses and "sí" in responses["mood_changes"].lower():
-            symptoms.append("mood_changes")
-            
-        if "sleep" in responses:
-            sleep_response = responses["sleep"].lower()
-            sleep_problems = ["mal", "poco", "mucho", "problema", "no duermo", "casi no", "dificultad"]
-            if any(term in sleep_response for term in sleep_problems):
-                symptoms.append("sleep_changes")
-            
-        if "support" in responses and all(term not in responses["support"].lower() for term in ["sí", "si", "familia", "amigo"]):
-            symptoms.append("lack_of_support")
-        
-        return symptoms
+        return extract_symptoms(responses)
     
     def _analyze_responses(self) -> Dict:
         """
@@ -452,71 +618,21 @@ class ChatBot:
             TimeoutError: Si el análisis toma demasiado tiempo
         """
         try:
-            # Extraer síntomas de las respuestas
-            symptoms = self._extract_symptoms(self.responses)
-            
-            # Calcular nivel de urgencia
-            urgency_level = calculate_urgency_level(symptoms, SYMPTOM_WEIGHTS)
-            
-            # Identificar posibles diagnósticos
-            preliminary_diagnoses = []
-            for condition, criteria in DIAGNOSTIC_CRITERIA.items():
-                if validate_diagnosis(symptoms, criteria):
-                    # Calcular confianza basada en la cantidad de síntomas presentes
-                    required_symptoms = criteria.get("required_symptoms", [])
-                    additional_symptoms = criteria.get("additional_symptoms", [])
-                    total_possible = len(required_symptoms) + len(additional_symptoms)
-                    matched_symptoms = [s for s in symptoms if s in required_symptoms + additional_symptoms]
-                    confidence = len(matched_symptoms) / total_possible * 100
-                    
-                    preliminary_diagnoses.append({
-                        "condition": condition,
-                        "confidence": confidence,
-                        "key_indicators": matched_symptoms
-                    })
-            
-            # Identificar factores de riesgo
-            risk_factors = []
-            if "self_harm" in symptoms or "suicidal_ideation" in symptoms:
-                risk_factors.append("Riesgo de autolesión o ideación suicida")
-            if "substance_use" in symptoms:
-                risk_factors.append("Uso problemático de sustancias")
-            if "isolation" in symptoms:
-                risk_factors.append("Aislamiento social significativo")
-            
-            # Identificar factores protectores
-            protective_factors = []
-            if "support" in self.responses:
-                response = self.responses["support"].lower()
-                if "sí" in response or "si" in response or "familia" in response or "amigos" in response:
-                    protective_factors.append("Red de apoyo social disponible")
-            
-            # Generar recomendaciones
-            recommendations = []
-            if urgency_level == "ALTO":
-                recommendations.append("Buscar ayuda profesional inmediata - contactar servicios de emergencia")
-                recommendations.append("No permanecer solo/a - contactar a un familiar o amigo de confianza")
-            elif urgency_level == "MEDIO":
-                recommendations.append("Programar consulta profesional en los próximos días")
-                recommendations.append("Mantener contacto regular con red de apoyo")
-            else:
-                recommendations.append("Programar una evaluación profesional cuando sea conveniente")
-                recommendations.append("Mantener registro de síntomas y su frecuencia")
-            
-            # Crear el análisis en formato JSON
-            analysis_json = {
-                "urgency_level": urgency_level,
-                "main_concerns": [s.replace("_", " ").title() for s in symptoms[:3]],
-                "preliminary_diagnoses": preliminary_diagnoses,
-                "risk_factors": risk_factors,
-                "protective_factors": protective_factors,
-                "recommendations": recommendations
-            }
+            # Respuestas idénticas con las mismas reglas dan el mismo análisis
+            key = analysis_key(self.responses)
+            analysis = ANALYSIS_CACHE.get(key)
+            if analysis is None:
+                analysis_json = rule_based_analysis(self._current_symptom_state())
+                
+                # Parsear y validar el análisis
+                analysis = parse_llm_response(json.dumps(analysis_json))
+                if not analysis:
+                    raise AnalysisError("Error al parsear el análisis")
+                ANALYSIS_CACHE.put(key, analysis)
             
-            # Parsear y validar el análisis
-            self.analysis = parse_llm_response(json.dumps(analysis_json))
-            if not self.analysis:
-                raise AnalysisError("Error al parsear el análisis")
+            # El análisis en caché es compartido entre sesiones: cada una
+            # recibe su propia copia
+            self.analysis = copy_analysis(analysis)
             
             # Retornar el análisis en formato JSON para la API
             return format_json_response(self.analysis)
@@ -525,6 +641,83 @@ class ChatBot:
             logger.error(f"Error en el análisis de respuestas: {str(e)}")
             raise AnalysisError(f"Error al analizar las respuestas: {str(e)}")
     
+    def checkpoint(self) -> bool:
+        """
+        Persiste en el log de turnos lo ocurrido desde el último checkpoint.
+        
+        Solo se escriben los turnos, respuestas y análisis nuevos, por lo que el
+        costo es proporcional al último intercambio y no al largo de la
+        conversación.
+        
+        Returns:
+            bool: True si los registros quedaron en disco
+        """
+        records = []
+        if self.conversation_id is None:
+            self.conversation_id = str(uuid.uuid4())
+            records.append({
+                "type": "meta",
+                "conversation_id": self.conversation_id,
+                "timestamp": self.started_at or datetime.now().isoformat(),
+                "version": "1.0"
+            })
+        
+        for turn in self._turns[self._logged_turns:]:
+            role, message = decode_turn(turn)
+            records.append({"type": "turn", "role": role, "message": message})
+        
+        changed_responses = {
+            key: value for key, value in self.responses.items()
+            if self._logged_response(key) != value
+        }
+        for key, value in changed_responses.items():
+            records.append({"type": "response", "key": key, "value": value})
+        
+        analysis = self.analysis if isinstance(self.analysis, dict) else None
+        if analysis is not None and not self._logged_analysis:
+            records.append({"type": "analysis", "analysis": analysis})
+        
+        if not storage.append_turns(self.conversation_id, records):
+            return False
+        self._logged_turns = len(self._turns)
+        if changed_responses:
+            self._logged_values = tuple(self.responses.get(topic) for topic in REQUIRED_TOPICS)
+            extra = {key: value for key, value in self.responses.items() if key not in TOPIC_BITS}
+            self._logged_extra = extra or None
+        self._logged_analysis = analysis is not None
+        return True
+    
+    def _logged_response(self, key: str) -> Optional[str]:
+        """Valor de una respuesta tal como quedó en el log de turnos."""
+        if key in TOPIC_BITS:
+            index = REQUIRED_TOPICS.index(key)
+            return self._logged_values[index] if index < len(self._logged_values) else None
+        return self._logged_extra.get(key) if self._logged_extra else None
+    
+    def to_document(self) -> Dict:
+        """
+        Construye el documento completo de la conversación para almacenarlo.
+        
+        Returns:
+            Dict: Documento con la estructura de almacenamiento
+        """
+        if self.conversation_id is None:
+            self.conversation_id = str(uuid.uuid4())
+        conversation = {
+            "responses": dict(self.responses),
+            "chat_history": [{"role": role, "message": message} for role, message in self.chat_history]
+        }
+        if isinstance(self.analysis, dict):
+            conversation["analysis"] = self.analysis
+        return {
+            "metadata": {
+                "conversation_id": self.conversation_id,
+                "timestamp": self.started_at or datetime.now().isoformat(),
+                "version": "1.0"
+            },
+            "conversation": conversation
+        }
+    
     def run_conversation(self) -> Optional[Dict]:
         """
         Ejecuta el análisis final de la conversación.
@@ -563,7 +756,12 @@ class ChatBot:
             conversation_data = storage.load_conversation(conversation_id)
             if conversation_data:
                 self.conversation_id = conversation_id
-                self.responses = conversation_data["conversation"]["responses"]
+                # Copia: el documento cargado puede estar compartido con la caché de storage
+                self.responses = dict(conversation_data["conversation"]["responses"])
+                self._symptom_state = SymptomState.from_responses(self.responses)
+                self._state_responses = dict(self.responses)
+                self._answered_mask = QUESTION_FLOW.mask_of(self.responses)
+                self._current_question = None
                 
                 # Parsear el análisis guardado
                 analysis_json = conversation_data["conversation"].get("analysis")
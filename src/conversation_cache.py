@@ -0,0 +1,108 @@
+"""
+Module for the in-process LRU cache of parsed conversations.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+class ConversationCache:
+    """
+    Caché LRU de conversaciones ya parseadas, acotada por tamaño en bytes.
+    
+    Cada entrada guarda el etag del almacenamiento (p.ej. inode, mtime y tamaño
+    del archivo) con el que fue leída; una lectura con un etag distinto se
+    considera un fallo y la entrada se descarta. Así la caché sigue siendo
+    correcta cuando otros procesos escriben en el mismo directorio.
+    
+    El tamaño de cada entrada se contabiliza como el tamaño serializado del
+    documento. Los diccionarios retornados son compartidos y no deben
+    modificarse.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, conversation_id: str, etag: Hashable) -> Optional[Dict]:
+        """
+        Obtiene una conversación si está en caché con el mismo etag.
+        
+        Args:
+            conversation_id (str): ID de la conversación
+            etag (Hashable): Versión actual en el almacenamiento
+        
+        Returns:
+            Optional[Dict]: Conversación en caché o None si hay que leerla
+        """
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            cached_etag, conversation, size = entry
+            if cached_etag != etag:
+                self._remove(conversation_id)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return conversation
+    
+    def put(self, conversation_id: str, etag: Hashable, conversation: Dict, size: int) -> None:
+        """
+        Guarda una conversación en caché, desalojando las menos usadas si hace falta.
+        
+        Args:
+            conversation_id (str): ID de la conversación
+            etag (Hashable): Versión leída del almacenamiento
+            conversation (Dict): Conversación parseada
+            size (int): Tamaño serializado en bytes
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+            self._entries[conversation_id] = (etag, conversation, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+    
+    def invalidate(self, conversation_id: str) -> None:
+        """Descarta la entrada de una conversación, si existe."""
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+                self.invalidations += 1
+    
+    def clear(self) -> None:
+        """Vacía la caché sin reiniciar los contadores."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict:
+        """Retorna los contadores y la ocupación actual de la caché."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+    
+    def _remove(self, conversation_id: str) -> None:
+        _, _, size = self._entries.pop(conversation_id)
+        self._bytes -= size
@@ -0,0 +1,147 @@
+"""
+Module for streaming bulk exports of conversations as NDJSON.
+"""
+import os
+import json
+import zlib
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+import storage
+from storage import SummaryFilter
+
+# Tamaño aproximado de cada bloque comprimido entregado al cliente
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def export_record(cursor: str, conversation: Dict) -> bytes:
+    """
+    Serializa una conversación como una línea NDJSON.
+    
+    Cada línea lleva el cursor de la conversación: si la descarga se corta,
+    se retoma pasando como `after` el cursor de la última línea completa.
+    
+    Args:
+        cursor (str): Cursor de la conversación en el historial
+        conversation (Dict): Documento completo (respuestas, chat y análisis)
+    
+    Returns:
+        bytes: Línea JSON terminada en salto de línea
+    """
+    return json.dumps({"cursor": cursor, "conversation": conversation}, ensure_ascii=False).encode('utf-8') + b"\n"
+
+def iter_ndjson(after: Optional[str] = None,
+                filters: Optional[SummaryFilter] = None) -> Iterator[bytes]:
+    """
+    Genera las líneas NDJSON de la exportación en el orden del historial.
+    
+    Args:
+        after (Optional[str]): Cursor desde el que continuar
+        filters (Optional[SummaryFilter]): Filtros por urgencia, fecha y motivo
+    
+    Returns:
+        Iterator[bytes]: Una línea por conversación
+    
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    for cursor, conversation in storage.iter_conversation_documents(after=after, filters=filters):
+        yield export_record(cursor, conversation)
+
+def iter_gzip(lines: Iterator[bytes], chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Comprime un flujo de líneas en formato gzip sin acumularlo en memoria.
+    
+    Cada bloque termina con un Z_SYNC_FLUSH, así que lo recibido antes de un
+    corte se puede descomprimir hasta la última línea completa.
+    
+    Args:
+        lines (Iterator[bytes]): Líneas a comprimir
+        chunk_bytes (int): Bytes sin comprimir por bloque
+    
+    Returns:
+        Iterator[bytes]: Bloques del archivo gzip
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = 0
+    for line in lines:
+        data = compressor.compress(line)
+        pending += len(line)
+        if pending >= chunk_bytes:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
+
+def write_export(output: BinaryIO, after: Optional[str] = None,
+                 filters: Optional[SummaryFilter] = None,
+                 compress: bool = False) -> Tuple[int, Optional[str]]:
+    """
+    Escribe la exportación en un archivo abierto en modo binario.
+    
+    Args:
+        output (BinaryIO): Archivo de destino
+        after (Optional[str]): Cursor desde el que continuar
+        filters (Optional[SummaryFilter]): Filtros por urgencia, fecha y motivo
+        compress (bool): Comprimir con gzip
+    
+    Returns:
+        Tuple[int, Optional[str]]: Conversaciones exportadas y cursor de la última
+    
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    state = {"count": 0, "cursor": after}
+    
+    def lines() -> Iterator[bytes]:
+        for cursor, conversation in storage.iter_conversation_documents(after=after, filters=filters):
+            yield export_record(cursor, conversation)
+            state["count"] += 1
+            state["cursor"] = cursor
+    
+    for chunk in (iter_gzip(lines()) if compress else lines()):
+        output.write(chunk)
+    return state["count"], state["cursor"]
+
+def last_exported_cursor(path: str, block_bytes: int = EXPORT_CHUNK_BYTES) -> Tuple[Optional[str], int]:
+    """
+    Busca el cursor de la última línea completa de una exportación NDJSON sin comprimir.
+    
+    Lee el archivo por bloques desde el final, así que el costo depende del
+    largo de las últimas líneas y no del tamaño de la exportación. Una línea
+    final incompleta o que no es JSON válido se descarta.
+    
+    Args:
+        path (str): Archivo de una exportación interrumpida
+        block_bytes (int): Bytes leídos por cada paso hacia atrás
+    
+    Returns:
+        Tuple[Optional[str], int]: Cursor (None si no hay líneas completas) y
+            cantidad de bytes válidos, para truncar una línea final incompleta
+    """
+    with open(path, 'rb') as f:
+        # `data` contiene los bytes del archivo desde `position` hasta el final
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        # Fin (relativo a `data`) de la última línea completa aún no descartada
+        limit: Optional[int] = None
+        while True:
+            if limit is None and b"\n" in data:
+                limit = data.rfind(b"\n") + 1
+            if limit is not None:
+                start = data.rfind(b"\n", 0, limit - 1) + 1
+                if start > 0 or position == 0:
+                    try:
+                        return json.loads(data[start:limit])["cursor"], position + limit
+                    except (ValueError, KeyError):
+                        if start == 0:
+                            return None, 0
+                        limit = start
+                        continue
+            if position == 0:
+                return None, 0
+            read = min(block_bytes, position)
+            position -= read
+            f.seek(position)
+            data = f.read(read) + data
+            if limit is not None:
+                limit += read
@@ -3,7 +3,7 @@ Module for parsing and formatting diagnosis responses from the LLM.
 """
 import json
 from typing import Dict, List, Union, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime
 
 @dataclass
@@ -26,6 +26,27 @@ class AnalysisResult:
     recommendations: List[str]
     timestamp: datetime = datetime.now()
 
+def copy_analysis(analysis: AnalysisResult) -> AnalysisResult:
+    """
+    Copia un análisis sin compartir sus listas con el original.
+    
+    Args:
+        analysis (AnalysisResult): Análisis a copiar
+    
+    Returns:
+        AnalysisResult: Copia que puede modificarse sin afectar al original
+    """
+    return replace(
+        analysis,
+        main_concerns=list(analysis.main_concerns),
+        preliminary_diagnoses=[
+            replace(d, key_indicators=list(d.key_indicators)) for d in analysis.preliminary_diagnoses
+        ],
+        risk_factors=list(analysis.risk_factors),
+        protective_factors=list(analysis.protective_factors),
+        recommendations=list(analysis.recommendations)
+    )
+
 def validate_urgency_level(level: str) -> bool:
     """
     Valida que el nivel de urgencia sea válido.
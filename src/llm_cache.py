@@ -0,0 +1,353 @@
+"""
+Module for the content-addressed cache of LLM responses.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import storage
+
+# Usar la caché en los clientes por defecto (LLM_CACHE_ENABLED=0 la desactiva);
+# con el proveedor falso viene apagada, para que cada llamada simule su latencia
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '0' if os.getenv('LLM_PROVIDER') == 'fake' else '1') == '1'
+
+# Respuestas recordadas en memoria
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000'))
+
+# Base de datos del nivel en disco (vacío = solo memoria) y su tamaño máximo
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(storage.DATA_DIR, 'llm_cache.db'))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Vigencia de una respuesta en segundos (0 = sin vencimiento)
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+# Intervalo mínimo entre barridos de respuestas vencidas en disco
+LLM_CACHE_SWEEP_SECONDS = float(os.getenv('LLM_CACHE_SWEEP_SECONDS', '3600'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, entries, bytes)
+    SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + new.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses BEGIN
+    UPDATE totals SET bytes = bytes - old.size + new.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - old.size WHERE id = 1;
+END;
+"""
+
+def response_key(provider: str, model_name: str, prompt: str,
+                 generation_config: Optional[Dict] = None) -> str:
+    """
+    Calcula la clave de caché de una llamada al LLM.
+    
+    El proveedor forma parte de la clave: las respuestas del proveedor falso
+    no deben servirse a un cliente de Gemini que comparta la base.
+    
+    Args:
+        provider (str): Proveedor que respondió (ver llm_integration.create_transport)
+        model_name (str): Modelo de la llamada
+        prompt (str): Prompt enviado
+        generation_config (Optional[Dict]): Parámetros de generación (temperatura, etc.)
+    
+    Returns:
+        str: Hash del contenido canónico de la llamada
+    """
+    canonical = json.dumps([provider, model_name, prompt, generation_config or {}],
+                           ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    Caché de respuestas del LLM por contenido de la llamada, en dos niveles.
+    
+    El nivel en memoria es un LRU acotado por cantidad de respuestas; el
+    nivel en disco es una tabla SQLite acotada por bytes, que se comparte
+    entre procesos y sobrevive a los reinicios. Al llenarse, el disco
+    desaloja las respuestas usadas hace más tiempo. Un acierto en disco se
+    copia a memoria. Las respuestas vencidas (ttl) cuentan como fallo y se
+    descartan; en disco, además, se barren como mucho una vez por
+    sweep_interval. La tabla totals lleva la cantidad y los bytes del disco
+    (la mantienen triggers), así que una escritura no recorre la tabla.
+    
+    get_memory y get_disk separan los niveles para quien no pueda bloquearse
+    en SQLite (el cliente asíncrono consulta el disco en otro hilo).
+    """
+    
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 db_path: Optional[str] = LLM_CACHE_PATH,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 ttl: float = LLM_CACHE_TTL_SECONDS,
+                 sweep_interval: float = LLM_CACHE_SWEEP_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        """
+        Configura la caché.
+        
+        Args:
+            max_entries (int): Respuestas en memoria
+            db_path (Optional[str]): Base de datos del nivel en disco (None o vacío = solo memoria)
+            max_bytes (int): Tamaño máximo de las respuestas en disco
+            ttl (float): Vigencia en segundos (0 = sin vencimiento)
+            sweep_interval (float): Segundos mínimos entre barridos de vencidas en disco
+            clock (Callable[[], float]): Reloj en segundos (inyectable en pruebas)
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path or None
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._next_sweep = 0.0
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.expirations = 0
+        if self.db_path:
+            if os.path.dirname(self.db_path):
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            with self._connection() as conn:
+                conn.executescript(SCHEMA)
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Es una caché: perder las últimas escrituras ante una caída no importa
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - created_at >= self.ttl
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Obtiene una respuesta en caché.
+        
+        Args:
+            key (str): Clave calculada con response_key
+        
+        Returns:
+            Optional[str]: Respuesta guardada o None si no está o venció
+        """
+        response = self.get_memory(key)
+        return response if response is not None else self.get_disk(key)
+    
+    def get_memory(self, key: str) -> Optional[str]:
+        """
+        Busca una respuesta solo en memoria (no cuenta los fallos).
+        
+        Args:
+            key (str): Clave calculada con response_key
+        
+        Returns:
+            Optional[str]: Respuesta guardada o None si no está en memoria o venció
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if not self._expired(entry[1], now):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            del self._memory[key]
+            self.expirations += 1
+        return None
+    
+    def get_disk(self, key: str) -> Optional[str]:
+        """
+        Busca una respuesta en disco y, si está, la copia a memoria.
+        
+        Args:
+            key (str): Clave calculada con response_key
+        
+        Returns:
+            Optional[str]: Respuesta guardada o None si no está o venció
+        """
+        entry = self._disk_get(key, self._clock()) if self.db_path else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry[0], entry[1])
+        return entry[0]
+    
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        """Busca una respuesta en disco y marca su uso."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1], now):
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                with self._lock:
+                    self.expirations += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row
+    
+    def put(self, key: str, response: str) -> None:
+        """
+        Guarda una respuesta en ambos niveles.
+        
+        Args:
+            key (str): Clave calculada con response_key
+            response (str): Texto de la respuesta
+        """
+        now = self._clock()
+        with self._lock:
+            self._remember(key, response, now)
+        if not self.db_path:
+            return
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._connection() as conn:
+            # Upsert en lugar de REPLACE: el borrado implícito de REPLACE no
+            # dispara los triggers que mantienen totals
+            conn.execute(
+                "INSERT INTO responses (key, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "response = excluded.response, size = excluded.size, "
+                "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                (key, response, size, now, now)
+            )
+            if self.ttl and now >= self._next_sweep:
+                self._sweep_expired(conn, now)
+            if self._disk_totals(conn)[1] > self.max_bytes:
+                self._evict_disk(conn, now)
+    
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        """Guarda una respuesta en memoria (con el lock tomado)."""
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+    
+    def _disk_totals(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        """Cantidad y bytes de las respuestas en disco."""
+        return conn.execute("SELECT entries, bytes FROM totals WHERE id = 1").fetchone()
+    
+    def _sweep_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        """Descarta las respuestas vencidas del disco."""
+        self._next_sweep = now + self.sweep_interval
+        expired = conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,)).rowcount
+        if expired:
+            with self._lock:
+                self.expirations += expired
+    
+    def _evict_disk(self, conn: sqlite3.Connection, now: float) -> None:
+        """Descarta las respuestas vencidas y las menos usadas hasta respetar max_bytes."""
+        if self.ttl:
+            self._sweep_expired(conn, now)
+        excess = self._disk_totals(conn)[1] - self.max_bytes
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+        with self._lock:
+            self.disk_evictions += len(keys)
+    
+    def clear(self) -> None:
+        """Vacía ambos niveles."""
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM responses")
+    
+    def stats(self) -> Dict:
+        """Retorna los contadores de la caché."""
+        disk_entries = disk_bytes = None
+        if self.db_path:
+            disk_entries, disk_bytes = self._disk_totals(self._connection())
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+                "max_bytes": self.max_bytes if self.db_path else None,
+                "ttl_seconds": self.ttl or None,
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "expirations": self.expirations,
+                "hit_ratio": hits / lookups if lookups else 0.0
+            }
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[ResponseCache]:
+    """
+    Retorna la caché compartida, creándola con la configuración por defecto.
+    
+    Returns:
+        Optional[ResponseCache]: Caché compartida o None si está desactivada
+    """
+    global _cache
+    if _cache is None and LLM_CACHE_ENABLED:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+def set_cache(cache: Optional[ResponseCache]) -> None:
+    """
+    Reemplaza la caché compartida (por ejemplo, en pruebas).
+    
+    Args:
+        cache (Optional[ResponseCache]): Nueva caché
+    """
+    global _cache
+    _cache = cache
+
+def cache_stats() -> Optional[Dict]:
+    """Retorna los contadores de la caché compartida (None si no se creó)."""
+    return _cache.stats() if _cache is not None else None
@@ -0,0 +1,206 @@
+"""
+Module for the local fake LLM provider used offline and in load tests.
+"""
+import os
+import re
+import math
+import json
+import time
+import random
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from google.api_core import exceptions as api_exceptions
+
+from llm_integration import LLMTransport, AsyncLLMTransport
+from chatbot import rule_based_analysis
+from symptom_state import SymptomState
+
+# Latencia hasta el primer fragmento: lognormal con esta mediana (ms) y
+# dispersión (sigma del logaritmo; 0 = latencia fija)
+LLM_FAKE_LATENCY_MS = float(os.getenv('LLM_FAKE_LATENCY_MS', '800'))
+LLM_FAKE_LATENCY_SIGMA = float(os.getenv('LLM_FAKE_LATENCY_SIGMA', '0.5'))
+
+# Fracción de llamadas que fallan con un error transitorio del proveedor
+LLM_FAKE_ERROR_RATE = float(os.getenv('LLM_FAKE_ERROR_RATE', '0'))
+
+# Caracteres por fragmento y espera entre fragmentos (ms) al generar
+LLM_FAKE_CHUNK_CHARS = int(os.getenv('LLM_FAKE_CHUNK_CHARS', '24'))
+LLM_FAKE_CHUNK_DELAY_MS = float(os.getenv('LLM_FAKE_CHUNK_DELAY_MS', '20'))
+
+# Semilla para repetir una misma secuencia de latencias y errores
+LLM_FAKE_SEED = os.getenv('LLM_FAKE_SEED')
+
+# Marcas de los prompts de prompts.py que el proveedor falso reconoce
+ANALYSIS_MARKER = '"urgency_level": "BAJO|MEDIO|ALTO"'
+RESPONSES_HEADER = "Respuestas del paciente:"
+RESPONSE_LINE_PATTERN = re.compile(r"^(\w+): (.*)$", re.MULTILINE)
+NEXT_QUESTION_PATTERN = re.compile(r'La siguiente pregunta del cuestionario es: "(.*)"')
+
+@dataclass(frozen=True)
+class FakeProfile:
+    """
+    Comportamiento simulado del proveedor.
+    
+    Attributes:
+        latency_median (float): Mediana de la espera hasta el primer fragmento, en segundos
+        latency_sigma (float): Dispersión lognormal de esa espera (0 = fija)
+        error_rate (float): Probabilidad de que una llamada falle (0 a 1)
+        chunk_chars (int): Caracteres por fragmento
+        chunk_delay (float): Espera entre fragmentos, en segundos
+    """
+    latency_median: float = LLM_FAKE_LATENCY_MS / 1000
+    latency_sigma: float = LLM_FAKE_LATENCY_SIGMA
+    error_rate: float = LLM_FAKE_ERROR_RATE
+    chunk_chars: int = LLM_FAKE_CHUNK_CHARS
+    chunk_delay: float = LLM_FAKE_CHUNK_DELAY_MS / 1000
+    
+    def first_chunk_delay(self, rng: random.Random) -> float:
+        """Sortea la espera hasta el primer fragmento."""
+        if self.latency_median <= 0:
+            return 0.0
+        return self.latency_median * math.exp(self.latency_sigma * rng.gauss(0.0, 1.0))
+    
+    def split(self, text: str) -> List[str]:
+        """Divide una respuesta en los fragmentos que se entregan en streaming."""
+        size = max(self.chunk_chars, 1)
+        return [text[start:start + size] for start in range(0, len(text), size)] or [""]
+
+def parse_prompt_responses(prompt: str) -> Dict[str, str]:
+    """
+    Extrae las respuestas del paciente de un prompt de format_analysis_prompt.
+    
+    Args:
+        prompt (str): Prompt de análisis
+    
+    Returns:
+        Dict[str, str]: Respuestas por ID de pregunta
+    """
+    section = prompt.partition(RESPONSES_HEADER)[2].partition(ANALYSIS_MARKER)[0]
+    return {key: value.strip() for key, value in RESPONSE_LINE_PATTERN.findall(section)}
+
+def fake_reply(prompt: str) -> str:
+    """
+    Respuesta del proveedor falso para un prompt del proyecto.
+    
+    A un prompt de análisis responde con el análisis por reglas de las
+    respuestas que contiene, en el JSON que esperan process_response y
+    parse_llm_response. A un prompt de get_reply_prompt responde haciendo la
+    pregunta indicada. A cualquier otro, con un texto genérico.
+    
+    Args:
+        prompt (str): Prompt enviado
+    
+    Returns:
+        str: Texto de la respuesta
+    """
+    if ANALYSIS_MARKER in prompt:
+        analysis = rule_based_analysis(SymptomState.from_responses(parse_prompt_responses(prompt)))
+        return json.dumps(analysis, ensure_ascii=False, indent=2)
+    question = NEXT_QUESTION_PATTERN.search(prompt)
+    if question:
+        return f"Gracias por contármelo, entiendo que no es fácil. {question.group(1)}"
+    return "Gracias por compartirlo. ¿Podrías contarme un poco más sobre cómo te sientes?"
+
+class _FakeProvider:
+    """Sorteo de latencias y errores compartido por los transportes falsos."""
+    
+    def __init__(self, profile: Optional[FakeProfile], seed: Optional[int]):
+        self.profile = profile or FakeProfile()
+        if seed is None and LLM_FAKE_SEED:
+            seed = int(LLM_FAKE_SEED)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+    
+    def plan(self, prompt: str, timeout: Optional[float]) -> Tuple[float, Optional[Exception], List[str]]:
+        """
+        Decide cómo responde una llamada.
+        
+        Returns:
+            Tuple[float, Optional[Exception], List[str]]: Espera hasta el primer
+                fragmento, error a lanzar después de esa espera (o None) y fragmentos
+        """
+        with self._lock:
+            self.calls += 1
+            delay = self.profile.first_chunk_delay(self._rng)
+            failed = self._rng.random() < self.profile.error_rate
+            if failed:
+                self.errors += 1
+        if timeout is not None and delay >= timeout:
+            return timeout, api_exceptions.DeadlineExceeded("Fake LLM provider timed out"), []
+        if failed:
+            return delay, api_exceptions.ServiceUnavailable("Fake LLM provider unavailable"), []
+        return delay, None, self.profile.split(fake_reply(prompt))
+    
+    def stats(self) -> Dict:
+        """Retorna los contadores del proveedor falso."""
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors}
+
+class FakeLLMTransport(LLMTransport):
+    """
+    Transporte local que imita a Gemini sin red ni clave de API.
+    
+    Cada llamada espera una latencia sorteada según el FakeProfile, puede
+    fallar con un error transitorio (que el cliente reintenta como los del
+    proveedor real) y entrega la respuesta de fake_reply en fragmentos.
+    Se selecciona con LLM_PROVIDER=fake.
+    """
+    
+    def __init__(self, profile: Optional[FakeProfile] = None, seed: Optional[int] = None):
+        """
+        Configura el proveedor falso.
+        
+        Args:
+            profile (Optional[FakeProfile]): Latencias, errores y fragmentos (por defecto LLM_FAKE_*)
+            seed (Optional[int]): Semilla de los sorteos (por defecto LLM_FAKE_SEED)
+        """
+        self.provider = _FakeProvider(profile, seed)
+    
+    def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                 generation_config: Optional[Dict] = None) -> str:
+        return "".join(self.stream(model_name, prompt, timeout, generation_config))
+    
+    def stream(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+               generation_config: Optional[Dict] = None) -> Iterator[str]:
+        delay, error, chunks = self.provider.plan(prompt, timeout)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        for index, chunk in enumerate(chunks):
+            if index:
+                time.sleep(self.provider.profile.chunk_delay)
+            yield chunk
+    
+    def close(self) -> None:
+        pass
+
+class AsyncFakeLLMTransport(AsyncLLMTransport):
+    """
+    Versión asyncio de FakeLLMTransport: las esperas no bloquean el event loop.
+    """
+    
+    def __init__(self, profile: Optional[FakeProfile] = None, seed: Optional[int] = None):
+        """
+        Configura el proveedor falso.
+        
+        Args:
+            profile (Optional[FakeProfile]): Latencias, errores y fragmentos (por defecto LLM_FAKE_*)
+            seed (Optional[int]): Semilla de los sorteos (por defecto LLM_FAKE_SEED)
+        """
+        self.provider = _FakeProvider(profile, seed)
+    
+    async def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                       generation_config: Optional[Dict] = None) -> str:
+        delay, error, chunks = self.provider.plan(prompt, timeout)
+        await asyncio.sleep(delay + self.provider.profile.chunk_delay * max(len(chunks) - 1, 0))
+        if error is not None:
+            raise error
+        return "".join(chunks)
+    
+    async def close(self) -> None:
+        pass
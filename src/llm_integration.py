@@ -1,46 +1,935 @@
 """
 Module for integrating with Google's Gemini LLM API.
 """
+import os
 import time
+import asyncio
 import json
-from typing import Dict, Optional
+import atexit
+import itertools
+import threading
+from collections import Counter
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import grpc
 import google.generativeai as genai
-import config
+from google.ai import generativelanguage as glm
+from google.ai.generativelanguage_v1beta.services.generative_service.transports.grpc import GenerativeServiceGrpcTransport
+from google.ai.generativelanguage_v1beta.services.generative_service.transports.grpc_asyncio import GenerativeServiceGrpcAsyncIOTransport
+from llm_retry import RetryPolicy, CircuitBreaker, CircuitOpenError
+import llm_cache
+from llm_cache import ResponseCache, response_key
+
+# Proveedor del LLM: "gemini" o "fake" (local, sin red ni clave; ver llm_fake)
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'gemini')
+
+# Modelo usado cuando no se indica otro
+LLM_MODEL_NAME = os.getenv('LLM_MODEL_NAME', 'gemini-pro')
+
+# Parámetros de generación de los clientes por defecto, como JSON
+# (p. ej. {"temperature": 0}); forman parte de la clave de la caché
+LLM_GENERATION_CONFIG = json.loads(os.getenv('LLM_GENERATION_CONFIG') or 'null')
+
+# Conexiones gRPC persistentes del pool (cada una multiplexa muchas llamadas)
+LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '4'))
+
+# Llamadas simultáneas permitidas por cliente
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '32'))
+
+# Llamadas asíncronas simultáneas permitidas en cada event loop
+LLM_ASYNC_MAX_CONCURRENCY = int(os.getenv('LLM_ASYNC_MAX_CONCURRENCY', '256'))
+
+# Opciones de los canales: keep-alive para no volver a negociar TLS/HTTP2 entre
+# llamadas y un pool de subcanales propio para que cada canal abra su conexión
+LLM_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.use_local_subchannel_pool", 1),
+]
+
+def _api_key() -> str:
+    """Return the configured Gemini API key."""
+    # config exige SECRET_KEY al importarse; se importa aquí para que los
+    # transportes falsos y las pruebas no dependan de él
+    import config
+    return config.GOOGLE_API_KEY
 
 def initialize_llm() -> None:
     """
     Initialize the Gemini LLM with API configuration.
     """
     try:
-        genai.configure(api_key=config.GOOGLE_API_KEY)
+        genai.configure(api_key=_api_key())
     except Exception as e:
         raise RuntimeError(f"Failed to initialize Gemini LLM: {str(e)}")
 
-def send_prompt(prompt: str, max_retries: int = 3, retry_delay: float = 1.0) -> str:
+def _generate_request(model_name: str, prompt: str, timeout: Optional[float] = None,
+                      generation_config: Optional[Dict] = None) -> Dict:
+    """Build the GenerateContent arguments for a single-turn prompt."""
+    request = {
+        "model": model_name if model_name.startswith("models/") else f"models/{model_name}",
+        "contents": [glm.Content(parts=[glm.Part(text=prompt)], role="user")]
+    }
+    if generation_config:
+        request["generation_config"] = glm.GenerationConfig(**generation_config)
+    if timeout is not None:
+        request["timeout"] = timeout
+    return request
+
+def _chunk_text(response: glm.GenerateContentResponse) -> str:
+    """Text of the first candidate of a (possibly partial) response."""
+    if not response.candidates:
+        return ""
+    return "".join(part.text for part in response.candidates[0].content.parts)
+
+class LLMTransport:
     """
-    Send a prompt to the Gemini LLM and get the response.
+    Interface between LLMClient and an LLM provider.
+    
+    A transport sends single-turn prompts to one provider and owns its
+    connections; retries, concurrency limits and caching are the client's
+    job. See create_transport for the available providers.
+    """
+    
+    def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                 generation_config: Optional[Dict] = None) -> str:
+        """Send a prompt and return the complete response text."""
+        raise NotImplementedError
+    
+    def stream(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+               generation_config: Optional[Dict] = None) -> Iterator[str]:
+        """Send a prompt and yield the response text in chunks as it is produced."""
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        """Release the transport's connections."""
+        pass
+
+class AsyncLLMTransport:
+    """
+    Interface between AsyncLLMClient and an LLM provider (asyncio version).
+    """
+    
+    async def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                       generation_config: Optional[Dict] = None) -> str:
+        """Send a prompt and return the complete response text."""
+        raise NotImplementedError
+    
+    async def close(self) -> None:
+        """Release the transport's connections."""
+        pass
+
+class GeminiTransport(LLMTransport):
+    """
+    Pool of persistent gRPC connections to the Gemini API.
+    
+    Each connection is a GenerativeServiceClient over its own keep-alive
+    channel. gRPC channels are thread-safe and multiplex concurrent calls,
+    so calls are spread round-robin over the pool without locking.
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, pool_size: int = LLM_POOL_SIZE,
+                 channels: Optional[List[grpc.Channel]] = None):
+        """
+        Open the connection pool.
+        
+        Args:
+            api_key (Optional[str]): Gemini API key (defaults to config.GOOGLE_API_KEY)
+            pool_size (int): Number of persistent connections
+            channels (Optional[List[grpc.Channel]]): Pre-built channels to use
+                instead of connecting to the Gemini endpoint (e.g. a local fake server)
+        """
+        if channels is None:
+            options = {"api_key": api_key or _api_key()}
+            transport = partial(GenerativeServiceGrpcTransport, channel=self._create_channel)
+            self._clients = [
+                glm.GenerativeServiceClient(transport=transport, client_options=options)
+                for _ in range(max(pool_size, 1))
+            ]
+        else:
+            self._clients = [
+                glm.GenerativeServiceClient(transport=GenerativeServiceGrpcTransport(channel=channel))
+                for channel in channels
+            ]
+        self._next = itertools.count()
+    
+    @staticmethod
+    def _create_channel(host: str, options=(), **kwargs) -> grpc.Channel:
+        """Create a Gemini channel with the keep-alive options."""
+        return GenerativeServiceGrpcTransport.create_channel(
+            host, options=list(options) + LLM_CHANNEL_OPTIONS, **kwargs
+        )
+    
+    def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                 generation_config: Optional[Dict] = None) -> str:
+        """
+        Send a prompt over the next connection of the pool.
+        
+        Args:
+            model_name (str): Model to use, e.g. "gemini-pro"
+            prompt (str): The input prompt
+            timeout (Optional[float]): Seconds before the RPC is abandoned
+            generation_config (Optional[Dict]): GenerationConfig fields, e.g. temperature
+        
+        Returns:
+            str: The model's response text
+        """
+        client = self._clients[next(self._next) % len(self._clients)]
+        response = client.generate_content(**_generate_request(model_name, prompt, timeout, generation_config))
+        return genai.types.GenerateContentResponse.from_response(response).text
+    
+    def stream(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+               generation_config: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Send a prompt and yield the response text as the model produces it.
+        
+        Args:
+            model_name (str): Model to use, e.g. "gemini-pro"
+            prompt (str): The input prompt
+            timeout (Optional[float]): Seconds before the whole stream is abandoned
+            generation_config (Optional[Dict]): GenerationConfig fields, e.g. temperature
+        
+        Yields:
+            str: Non-empty text chunks, in order
+        """
+        client = self._clients[next(self._next) % len(self._clients)]
+        request = _generate_request(model_name, prompt, timeout, generation_config)
+        for response in client.stream_generate_content(**request):
+            text = _chunk_text(response)
+            if text:
+                yield text
+    
+    def close(self) -> None:
+        """Close every connection of the pool."""
+        for client in self._clients:
+            client.transport.close()
+
+def create_transport(provider: Optional[str] = None) -> LLMTransport:
+    """
+    Create the transport of an LLM provider.
+    
+    Args:
+        provider (Optional[str]): "gemini" or "fake" (defaults to LLM_PROVIDER)
+    
+    Returns:
+        LLMTransport: Transport for the provider
+    """
+    name = provider or LLM_PROVIDER
+    if name == 'gemini':
+        return GeminiTransport()
+    if name == 'fake':
+        from llm_fake import FakeLLMTransport
+        return FakeLLMTransport()
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+def _remaining(deadline_at: Optional[float]) -> Optional[float]:
+    """Seconds left until deadline_at (None without deadline)."""
+    return None if deadline_at is None else max(deadline_at - time.monotonic(), 0.0)
+
+class _ClientCore:
+    """
+    Retry policy, circuit breaker and counters shared by both LLM clients.
+    """
+    
+    def __init__(self, model_name: str, max_concurrency: int, transport_factory: Callable[[], Any],
+                 retry_policy: Optional[RetryPolicy], breaker: Optional[CircuitBreaker],
+                 cache: Optional[ResponseCache], generation_config: Optional[Dict],
+                 provider: Optional[str]):
+        self.model_name = model_name
+        self.provider = provider or LLM_PROVIDER
+        self.max_concurrency = max_concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache
+        self.generation_config = generation_config or None
+        # Los transportes sin parámetros de generación no reciben el argumento
+        self._request_options = {"generation_config": self.generation_config} if self.generation_config else {}
+        self._transport_factory = transport_factory
+        self._transport = None
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.retries_by_error = Counter()
+        self.failures_by_reason = Counter()
+    
+    @property
+    def started(self) -> bool:
+        """Whether the transport is open."""
+        return self._transport is not None
+    
+    def _create_transport(self) -> Any:
+        """Build the transport, reporting errors as RuntimeError."""
+        try:
+            return self._transport_factory()
+        except Exception as e:
+            raise RuntimeError(f"Failed to initialize LLM client: {str(e)}")
+    
+    def _policy(self, max_retries: Optional[int], retry_delay: Optional[float],
+                deadline: Optional[float]) -> RetryPolicy:
+        """Return the retry policy with the per-call overrides."""
+        return self.retry_policy.with_overrides(max_retries, retry_delay, deadline)
+    
+    def _cached(self, prompt: str, use_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+        """Return the cache key of a call (None if not cached) and the cached response."""
+        if self.cache is None or not use_cache:
+            return None, None
+        key = response_key(self.provider, self.model_name, prompt, self.generation_config)
+        return key, self.cache.get(key)
+    
+    def _admit(self) -> None:
+        """Let a call through the circuit breaker or fail fast."""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._fail("circuit_open")
+            raise
+        with self._stats_lock:
+            self.calls += 1
+    
+    def _fail(self, reason: str) -> None:
+        """Count a call that gave up."""
+        with self._stats_lock:
+            self.failures += 1
+            self.failures_by_reason[reason] += 1
+    
+    def _after_failure(self, policy: RetryPolicy, error: Exception, attempt: int,
+                       deadline_at: Optional[float]) -> float:
+        """
+        Record a failed attempt and decide whether to retry.
+        
+        Args:
+            policy (RetryPolicy): Policy of the call
+            error (Exception): Error of the attempt
+            attempt (int): Attempts made so far
+            deadline_at (Optional[float]): Deadline of the call
+        
+        Returns:
+            float: Seconds to wait before the next attempt
+        
+        Raises:
+            RuntimeError: If the call must not be retried
+        """
+        retryable = policy.is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # El proveedor respondió: el error es de la llamada, no del servicio
+            self.breaker.record_success()
+        delay = policy.next_delay(error, attempt, deadline_at)
+        if delay is None:
+            if not retryable:
+                self._fail("non_retryable")
+            else:
+                self._fail("exhausted" if attempt >= policy.max_attempts else "deadline")
+            raise RuntimeError(f"Failed to get response after {attempt} attempts: {str(error)}") from error
+        with self._stats_lock:
+            self.retries += 1
+            self.retries_by_error[type(error).__name__] += 1
+        return delay
+    
+    def _interrupted(self, policy: RetryPolicy, error: Exception) -> None:
+        """
+        Record a stream that failed after delivering text.
+        
+        Raises:
+            RuntimeError: Always; the stream cannot be retried
+        """
+        if policy.is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._fail("interrupted")
+        raise RuntimeError(f"LLM stream interrupted: {str(error)}") from error
+    
+    def stats(self) -> Dict:
+        """Return the client's counters and the circuit breaker state."""
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "started": self.started,
+                "max_concurrency": self.max_concurrency,
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "retries_by_error": dict(self.retries_by_error),
+                "failures_by_reason": dict(self.failures_by_reason),
+                "circuit": self.breaker.stats()
+            }
+
+class LLMClient(_ClientCore):
+    """
+    Long-lived, thread-safe LLM client for one model.
+    
+    The transport (by default the one of LLM_PROVIDER, see create_transport)
+    is opened once in start() and shared by every call until close(), so
+    calls reuse its connections instead of building a model per prompt. Any
+    object with generate(model_name, prompt, timeout=None) -> str and
+    close() can act as transport (see LLMTransport). Failed attempts are
+    retried according to the RetryPolicy, and the CircuitBreaker makes calls
+    fail fast while the provider is down. With a ResponseCache, a call
+    identical to a previous one (same provider, model, prompt and generation config)
+    is answered without reaching the provider.
+    """
+    
+    def __init__(self, model_name: str = LLM_MODEL_NAME,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 transport_factory: Callable[[], Any] = create_transport,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 cache: Optional[ResponseCache] = None,
+                 generation_config: Optional[Dict] = None,
+                 provider: Optional[str] = None):
+        """
+        Configure the client without opening connections.
+        
+        Args:
+            model_name (str): Model to use
+            max_concurrency (int): Maximum calls in flight at the same time
+            transport_factory (Callable[[], Any]): Builds the transport in start()
+            retry_policy (Optional[RetryPolicy]): Retry policy (default settings if None)
+            breaker (Optional[CircuitBreaker]): Circuit breaker, possibly shared
+                with other clients of the same provider (a new one if None)
+            cache (Optional[ResponseCache]): Response cache (no caching if None)
+            generation_config (Optional[Dict]): GenerationConfig fields sent with
+                every call; the transport then receives generation_config=
+            provider (Optional[str]): Provider named in the cache key (defaults to
+                LLM_PROVIDER; set it when transport_factory builds another provider)
+        """
+        super().__init__(model_name, max_concurrency, transport_factory, retry_policy, breaker,
+                         cache, generation_config, provider)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+    
+    def start(self) -> "LLMClient":
+        """
+        Open the transport (idempotent).
+        
+        Returns:
+            LLMClient: The client itself
+        
+        Raises:
+            RuntimeError: If the transport cannot be created
+        """
+        self._open()
+        return self
+    
+    def _open(self) -> Any:
+        """Return the open transport, creating it if needed."""
+        with self._lock:
+            if self._transport is None:
+                self._transport = self._create_transport()
+            return self._transport
+    
+    def close(self) -> None:
+        """Close the transport; the next call opens it again."""
+        with self._lock:
+            transport, self._transport = self._transport, None
+        if transport is not None:
+            transport.close()
+    
+    def __enter__(self) -> "LLMClient":
+        return self.start()
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def generate(self, prompt: str, max_retries: Optional[int] = None,
+                 retry_delay: Optional[float] = None, deadline: Optional[float] = None,
+                 use_cache: bool = True) -> str:
+        """
+        Send a prompt to the model and get the response.
+        
+        Args:
+            prompt (str): The input prompt to send to the model
+            max_retries (Optional[int]): Maximum number of attempts (defaults to the policy)
+            retry_delay (Optional[float]): Base backoff delay in seconds (defaults to the policy)
+            deadline (Optional[float]): Time budget in seconds for the whole call,
+                retries included (defaults to the policy)
+            use_cache (bool): Look up and store the response in the client's cache
+        
+        Returns:
+            str: The model's response text
+        
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            RuntimeError: If the call fails and cannot be retried
+        """
+        key, cached = self._cached(prompt, use_cache)
+        if cached is not None:
+            return cached
+        policy = self._policy(max_retries, retry_delay, deadline)
+        deadline_at = policy.deadline_at(time.monotonic())
+        transport = self._transport or self._open()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit()
+            try:
+                with self._slots:
+                    response = transport.generate(self.model_name, prompt, timeout=_remaining(deadline_at),
+                                                  **self._request_options)
+            except Exception as e:
+                time.sleep(self._after_failure(policy, e, attempt, deadline_at))
+            else:
+                self.breaker.record_success()
+                if key is not None:
+                    self.cache.put(key, response)
+                return response
+    
+    def stream(self, prompt: str, max_retries: Optional[int] = None,
+               retry_delay: Optional[float] = None, deadline: Optional[float] = None,
+               use_cache: bool = True) -> Iterator[str]:
+        """
+        Send a prompt and yield the response text as it arrives.
+        
+        The transport must implement stream(model_name, prompt, timeout=None).
+        Failures before the first chunk are retried like in generate(); once
+        text has been delivered, a failure ends the stream with an error,
+        since retrying would repeat what the caller already has. The
+        concurrency slot is held until the stream ends or is closed. A cached
+        response is yielded as a single chunk, and a stream is cached only if
+        it is read to the end.
+        
+        Args:
+            prompt (str): The input prompt to send to the model
+            max_retries (Optional[int]): Maximum number of attempts (defaults to the policy)
+            retry_delay (Optional[float]): Base backoff delay in seconds (defaults to the policy)
+            deadline (Optional[float]): Time budget in seconds for the whole stream
+            use_cache (bool): Look up and store the response in the client's cache
+        
+        Yields:
+            str: Text chunks, in order
+        
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            RuntimeError: If the call fails and cannot be retried
+        """
+        key, cached = self._cached(prompt, use_cache)
+        if cached is not None:
+            yield cached
+            return
+        policy = self._policy(max_retries, retry_delay, deadline)
+        deadline_at = policy.deadline_at(time.monotonic())
+        transport = self._transport or self._open()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit()
+            delivered = False
+            chunks = []
+            try:
+                with self._slots:
+                    for chunk in transport.stream(self.model_name, prompt, timeout=_remaining(deadline_at),
+                                                  **self._request_options):
+                        delivered = True
+                        chunks.append(chunk)
+                        yield chunk
+            except GeneratorExit:
+                # El llamador dejó de leer: el proveedor respondió si ya hubo texto
+                if delivered:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.release()
+                raise
+            except Exception as e:
+                if delivered:
+                    self._interrupted(policy, e)
+                time.sleep(self._after_failure(policy, e, attempt, deadline_at))
+            else:
+                self.breaker.record_success()
+                if key is not None:
+                    self.cache.put(key, "".join(chunks))
+                return
+
+# Circuito compartido por los clientes por defecto: ambos usan el mismo proveedor
+PROVIDER_BREAKER = CircuitBreaker()
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> LLMClient:
+    """Return the shared LLM client, creating it with the default settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(breaker=PROVIDER_BREAKER, cache=llm_cache.get_cache(),
+                                    generation_config=LLM_GENERATION_CONFIG)
+    return _client
+
+def start_client(client: Optional[LLMClient] = None) -> LLMClient:
+    """
+    Startup hook: open the shared client's connections.
+    
+    Args:
+        client (Optional[LLMClient]): Client to install instead of the default one
+    
+    Returns:
+        LLMClient: The shared client, already started
+    """
+    global _client
+    if client is not None:
+        with _client_lock:
+            previous, _client = _client, client
+        if previous is not None and previous is not client:
+            previous.close()
+    return get_client().start()
+
+def close_client() -> None:
+    """Shutdown hook: close the shared client's connections."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+atexit.register(close_client)
+
+def send_prompt(prompt: str, max_retries: Optional[int] = None, retry_delay: Optional[float] = None,
+                deadline: Optional[float] = None, stream: bool = False,
+                use_cache: bool = True) -> Union[str, Iterator[str]]:
+    """
+    Send a prompt to the configured LLM provider and get the response.
+    
+    Uses the shared client (see get_client), which keeps its connections
+    open between calls, retries transient errors with jittered exponential
+    backoff within the call's deadline and answers repeated prompts from
+    the response cache (see llm_cache).
     
     Args:
         prompt (str): The input prompt to send to the model
-        max_retries (int): Maximum number of retry attempts
-        retry_delay (float): Delay between retries in seconds
+        max_retries (Optional[int]): Maximum number of attempts (default LLM_RETRY_MAX_ATTEMPTS)
+        retry_delay (Optional[float]): Base backoff delay in seconds (default LLM_RETRY_BASE_DELAY)
+        deadline (Optional[float]): Time budget in seconds (default LLM_CALL_DEADLINE)
+        stream (bool): Return an iterator of text chunks as the model produces
+            them instead of waiting for the complete text (see LLMClient.stream)
+        use_cache (bool): Look up and store the response in the cache
+    
+    Returns:
+        Union[str, Iterator[str]]: The model's response text, or its chunks if stream
+    
+    Raises:
+        CircuitOpenError: If the provider is failing and calls are being rejected
+        RuntimeError: If the call fails and cannot be retried
+    """
+    if stream:
+        return get_client().stream(prompt, max_retries, retry_delay, deadline, use_cache)
+    return get_client().generate(prompt, max_retries, retry_delay, deadline, use_cache)
+
+class AsyncGeminiTransport(AsyncLLMTransport):
+    """
+    Pool of persistent gRPC asyncio connections to the Gemini API.
+    
+    Same layout as GeminiTransport over Gemini's asyncio API. The channels
+    belong to the event loop in which the transport is created.
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, pool_size: int = LLM_POOL_SIZE,
+                 channels: Optional[List[grpc.aio.Channel]] = None):
+        """
+        Open the connection pool.
+        
+        Args:
+            api_key (Optional[str]): Gemini API key (defaults to config.GOOGLE_API_KEY)
+            pool_size (int): Number of persistent connections
+            channels (Optional[List[grpc.aio.Channel]]): Pre-built asyncio channels
+                to use instead of connecting to the Gemini endpoint
+        """
+        if channels is None:
+            options = {"api_key": api_key or _api_key()}
+            transport = partial(GenerativeServiceGrpcAsyncIOTransport, channel=self._create_channel)
+            self._clients = [
+                glm.GenerativeServiceAsyncClient(transport=transport, client_options=options)
+                for _ in range(max(pool_size, 1))
+            ]
+        else:
+            self._clients = [
+                glm.GenerativeServiceAsyncClient(transport=GenerativeServiceGrpcAsyncIOTransport(channel=channel))
+                for channel in channels
+            ]
+        self._next = itertools.count()
+    
+    @staticmethod
+    def _create_channel(host: str, options=(), **kwargs) -> grpc.aio.Channel:
+        """Create a Gemini asyncio channel with the keep-alive options."""
+        return GenerativeServiceGrpcAsyncIOTransport.create_channel(
+            host, options=list(options) + LLM_CHANNEL_OPTIONS, **kwargs
+        )
+    
+    async def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                       generation_config: Optional[Dict] = None) -> str:
+        """
+        Send a prompt over the next connection of the pool.
+        
+        Args:
+            model_name (str): Model to use, e.g. "gemini-pro"
+            prompt (str): The input prompt
+            timeout (Optional[float]): Seconds before the RPC is abandoned
+            generation_config (Optional[Dict]): GenerationConfig fields, e.g. temperature
+        
+        Returns:
+            str: The model's response text
+        """
+        client = self._clients[next(self._next) % len(self._clients)]
+        response = await client.generate_content(
+            **_generate_request(model_name, prompt, timeout, generation_config)
+        )
+        return genai.types.GenerateContentResponse.from_response(response).text
+    
+    async def close(self) -> None:
+        """Close every connection of the pool."""
+        for client in self._clients:
+            await client.transport.close()
+
+def create_async_transport(provider: Optional[str] = None) -> AsyncLLMTransport:
+    """
+    Create the asyncio transport of an LLM provider.
+    
+    Args:
+        provider (Optional[str]): "gemini" or "fake" (defaults to LLM_PROVIDER)
+    
+    Returns:
+        AsyncLLMTransport: Transport for the provider
+    """
+    name = provider or LLM_PROVIDER
+    if name == 'gemini':
+        return AsyncGeminiTransport()
+    if name == 'fake':
+        from llm_fake import AsyncFakeLLMTransport
+        return AsyncFakeLLMTransport()
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+class AsyncLLMClient(_ClientCore):
+    """
+    Asyncio counterpart of LLMClient.
+    
+    A semaphore caps the calls in flight, so a single process can hold
+    hundreds of outstanding calls without a thread per call. Waiting for a
+    slot and the backoff between retries are awaits: cancelling the calling
+    task stops it at any point, and a task in backoff does not hold a slot.
+    The transport and the semaphore belong to one event loop and are
+    recreated if the client is used from another one.
+    """
+    
+    def __init__(self, model_name: str = LLM_MODEL_NAME,
+                 max_concurrency: int = LLM_ASYNC_MAX_CONCURRENCY,
+                 transport_factory: Callable[[], Any] = create_async_transport,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 cache: Optional[ResponseCache] = None,
+                 generation_config: Optional[Dict] = None,
+                 provider: Optional[str] = None):
+        """
+        Configure the client without opening connections.
+        
+        Args:
+            model_name (str): Model to use
+            max_concurrency (int): Maximum calls in flight at the same time
+            transport_factory (Callable[[], Any]): Builds the transport, whose
+                generate(model_name, prompt, timeout=None) and close() are coroutines
+            retry_policy (Optional[RetryPolicy]): Retry policy (default settings if None)
+            breaker (Optional[CircuitBreaker]): Circuit breaker (a new one if None)
+            cache (Optional[ResponseCache]): Response cache (no caching if None)
+            generation_config (Optional[Dict]): GenerationConfig fields sent with every call
+            provider (Optional[str]): Provider named in the cache key (defaults to LLM_PROVIDER)
+        """
+        super().__init__(model_name, max_concurrency, transport_factory, retry_policy, breaker,
+                         cache, generation_config, provider)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_flight = 0
+    
+    def _open(self) -> Any:
+        """Return the transport for the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Los canales y el semáforo de otro loop no sirven en este; ese
+            # loop ya no puede cerrarlos, así que solo se descartan
+            self._transport = None
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        if self._transport is None:
+            self._transport = self._create_transport()
+        return self._transport
+    
+    async def start(self) -> "AsyncLLMClient":
+        """
+        Open the transport in the running event loop (idempotent).
+        
+        Returns:
+            AsyncLLMClient: The client itself
+        
+        Raises:
+            RuntimeError: If the transport cannot be created
+        """
+        self._open()
+        return self
+    
+    async def close(self) -> None:
+        """Close the transport; the next call opens it again."""
+        transport, self._transport = self._transport, None
+        if transport is not None:
+            await transport.close()
+    
+    async def __aenter__(self) -> "AsyncLLMClient":
+        return await self.start()
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def _cached_async(self, prompt: str, use_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+        """Like _cached, but the disk tier is read in a worker thread."""
+        if self.cache is None or not use_cache:
+            return None, None
+        key = response_key(self.provider, self.model_name, prompt, self.generation_config)
+        response = self.cache.get_memory(key)
+        if response is None:
+            # SQLite bloquea: el disco se consulta fuera del event loop
+            response = (await asyncio.to_thread(self.cache.get_disk, key) if self.cache.db_path
+                        else self.cache.get_disk(key))
+        return key, response
+    
+    async def generate(self, prompt: str, max_retries: Optional[int] = None,
+                       retry_delay: Optional[float] = None, deadline: Optional[float] = None,
+                       use_cache: bool = True) -> str:
+        """
+        Send a prompt to the model and get the response.
+        
+        Args:
+            prompt (str): The input prompt to send to the model
+            max_retries (Optional[int]): Maximum number of attempts (defaults to the policy)
+            retry_delay (Optional[float]): Base backoff delay in seconds (defaults to the policy)
+            deadline (Optional[float]): Time budget in seconds for the whole call,
+                retries included (defaults to the policy)
+            use_cache (bool): Look up and store the response in the client's cache
+        
+        Returns:
+            str: The model's response text
+        
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            RuntimeError: If the call fails and cannot be retried
+            asyncio.CancelledError: If the calling task is cancelled
+        """
+        key, cached = await self._cached_async(prompt, use_cache)
+        if cached is not None:
+            return cached
+        policy = self._policy(max_retries, retry_delay, deadline)
+        deadline_at = policy.deadline_at(time.monotonic())
+        transport = self._open()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit()
+            try:
+                async with self._slots:
+                    self.in_flight += 1
+                    try:
+                        response = await transport.generate(
+                            self.model_name, prompt, timeout=_remaining(deadline_at), **self._request_options
+                        )
+                    finally:
+                        self.in_flight -= 1
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(policy, e, attempt, deadline_at))
+            else:
+                self.breaker.record_success()
+                if key is not None and self.cache.db_path:
+                    await asyncio.to_thread(self.cache.put, key, response)
+                elif key is not None:
+                    self.cache.put(key, response)
+                return response
+    
+    def stats(self) -> Dict:
+        """Return the client's counters and the circuit breaker state."""
+        return {**super().stats(), "in_flight": self.in_flight}
+
+_async_client: Optional[AsyncLLMClient] = None
+
+def get_async_client() -> AsyncLLMClient:
+    """Return the shared asyncio LLM client, creating it with the default settings."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncLLMClient(breaker=PROVIDER_BREAKER, cache=llm_cache.get_cache(),
+                                               generation_config=LLM_GENERATION_CONFIG)
+    return _async_client
+
+async def start_async_client(client: Optional[AsyncLLMClient] = None) -> AsyncLLMClient:
+    """
+    Startup hook: open the shared asyncio client in the running event loop.
+    
+    Args:
+        client (Optional[AsyncLLMClient]): Client to install instead of the default one
+    
+    Returns:
+        AsyncLLMClient: The shared client, already started
+    """
+    global _async_client
+    if client is not None:
+        with _client_lock:
+            previous, _async_client = _async_client, client
+        if previous is not None and previous is not client:
+            await previous.close()
+    return await get_async_client().start()
+
+async def close_async_client() -> None:
+    """Shutdown hook: close the shared asyncio client's connections."""
+    global _async_client
+    with _client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+async def send_prompt_async(prompt: str, max_retries: Optional[int] = None,
+                            retry_delay: Optional[float] = None, deadline: Optional[float] = None,
+                            use_cache: bool = True) -> str:
+    """
+    Send a prompt to the configured LLM provider without blocking the event loop.
+    
+    Uses the shared asyncio client (see get_async_client): calls beyond
+    LLM_ASYNC_MAX_CONCURRENCY wait for a free slot, and the backoff between
+    retries can be cancelled.
+    
+    Args:
+        prompt (str): The input prompt to send to the model
+        max_retries (Optional[int]): Maximum number of attempts (default LLM_RETRY_MAX_ATTEMPTS)
+        retry_delay (Optional[float]): Base backoff delay in seconds (default LLM_RETRY_BASE_DELAY)
+        deadline (Optional[float]): Time budget in seconds (default LLM_CALL_DEADLINE)
+        use_cache (bool): Look up and store the response in the cache
     
     Returns:
         str: The model's response text
     
     Raises:
-        RuntimeError: If all retry attempts fail
+        CircuitOpenError: If the provider is failing and calls are being rejected
+        RuntimeError: If the call fails and cannot be retried
+    """
+    return await get_async_client().generate(prompt, max_retries, retry_delay, deadline, use_cache)
+
+def get_metrics() -> Dict:
     """
-    model = genai.GenerativeModel('gemini-pro')
+    Return the counters of the shared LLM clients.
     
-    for attempt in range(max_retries):
-        try:
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            if attempt == max_retries - 1:  # Last attempt
-                raise RuntimeError(f"Failed to get response after {max_retries} attempts: {str(e)}")
-            time.sleep(retry_delay)
+    Returns:
+        Dict: Provider name, stats of the sync and asyncio clients (None if
+            not created yet), of the provider's circuit breaker and of the
+            response cache
+    """
+    return {
+        "provider": LLM_PROVIDER,
+        "client": _client.stats() if _client is not None else None,
+        "async_client": _async_client.stats() if _async_client is not None else None,
+        "circuit": PROVIDER_BREAKER.stats(),
+        "cache": llm_cache.cache_stats()
+    }
 
 def process_response(response: str) -> Dict[str, any]:
     """
@@ -0,0 +1,222 @@
+"""
+Module for the retry policy and circuit breaker of LLM calls.
+"""
+import os
+import time
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Optional, Tuple, Type
+
+from google.api_core import exceptions as api_exceptions
+
+# Intentos por llamada, incluido el primero
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv('LLM_RETRY_MAX_ATTEMPTS', '3'))
+
+# Espera antes del primer reintento y tope de la espera, en segundos
+LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+
+# Tiempo total por llamada, reintentos incluidos (0 = sin límite)
+LLM_CALL_DEADLINE = float(os.getenv('LLM_CALL_DEADLINE', '30'))
+
+# Fallos seguidos que abren el circuito y segundos hasta volver a probar
+LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+
+# Errores transitorios del proveedor o de la red; el resto (p. ej. un prompt
+# inválido o una clave rechazada) fallaría igual al reintentar
+RETRYABLE_ERRORS: Tuple[Type[BaseException], ...] = (
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.Aborted,
+    ConnectionError,
+    TimeoutError,
+)
+
+class CircuitOpenError(RuntimeError):
+    """Se rechaza la llamada sin intentarla porque el circuito está abierto."""
+    pass
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Cuándo y cuánto esperar antes de reintentar una llamada al LLM.
+    
+    La espera crece exponencialmente desde base_delay hasta max_delay y se
+    le resta una fracción aleatoria (jitter) para que los clientes que
+    fallaron a la vez no reintenten a la vez. Con deadline, no se reintenta
+    si la espera terminaría después del tiempo total de la llamada.
+    
+    Attributes:
+        max_attempts (int): Intentos por llamada, incluido el primero
+        base_delay (float): Espera antes del primer reintento, en segundos
+        max_delay (float): Tope de la espera, en segundos
+        multiplier (float): Factor de crecimiento de la espera
+        jitter (float): Fracción máxima de la espera que se descuenta al azar (0 a 1)
+        deadline (Optional[float]): Tiempo total por llamada, en segundos
+        retryable (Tuple[Type[BaseException], ...]): Errores que se reintentan
+    """
+    max_attempts: int = LLM_RETRY_MAX_ATTEMPTS
+    base_delay: float = LLM_RETRY_BASE_DELAY
+    max_delay: float = LLM_RETRY_MAX_DELAY
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    deadline: Optional[float] = LLM_CALL_DEADLINE or None
+    retryable: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS
+    
+    def with_overrides(self, max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                       deadline: Optional[float] = None) -> "RetryPolicy":
+        """Retorna una copia con los valores indicados (los None se mantienen)."""
+        changes = {"max_attempts": max_attempts, "base_delay": base_delay, "deadline": deadline}
+        changes = {field: value for field, value in changes.items() if value is not None}
+        return replace(self, **changes) if changes else self
+    
+    def is_retryable(self, error: BaseException) -> bool:
+        """Indica si un error es transitorio y vale la pena reintentar."""
+        return isinstance(error, self.retryable)
+    
+    def deadline_at(self, started: float) -> Optional[float]:
+        """Instante (time.monotonic) en que vence una llamada iniciada en started."""
+        return started + self.deadline if self.deadline else None
+    
+    def backoff(self, attempt: int, rng: Callable[[], float] = random.random) -> float:
+        """
+        Calcula la espera después de un intento fallido.
+        
+        Args:
+            attempt (int): Intentos ya hechos (1 tras el primero)
+            rng (Callable[[], float]): Fuente de números en [0, 1)
+        
+        Returns:
+            float: Segundos de espera
+        """
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return ceiling * (1 - self.jitter * rng())
+    
+    def next_delay(self, error: BaseException, attempt: int, deadline_at: Optional[float],
+                   now: Optional[float] = None) -> Optional[float]:
+        """
+        Decide si reintentar después de un error.
+        
+        Args:
+            error (BaseException): Error del último intento
+            attempt (int): Intentos ya hechos
+            deadline_at (Optional[float]): Vencimiento de la llamada (ver deadline_at)
+            now (Optional[float]): Instante actual (por defecto time.monotonic())
+        
+        Returns:
+            Optional[float]: Segundos a esperar o None si no se reintenta
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(error):
+            return None
+        delay = self.backoff(attempt)
+        if deadline_at is not None and (time.monotonic() if now is None else now) + delay >= deadline_at:
+            return None
+        return delay
+
+class CircuitBreaker:
+    """
+    Corta las llamadas al proveedor mientras está caído.
+    
+    Cerrado, las llamadas pasan y se cuentan los fallos transitorios
+    seguidos; al llegar a failure_threshold el circuito se abre y las
+    llamadas fallan de inmediato con CircuitOpenError. Pasado
+    reset_timeout queda semiabierto: deja pasar una llamada de prueba, que
+    lo cierra si sale bien o lo vuelve a abrir si falla. Es seguro entre
+    hilos y puede compartirse entre clientes del mismo proveedor.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 reset_timeout: float = LLM_BREAKER_RESET_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.transitions = Counter()
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        """Estado actual, considerando el paso de abierto a semiabierto."""
+        with self._lock:
+            self._refresh()
+            return self._state
+    
+    def _refresh(self) -> None:
+        """Pasa a semiabierto si ya venció la espera (con el lock tomado)."""
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+    
+    def _transition(self, state: str) -> None:
+        """Cambia de estado y lo cuenta (con el lock tomado)."""
+        self.transitions[f"{self._state}->{state}"] += 1
+        self._state = state
+        if state == self.OPEN:
+            self._opened_at = self._clock()
+        self._probing = False
+    
+    def before_call(self) -> None:
+        """
+        Reserva el paso de una llamada.
+        
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay una
+                llamada de prueba en curso
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(self.reset_timeout - (self._clock() - self._opened_at), 0)
+        raise CircuitOpenError(f"LLM provider unavailable (circuit open, retry in {retry_in:.1f}s)")
+    
+    def record_success(self) -> None:
+        """Registra una respuesta del proveedor."""
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+    
+    def release(self) -> None:
+        """Libera la llamada de prueba que terminó sin resultado (p. ej. cancelada)."""
+        with self._lock:
+            self._probing = False
+    
+    def record_failure(self) -> None:
+        """Registra un fallo transitorio del proveedor."""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+    
+    def stats(self) -> Dict:
+        """Retorna el estado y los contadores del circuito."""
+        with self._lock:
+            self._refresh()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "rejected": self.rejected,
+                "transitions": dict(self.transitions)
+            }
@@ -3,6 +3,9 @@ Module for handling prompts and response analysis templates.
 """
 from typing import Dict, List, Optional, Tuple
 
+from keyword_matcher import Lexicon
+from question_flow import QUESTION_FLOW
+
 # Definición de categorías de síntomas y sus pesos
 SYMPTOM_WEIGHTS = {
     "mood": {
@@ -98,6 +101,78 @@ REQUIRED_TOPICS = [
     "coping_mechanisms"  # Mecanismos de afrontamiento
 ]
 
+# Mapeo de palabras clave a síntomas
+SYMPTOM_KEYWORDS = {
+    "triste": "depressed_mood",
+    "deprimid": "depressed_mood",
+    "sin esperanza": "hopelessness",
+    "sin ganas": "loss_of_interest",
+    "ansios": "excessive_worry",
+    "preocupad": "excessive_worry",
+    "dormir": "sleep_changes",
+    "duerm": "sleep_changes",
+    "insomnio": "sleep_changes",
+    "cansad": "fatigue",
+    "sin energía": "energy_loss",
+    "sol": "isolation",
+    "aislad": "isolation",
+    "miedo": "fear",
+    "pánico": "panic_attacks",
+    "daño": "self_harm",
+    "morir": "suicidal_ideation",
+    "suicid": "suicidal_ideation",
+    "concentr": "concentration_problems",
+    "trabajar": "work_impact",
+    "relacion": "relationship_impact"
+}
+
+# Palabras que indican riesgo y priorizan la pregunta de autolesión
+RISK_KEYWORDS = ["suicid", "morir", "muerte", "daño", "crisis"]
+
+# Señales de riesgo que disparan la pregunta de seguimiento inmediata
+ACUTE_RISK_KEYWORDS = ["suicid", "morir", "daño", "muerte"]
+
+# Emociones que motivan indagar cambios de ánimo
+EMOTION_KEYWORDS = ["triste", "ansios", "preocupa", "angustia", "miedo"]
+
+# Términos que se buscan en la respuesta a una pregunta concreta
+PERSISTENT_DURATION_KEYWORDS = ["semana", "mes"]
+SLEEP_PROBLEM_KEYWORDS = ["mal", "poco", "mucho", "problema", "no duermo", "casi no", "dificultad"]
+SUPPORT_KEYWORDS = ["sí", "si", "familia", "amigo"]
+PROTECTIVE_SUPPORT_KEYWORDS = ["sí", "si", "familia", "amigos"]
+
+# Palabras que relacionan una pregunta o respuesta con cada tema
+TOPIC_KEYWORDS = {
+    "main_concern": ["preocupa", "problema", "motivo", "razón"],
+    "duration": ["tiempo", "desde", "hace", "cuando"],
+    "daily_impact": ["afecta", "impacto", "trabajo", "estudio", "relaciones"],
+    "mood_changes": ["ánimo", "cambios", "sientes", "emociones"],
+    "sleep": ["dormir", "sueño", "descanso", "insomnio"],
+    "support": ["apoyo", "familia", "amigos", "cerca"],
+    "previous_help": ["ayuda", "profesional", "terapeuta", "psicólogo"],
+    "self_harm": ["daño", "morir", "suicid", "lastimar"],
+    "substance_use": ["alcohol", "drogas", "sustancias", "consumo"],
+    "coping_mechanisms": ["ayuda", "calma", "mejora", "alivio"]
+}
+
+# Todas las listas anteriores reunidas en un único léxico: cada texto se
+# analiza una vez (y se recuerda) y se consulta por categoría
+TRIAGE_LEXICON = Lexicon({
+    "symptom": SYMPTOM_KEYWORDS,
+    "risk": RISK_KEYWORDS,
+    "acute_risk": ACUTE_RISK_KEYWORDS,
+    "emotion": EMOTION_KEYWORDS,
+    "persistent_duration": PERSISTENT_DURATION_KEYWORDS,
+    "sleep_problem": SLEEP_PROBLEM_KEYWORDS,
+    "sleep_complaint": ["mal", "dorm"],
+    "support": SUPPORT_KEYWORDS,
+    "protective_support": PROTECTIVE_SUPPORT_KEYWORDS,
+    "work": ["trabajo"],
+    "work_or_study": ["trabajo", "estudio"],
+    "affirmative": ["sí"],
+    **{f"topic:{topic}": keywords for topic, keywords in TOPIC_KEYWORDS.items()}
+})
+
 def format_analysis_prompt(responses: Dict[str, str]) -> str:
     """
     Genera el prompt final para el análisis de las respuestas.
@@ -221,40 +296,9 @@ def get_next_question(previous_responses: Dict[str, str]) -> Optional[str]:
     Returns:
         Optional[str]: ID de la siguiente pregunta o None si no hay más preguntas
     """
-    # Lista de preguntas en orden
-    question_sequence = [
-        "main_concern",
-        "duration",
-        "daily_impact",
-        "mood_changes",
-        "sleep",
-        "support",
-        "previous_help",
-        "self_harm",
-        "substance_use",
-        "coping_mechanisms"
-    ]
-    
-    # Si no hay respuestas previas, comenzar con la primera pregunta
-    if not previous_responses:
-        return question_sequence[0]
-    
-    # Obtener todas las preguntas ya realizadas
-    asked_questions = set(previous_responses.keys())
-    
-    # Priorizar preguntas de seguridad si aún no se han hecho y hay indicadores de riesgo
-    if ("self_harm" not in asked_questions and
-        any(risk_word in str(previous_responses.values()).lower() 
-            for risk_word in ["suicid", "morir", "muerte", "daño", "crisis"])):
-        return "self_harm"
-    
-    # Encontrar la siguiente pregunta en la secuencia
-    for question in question_sequence:
-        if question not in asked_questions:
-            return question
-    
-    # Si todas las preguntas han sido respondidas
-    return None
+    # Misma tabla de transiciones que usa el chatbot
+    risk = any(TRIAGE_LEXICON.scan(response).any("risk") for response in previous_responses.values())
+    return QUESTION_FLOW.next_question(QUESTION_FLOW.mask_of(previous_responses), ("risk",) if risk else ())
 
 def get_conversation_prompt(
     current_message: str,
@@ -311,4 +355,34 @@ SEÑALES DE RIESGO A VIGILAR:
 Por favor, genera una respuesta natural y empática que ayude a explorar los temas pendientes,
 manteniendo el flujo de la conversación y respondiendo apropiadamente al último mensaje del usuario."""
 
-    return prompt 
\ No newline at end of file
+    return prompt 
+
+def get_reply_prompt(
+    current_message: str,
+    chat_history: List[Tuple[str, str]],
+    covered_topics: Dict[str, bool],
+    collected_responses: Dict[str, str],
+    next_question: str
+) -> str:
+    """
+    Genera el prompt para que el LLM redacte la siguiente pregunta del cuestionario.
+    
+    Args:
+        current_message (str): Mensaje actual del usuario
+        chat_history (List[Tuple[str, str]]): Historial previo al mensaje actual
+        covered_topics (Dict[str, bool]): Temas cubiertos hasta el momento
+        collected_responses (Dict[str, str]): Respuestas recolectadas
+        next_question (str): Pregunta del cuestionario que debe hacerse
+    
+    Returns:
+        str: Prompt para el LLM
+    """
+    prompt = get_conversation_prompt(current_message, chat_history, covered_topics, collected_responses)
+    prompt += f"""
+
+Último mensaje del usuario: {current_message}
+
+La siguiente pregunta del cuestionario es: "{next_question}"
+Responde en no más de tres oraciones y termina haciendo esa pregunta con tus palabras, sin cambiar su sentido."""
+
+    return prompt
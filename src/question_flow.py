@@ -0,0 +1,131 @@
+"""
+Module for the table-driven question flow of the triage conversation.
+"""
+import os
+import json
+from typing import Collection, Dict, Iterable, Optional
+
+# Archivo JSON con un flujo alternativo (misma estructura que DEFAULT_FLOW_CONFIG)
+QUESTION_FLOW_PATH = os.getenv('QUESTION_FLOW_PATH')
+
+# Orden de las preguntas y saltos prioritarios: si una señal está activa y su
+# pregunta no se respondió, se pregunta antes que el resto de la secuencia
+DEFAULT_FLOW_CONFIG = {
+    "sequence": [
+        "main_concern",
+        "duration",
+        "daily_impact",
+        "mood_changes",
+        "sleep",
+        "support",
+        "previous_help",
+        "self_harm",
+        "substance_use",
+        "coping_mechanisms"
+    ],
+    "priority": [
+        {"signal": "risk", "question": "self_harm"}
+    ]
+}
+
+class QuestionFlow:
+    """
+    Flujo de preguntas compilado a partir de su configuración.
+    
+    Cada pregunta ocupa un bit según su posición en la secuencia, así que las
+    preguntas respondidas de una sesión son un entero. La siguiente pregunta
+    es el primer salto prioritario aplicable o, si no hay ninguno, el bit en
+    cero más bajo de la máscara: ambas consultas son O(1) y no recorren las
+    respuestas ni el historial.
+    """
+    
+    def __init__(self, sequence: Iterable[str], priority: Iterable[Dict[str, str]] = ()):
+        self.sequence = tuple(sequence)
+        if not self.sequence:
+            raise ValueError("El flujo de preguntas está vacío")
+        if len(set(self.sequence)) != len(self.sequence):
+            raise ValueError("El flujo de preguntas tiene IDs repetidos")
+        self.bits = {question_id: 1 << index for index, question_id in enumerate(self.sequence)}
+        self.full_mask = (1 << len(self.sequence)) - 1
+        
+        # Tabla de saltos: (señal, bit de la pregunta, ID de la pregunta)
+        rules = []
+        for rule in priority:
+            question_id = rule.get("question")
+            if question_id not in self.bits or not rule.get("signal"):
+                raise ValueError(f"Salto prioritario inválido: {rule}")
+            rules.append((rule["signal"], self.bits[question_id], question_id))
+        self.priority = tuple(rules)
+    
+    @classmethod
+    def from_config(cls, config: Dict) -> "QuestionFlow":
+        """
+        Compila un flujo desde un diccionario de configuración.
+        
+        Args:
+            config (Dict): Claves "sequence" (lista de IDs) y "priority"
+                (lista de {"signal", "question"})
+        
+        Returns:
+            QuestionFlow: Flujo compilado
+        
+        Raises:
+            ValueError: Si la configuración no es válida
+        """
+        if not isinstance(config, dict) or not isinstance(config.get("sequence"), list):
+            raise ValueError("La configuración del flujo debe tener una lista 'sequence'")
+        return cls(config["sequence"], config.get("priority", []))
+    
+    def mask_of(self, answered: Iterable[str]) -> int:
+        """
+        Calcula la máscara de un conjunto de preguntas respondidas.
+        
+        Args:
+            answered (Iterable[str]): IDs respondidos (los ajenos al flujo se ignoran)
+        
+        Returns:
+            int: Máscara de bits
+        """
+        mask = 0
+        for question_id in answered:
+            mask |= self.bits.get(question_id, 0)
+        return mask
+    
+    def next_question(self, answered_mask: int, signals: Collection[str] = ()) -> Optional[str]:
+        """
+        Determina la siguiente pregunta.
+        
+        Args:
+            answered_mask (int): Preguntas respondidas (ver mask_of)
+            signals (Collection[str]): Señales activas de la sesión, p. ej. "risk"
+        
+        Returns:
+            Optional[str]: ID de la siguiente pregunta o None si no quedan
+        """
+        for signal, bit, question_id in self.priority:
+            if signal in signals and not answered_mask & bit:
+                return question_id
+        if answered_mask & self.full_mask == self.full_mask:
+            return None
+        # Bit en cero más bajo: primera pregunta de la secuencia sin responder
+        lowest_free = ~answered_mask & (answered_mask + 1)
+        return self.sequence[lowest_free.bit_length() - 1]
+
+def load_flow(path: str) -> QuestionFlow:
+    """
+    Carga un flujo de preguntas desde un archivo JSON.
+    
+    Args:
+        path (str): Ruta del archivo
+    
+    Returns:
+        QuestionFlow: Flujo compilado
+    
+    Raises:
+        ValueError: Si el archivo no contiene una configuración válida
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return QuestionFlow.from_config(json.load(f))
+
+# Flujo activo, compilado una sola vez al importar el módulo
+QUESTION_FLOW = load_flow(QUESTION_FLOW_PATH) if QUESTION_FLOW_PATH else QuestionFlow.from_config(DEFAULT_FLOW_CONFIG)
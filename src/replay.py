@@ -0,0 +1,213 @@
+"""
+Module for replaying stored conversations through the current triage rules.
+"""
+import os
+import time
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import storage
+from symptom_state import SymptomState
+from scoring_engine import SCORING_ENGINE
+
+# Conversaciones por bloque enviado a cada proceso
+REPLAY_CHUNK_SIZE = int(os.getenv('REPLAY_CHUNK_SIZE', '1000'))
+
+# Ejemplos de conversaciones con cambios que se incluyen en el reporte
+REPLAY_SAMPLE_LIMIT = 20
+
+# (ID, respuestas, urgencia guardada o None, condiciones guardadas)
+Payload = Tuple[str, Dict[str, str], Optional[str], Tuple[str, ...]]
+
+def replay_payload(conversation: Dict) -> Payload:
+    """
+    Extrae de una conversación almacenada lo necesario para reanalizarla.
+    
+    Args:
+        conversation (Dict): Conversación con la estructura de almacenamiento
+    
+    Returns:
+        Payload: ID, respuestas, urgencia y condiciones del análisis guardado
+    """
+    content = conversation.get("conversation", {})
+    analysis = content.get("analysis")
+    urgency = None
+    conditions: Tuple[str, ...] = ()
+    if isinstance(analysis, dict):
+        urgency = analysis.get("urgency_level")
+        conditions = tuple(
+            diagnosis["condition"] for diagnosis in analysis.get("preliminary_diagnoses", [])
+            if isinstance(diagnosis, dict) and "condition" in diagnosis
+        )
+    return (
+        conversation.get("metadata", {}).get("conversation_id", ""),
+        content.get("responses", {}),
+        urgency,
+        conditions
+    )
+
+def diff_chunk(chunk: List[Payload], sample_limit: int = REPLAY_SAMPLE_LIMIT) -> Dict:
+    """
+    Reanaliza un bloque de conversaciones y resume las diferencias.
+    
+    Se ejecuta en los procesos del pool. La urgencia y los diagnósticos
+    salen de SCORING_ENGINE, igual que en el análisis del chatbot, con una
+    sola puntuación para todo el bloque; solo se devuelve el resumen.
+    
+    Args:
+        chunk (List[Payload]): Conversaciones del bloque (ver replay_payload)
+        sample_limit (int): Máximo de ejemplos de cambios del bloque
+    
+    Returns:
+        Dict: Contadores parciales y ejemplos de cambios
+    """
+    states = [SymptomState.from_responses(responses) for _, responses, _, _ in chunk]
+    scores = SCORING_ENGINE.score([state.symptoms for state in states])
+    transitions = Counter()
+    gained = Counter()
+    lost = Counter()
+    changed = 0
+    unanalyzed = 0
+    samples = []
+    for row, (conversation_id, _, old_urgency, old_conditions) in enumerate(chunk):
+        new_urgency = scores.urgency_level(row)
+        if old_urgency is None:
+            unanalyzed += 1
+            continue
+        new_conditions = scores.conditions(row)
+        transitions[(old_urgency, new_urgency)] += 1
+        added = [condition for condition in new_conditions if condition not in old_conditions]
+        removed = [condition for condition in old_conditions if condition not in new_conditions]
+        gained.update(added)
+        lost.update(removed)
+        if old_urgency != new_urgency or added or removed:
+            changed += 1
+            if len(samples) < sample_limit:
+                samples.append({
+                    "conversation_id": conversation_id,
+                    "urgency": [old_urgency, new_urgency],
+                    "gained": added,
+                    "lost": removed
+                })
+    return {
+        "conversations": len(chunk),
+        "unanalyzed": unanalyzed,
+        "changed": changed,
+        "transitions": transitions,
+        "gained": gained,
+        "lost": lost,
+        "samples": samples
+    }
+
+def iter_payload_chunks(conversations: Iterable[Dict], chunk_size: int) -> Iterator[List[Payload]]:
+    """Agrupa las conversaciones en bloques de payloads."""
+    chunk = []
+    for conversation in conversations:
+        chunk.append(replay_payload(conversation))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def replay_conversations(conversations: Iterable[Dict], workers: Optional[int] = None,
+                         chunk_size: int = REPLAY_CHUNK_SIZE,
+                         sample_limit: int = REPLAY_SAMPLE_LIMIT) -> Dict:
+    """
+    Reanaliza conversaciones con las reglas actuales y compara con lo guardado.
+    
+    Args:
+        conversations (Iterable[Dict]): Conversaciones almacenadas
+        workers (Optional[int]): Procesos del pool (por defecto, uno por CPU;
+            1 procesa en el proceso actual)
+        chunk_size (int): Conversaciones por bloque
+        sample_limit (int): Máximo de ejemplos de cambios en el reporte
+    
+    Returns:
+        Dict: Reporte con transiciones de urgencia (anterior -> actual),
+            diagnósticos ganados y perdidos por condición, ejemplos y
+            rendimiento
+    """
+    started = time.monotonic()
+    workers = workers or os.cpu_count() or 1
+    totals = Counter()
+    transitions = Counter()
+    gained = Counter()
+    lost = Counter()
+    samples: List[Dict] = []
+    
+    def merge(results: Iterable[Dict]) -> None:
+        for result in results:
+            for field in ("conversations", "unanalyzed", "changed"):
+                totals[field] += result[field]
+            transitions.update(result["transitions"])
+            gained.update(result["gained"])
+            lost.update(result["lost"])
+            samples.extend(result["samples"][:max(sample_limit - len(samples), 0)])
+    
+    chunks = iter_payload_chunks(conversations, chunk_size)
+    diff = partial(diff_chunk, sample_limit=sample_limit)
+    if workers == 1:
+        merge(map(diff, chunks))
+    else:
+        with Pool(processes=workers) as pool:
+            merge(pool.imap_unordered(diff, chunks))
+    
+    elapsed = time.monotonic() - started
+    urgency_transitions: Dict[str, Dict[str, int]] = {}
+    for (old, new), count in sorted(transitions.items()):
+        urgency_transitions.setdefault(old, {})[new] = count
+    return {
+        "conversations": totals["conversations"],
+        "analyzed": totals["conversations"] - totals["unanalyzed"],
+        "changed": totals["changed"],
+        "urgency_transitions": urgency_transitions,
+        "diagnoses": {
+            condition: {"gained": gained[condition], "lost": lost[condition]}
+            for condition in sorted(set(gained) | set(lost))
+        },
+        "samples": samples,
+        "elapsed_seconds": round(elapsed, 3),
+        "conversations_per_second": round(totals["conversations"] / elapsed, 1) if elapsed else 0.0
+    }
+
+def replay_storage(**kwargs) -> Dict:
+    """
+    Reanaliza todas las conversaciones del almacenamiento activo y del archivo.
+    
+    Args:
+        **kwargs: Opciones de replay_conversations
+    
+    Returns:
+        Dict: Reporte de diferencias
+    """
+    return replay_conversations(storage.iter_all_conversations(), **kwargs)
+
+def format_report(report: Dict) -> str:
+    """
+    Formatea el reporte de diferencias como texto.
+    
+    Args:
+        report (Dict): Reporte de replay_conversations
+    
+    Returns:
+        str: Resumen legible
+    """
+    lines = [
+        f"Conversaciones: {report['conversations']} ({report['analyzed']} con análisis), "
+        f"con cambios: {report['changed']}",
+        f"Rendimiento: {report['conversations_per_second']} conversaciones/s "
+        f"en {report['elapsed_seconds']}s",
+        "Urgencia (guardada -> actual):"
+    ]
+    for old, targets in report["urgency_transitions"].items():
+        for new, count in targets.items():
+            marker = "" if old == new else "  *"
+            lines.append(f"  {old:>5} -> {new:<5} {count}{marker}")
+    if report["diagnoses"]:
+        lines.append("Diagnósticos:")
+        for condition, change in report["diagnoses"].items():
+            lines.append(f"  {condition}: +{change['gained']} -{change['lost']}")
+    return "\n".join(lines)
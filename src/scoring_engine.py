@@ -0,0 +1,169 @@
+"""
+Module for vectorized urgency and diagnostic scoring of symptom sets.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from prompts import SYMPTOM_WEIGHTS, DIAGNOSTIC_CRITERIA, URGENCY_CRITERIA
+
+# Niveles de urgencia por índice, de menor a mayor
+URGENCY_LEVELS = ("BAJO", "MEDIO", "ALTO")
+
+class ScoreBatch:
+    """
+    Resultado de puntuar N conjuntos de síntomas.
+    
+    Attributes:
+        urgency (np.ndarray): Índice en URGENCY_LEVELS por fila, forma (N,)
+        weight (np.ndarray): Peso total de los síntomas por fila, forma (N,)
+        eligible (np.ndarray): Cumplimiento de cada criterio, forma (N, C)
+        confidence (np.ndarray): Confianza en porcentaje, forma (N, C)
+    """
+    
+    __slots__ = ("engine", "urgency", "weight", "eligible", "confidence")
+    
+    def __init__(self, engine: "ScoringEngine", urgency: np.ndarray, weight: np.ndarray,
+                 eligible: np.ndarray, confidence: np.ndarray):
+        self.engine = engine
+        self.urgency = urgency
+        self.weight = weight
+        self.eligible = eligible
+        self.confidence = confidence
+    
+    def __len__(self) -> int:
+        return len(self.urgency)
+    
+    def urgency_level(self, row: int) -> str:
+        """Nivel de urgencia de una fila (BAJO, MEDIO, ALTO)."""
+        return URGENCY_LEVELS[self.urgency[row]]
+    
+    def conditions(self, row: int) -> List[str]:
+        """Condiciones cuyos criterios cumple una fila, en el orden de los criterios."""
+        return [self.engine.conditions[index] for index in np.flatnonzero(self.eligible[row])]
+    
+    def diagnoses(self, row: int, symptoms: Sequence[str]) -> List[Dict]:
+        """
+        Diagnósticos preliminares de una fila.
+        
+        Args:
+            row (int): Fila del lote
+            symptoms (Sequence[str]): Síntomas de esa fila, en su orden original
+        
+        Returns:
+            List[Dict]: Condición, confianza e indicadores de cada criterio cumplido
+        """
+        result = []
+        for index in np.flatnonzero(self.eligible[row]):
+            relevant = self.engine.relevant_sets[index]
+            result.append({
+                "condition": self.engine.conditions[index],
+                "confidence": float(self.confidence[row, index]),
+                "key_indicators": [symptom for symptom in symptoms if symptom in relevant]
+            })
+        return result
+
+class ScoringEngine:
+    """
+    Pesos de síntomas y criterios diagnósticos compilados en arreglos de NumPy.
+    
+    Un lote de conjuntos de síntomas se codifica como una matriz de conteos
+    (N × V, con V el vocabulario de síntomas); la urgencia, el cumplimiento de
+    criterios y la confianza salen de unos pocos productos con el vector de
+    pesos y las matrices condición × síntoma. Los síntomas repetidos cuentan
+    tantas veces como aparecen, igual que en calculate_urgency_level y
+    validate_diagnosis.
+    """
+    
+    def __init__(self, weights: Dict = SYMPTOM_WEIGHTS,
+                 criteria: Dict = DIAGNOSTIC_CRITERIA,
+                 urgency_criteria: Dict = URGENCY_CRITERIA):
+        high_urgency = urgency_criteria["ALTO"]["required"]
+        vocabulary = [symptom for category in weights.values() for symptom in category]
+        for condition in criteria.values():
+            vocabulary += condition.get("required_symptoms", []) + condition.get("additional_symptoms", [])
+        vocabulary += high_urgency
+        self.symptoms = tuple(dict.fromkeys(vocabulary))
+        self.index = {symptom: position for position, symptom in enumerate(self.symptoms)}
+        size = len(self.symptoms)
+        
+        # Vector de pesos (un síntoma puede sumar en varias categorías)
+        self.weights = np.zeros(size, dtype=np.int64)
+        for category in weights.values():
+            for symptom, weight in category.items():
+                self.weights[self.index[symptom]] += weight
+        self.high_urgency = np.zeros(size, dtype=np.int64)
+        self.high_urgency[[self.index[symptom] for symptom in high_urgency]] = 1
+        self.medium_threshold = urgency_criteria["MEDIO"]["threshold"]
+        
+        # Matrices condición × síntoma
+        self.conditions = tuple(criteria)
+        self.required = np.zeros((len(self.conditions), size), dtype=np.int64)
+        self.relevant = np.zeros((len(self.conditions), size), dtype=np.int64)
+        total_possible = []
+        minimum = []
+        for row, condition in enumerate(criteria.values()):
+            required = condition.get("required_symptoms", [])
+            additional = condition.get("additional_symptoms", [])
+            self.required[row, [self.index[symptom] for symptom in required]] = 1
+            self.relevant[row, [self.index[symptom] for symptom in required + additional]] = 1
+            total_possible.append(len(required) + len(additional))
+            minimum.append(condition.get("minimum_symptoms", 0))
+        self.required_count = self.required.sum(axis=1)
+        self.minimum = np.array(minimum, dtype=np.int64)
+        self.total_possible = np.maximum(np.array(total_possible, dtype=np.float64), 1)
+        self.relevant_sets = tuple(
+            frozenset(self.symptoms[index] for index in np.flatnonzero(row)) for row in self.relevant
+        )
+    
+    def encode(self, symptom_sets: Iterable[Sequence[str]]) -> np.ndarray:
+        """
+        Codifica conjuntos de síntomas como matriz de conteos.
+        
+        Args:
+            symptom_sets (Iterable[Sequence[str]]): Síntomas de cada fila
+                (los que no tienen peso ni criterio se ignoran)
+        
+        Returns:
+            np.ndarray: Conteos de forma (N, V)
+        """
+        # Cada síntoma se traduce a su celda en la matriz aplanada y los
+        # conteos salen de un único bincount
+        size = len(self.symptoms)
+        index = self.index
+        cells = []
+        rows = 0
+        for symptoms in symptom_sets:
+            offset = rows * size
+            cells.extend(offset + index[symptom] for symptom in symptoms if symptom in index)
+            rows += 1
+        counts = np.bincount(np.array(cells, dtype=np.int64), minlength=rows * size)
+        return counts.reshape(rows, size)
+    
+    def score(self, symptom_sets: Optional[Iterable[Sequence[str]]] = None,
+              counts: Optional[np.ndarray] = None) -> ScoreBatch:
+        """
+        Puntúa un lote de conjuntos de síntomas.
+        
+        Args:
+            symptom_sets (Optional[Iterable[Sequence[str]]]): Síntomas de cada fila
+            counts (Optional[np.ndarray]): Matriz ya codificada con encode
+        
+        Returns:
+            ScoreBatch: Urgencia, cumplimiento de criterios y confianza por fila
+        """
+        if counts is None:
+            counts = self.encode(symptom_sets or [])
+        present = (counts > 0).astype(np.int64)
+        
+        weight = counts @ self.weights
+        high = (present @ self.high_urgency) > 0
+        urgency = np.where(high, 2, np.where(weight >= self.medium_threshold, 1, 0))
+        
+        relevant_count = counts @ self.relevant.T
+        eligible = ((present @ self.required.T) == self.required_count) & (relevant_count >= self.minimum)
+        confidence = relevant_count / self.total_possible * 100
+        return ScoreBatch(self, urgency, weight, eligible, confidence)
+
+# Motor compilado con las tablas de prompts.py
+SCORING_ENGINE = ScoringEngine()
@@ -0,0 +1,368 @@
+"""
+Module for the compressed, append-only archive of old conversations.
+"""
+import os
+import json
+import bisect
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Cabecera de cada segmento: identifica el formato y el diccionario de compresión
+SEGMENT_MAGIC = b"TRIAGESEG"
+SEGMENT_VERSION = 1
+HEADER_SIZE = len(SEGMENT_MAGIC) + 1
+
+# Diccionario de compresión precargado con las claves y textos fijos que se
+# repiten en todas las conversaciones. Cambiarlo exige un nuevo SEGMENT_VERSION
+# conservando los anteriores para poder leer segmentos viejos.
+ZDICTS = {
+    1: json.dumps({
+        "metadata": {"conversation_id": "", "timestamp": "2025-01-01T00:00:00.000000", "version": "1.0"},
+        "conversation": {
+            "responses": {
+                "main_concern": "", "duration": "", "daily_impact": "", "mood_changes": "",
+                "sleep": "", "support": "", "previous_help": "", "self_harm": "",
+                "substance_use": "", "coping_mechanisms": ""
+            },
+            "analysis": {
+                "urgency_level": "BAJO MEDIO ALTO",
+                "main_concerns": ["Depressed Mood", "Excessive Worry", "Sleep Changes", "Persistent Symptoms"],
+                "preliminary_diagnoses": [{
+                    "condition": "Depresión Mayor Trastorno de Ansiedad Generalizada Trastorno de Pánico",
+                    "confidence": "50%", "key_indicators": [], "severity": "No especificada", "duration": None
+                }],
+                "risk_factors": [
+                    "Riesgo de autolesión o ideación suicida",
+                    "Uso problemático de sustancias",
+                    "Aislamiento social significativo"
+                ],
+                "protective_factors": ["Red de apoyo social disponible"],
+                "recommendations": [
+                    "Buscar ayuda profesional inmediata - contactar servicios de emergencia",
+                    "No permanecer solo/a - contactar a un familiar o amigo de confianza",
+                    "Programar consulta profesional en los próximos días",
+                    "Mantener contacto regular con red de apoyo",
+                    "Programar una evaluación profesional cuando sea conveniente",
+                    "Mantener registro de síntomas y su frecuencia"
+                ],
+                "timestamp": ""
+            }
+        }
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+}
+
+class SegmentArchive:
+    """
+    Archivo de conversaciones en segmentos comprimidos de solo anexado.
+    
+    Cada conversación se serializa en JSON compacto y se comprime por separado
+    con zlib y un diccionario precargado, de modo que puede leerse con un único
+    seek. Junto a cada `segment-NNNNNN.seg` se mantiene un índice
+    `segment-NNNNNN.idx` (una línea JSON por registro) con el offset, la
+    longitud y las columnas de resumen, por lo que el listado no necesita
+    descomprimir nada. Una entrada con `deleted` actúa como lápida.
+    """
+    
+    def __init__(self, directory: str, max_segment_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self._lock = threading.RLock()
+        # id -> (segmento, offset, longitud, resumen)
+        self._index: Dict[str, Tuple[int, int, int, Dict]] = {}
+        self._sorted_keys: Optional[List[Tuple[str, str]]] = None
+        # Bytes del índice ya leídos por segmento, para refrescar solo lo nuevo
+        self._index_offsets: Dict[int, int] = {}
+        self._loaded = False
+    
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.seg")
+    
+    def _index_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.idx")
+    
+    def _segments(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(name[len("segment-"):-len(".idx")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".idx")
+        )
+    
+    def refresh(self) -> None:
+        """Incorpora al índice en memoria los registros anexados por otros procesos."""
+        with self._lock:
+            for segment in self._segments():
+                offset = self._index_offsets.get(segment, 0)
+                path = self._index_path(segment)
+                if os.path.getsize(path) <= offset:
+                    self._index_offsets.setdefault(segment, offset)
+                    continue
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read()
+                # Ignorar una última línea incompleta (escritura en curso)
+                complete = data[:data.rfind(b"\n") + 1]
+                for line in complete.splitlines():
+                    self._apply_index_entry(segment, json.loads(line))
+                self._index_offsets[segment] = offset + len(complete)
+            self._loaded = True
+    
+    def _has_updates(self) -> bool:
+        """
+        Indica si otro proceso anexó registros desde el último refresh.
+        
+        Solo se anexa al último segmento o a uno nuevo con el número siguiente,
+        así que bastan dos stat en lugar de listar el directorio.
+        """
+        with self._lock:
+            last = max(self._index_offsets, default=0)
+            offset = self._index_offsets.get(last, 0)
+        try:
+            if last and os.path.getsize(self._index_path(last)) > offset:
+                return True
+        except OSError:
+            return True
+        return os.path.exists(self._index_path(last + 1))
+    
+    def _refresh_if_updated(self) -> None:
+        """Refresca el índice solo si hay registros nuevos en disco."""
+        if self._has_updates():
+            self.refresh()
+    
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.refresh()
+    
+    def _apply_index_entry(self, segment: int, entry: Dict) -> None:
+        conversation_id = entry["id"]
+        previous = self._index.pop(conversation_id, None)
+        if previous is not None and self._sorted_keys is not None:
+            key = (previous[3]["timestamp"], conversation_id)
+            position = bisect.bisect_left(self._sorted_keys, key)
+            if position < len(self._sorted_keys) and self._sorted_keys[position] == key:
+                del self._sorted_keys[position]
+        if entry.get("deleted"):
+            return
+        summary = {
+            "id": conversation_id,
+            "timestamp": entry["timestamp"],
+            "main_concern": entry["main_concern"],
+            "urgency_level": entry["urgency_level"]
+        }
+        self._index[conversation_id] = (segment, entry["offset"], entry["length"], summary)
+        if self._sorted_keys is not None:
+            bisect.insort(self._sorted_keys, (summary["timestamp"], conversation_id))
+    
+    def __contains__(self, conversation_id: str) -> bool:
+        self._ensure_loaded()
+        if conversation_id in self._index:
+            return True
+        # Otro proceso (p. ej. `main.py compact`) pudo archivarla después de cargar el índice
+        self._refresh_if_updated()
+        return conversation_id in self._index
+    
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._index)
+    
+    def _current_segment(self) -> int:
+        segments = self._segments()
+        if not segments:
+            return 1
+        last = segments[-1]
+        if os.path.exists(self._segment_path(last)) and os.path.getsize(self._segment_path(last)) >= self.max_segment_bytes:
+            return last + 1
+        return last
+    
+    def _append_entries(self, records: List[Tuple[Dict, Optional[bytes]]]) -> None:
+        """Anexa registros (entrada de índice, datos comprimidos) y sincroniza a disco."""
+        os.makedirs(self.directory, exist_ok=True)
+        segment = self._current_segment()
+        segment_path = self._segment_path(segment)
+        index_lines = []
+        with open(segment_path, 'ab') as seg:
+            if seg.tell() == 0:
+                seg.write(SEGMENT_MAGIC + bytes([SEGMENT_VERSION]))
+            for entry, payload in records:
+                if payload is not None:
+                    entry["offset"] = seg.tell()
+                    entry["length"] = len(payload)
+                    seg.write(payload)
+                index_lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+            seg.flush()
+            os.fsync(seg.fileno())
+        # El índice se escribe después de los datos: nunca apunta a bytes inexistentes
+        with open(self._index_path(segment), 'a', encoding='utf-8') as idx:
+            idx.write("".join(index_lines))
+            idx.flush()
+            os.fsync(idx.fileno())
+    
+    def append_many(self, conversations: List[Dict]) -> int:
+        """
+        Anexa un lote de conversaciones al segmento activo.
+        
+        Args:
+            conversations (List[Dict]): Conversaciones completas
+        
+        Returns:
+            int: Bytes comprimidos escritos
+        """
+        from storage import summarize_conversation
+        
+        records = []
+        written = 0
+        for conversation in conversations:
+            compressor = zlib.compressobj(9, zdict=ZDICTS[SEGMENT_VERSION])
+            raw = json.dumps(conversation, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            payload = compressor.compress(raw) + compressor.flush()
+            summary = summarize_conversation(conversation)
+            records.append((dict(summary), payload))
+            written += len(payload)
+        with self._lock:
+            self._ensure_loaded()
+            self._append_entries(records)
+            self.refresh()
+        return written
+    
+    def delete(self, conversation_id: str) -> None:
+        """Registra una lápida para que la conversación deje de existir en el archivo."""
+        with self._lock:
+            self._ensure_loaded()
+            if conversation_id not in self._index:
+                return
+            self._append_entries([({"id": conversation_id, "deleted": True}, None)])
+            self.refresh()
+    
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        """
+        Lee una conversación archivada con un único seek.
+        
+        Args:
+            conversation_id (str): ID de la conversación
+        
+        Returns:
+            Optional[Dict]: Conversación o None si no está archivada
+        """
+        self._ensure_loaded()
+        location = self._index.get(conversation_id)
+        if location is None:
+            self._refresh_if_updated()
+            location = self._index.get(conversation_id)
+            if location is None:
+                return None
+        segment, offset, length, _ = location
+        with open(self._segment_path(segment), 'rb') as f:
+            version = f.read(HEADER_SIZE)[-1]
+            f.seek(offset)
+            payload = f.read(length)
+        decompressor = zlib.decompressobj(zdict=ZDICTS[version])
+        return json.loads(decompressor.decompress(payload) + decompressor.flush())
+    
+    def iter_summaries(self, after: Optional[Tuple[str, str]] = None,
+                       limit: Optional[int] = None, filters=None) -> Iterator[Dict]:
+        """
+        Itera los resúmenes archivados del más reciente al más antiguo.
+        
+        Recorre la lista ordenada de claves en bloques delimitados por clave
+        (no por posición), así que no copia el índice completo y tolera que
+        otros hilos anexen registros mientras tanto.
+        """
+        lower = (filters.date_from, "") if filters is not None and filters.date_from else None
+        upper = after
+        if filters is not None and filters.date_to:
+            upper = min(upper, (filters.date_to, "")) if upper is not None else (filters.date_to, "")
+        yielded = 0
+        while limit is None or yielded < limit:
+            with self._lock:
+                self._ensure_loaded()
+                if self._sorted_keys is None:
+                    self._sorted_keys = sorted(
+                        (location[3]["timestamp"], conversation_id)
+                        for conversation_id, location in self._index.items()
+                    )
+                end = bisect.bisect_left(self._sorted_keys, upper) if upper is not None else len(self._sorted_keys)
+                start = bisect.bisect_left(self._sorted_keys, lower) if lower is not None else 0
+                chunk = self._sorted_keys[max(start, end - 256):end]
+            if not chunk:
+                return
+            for _, conversation_id in reversed(chunk):
+                location = self._index.get(conversation_id)
+                if location is None or (filters is not None and not filters.matches(location[3])):
+                    continue
+                yield location[3]
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            upper = chunk[0]
+    
+    def iter_conversations(self) -> Iterator[Dict]:
+        """Itera todas las conversaciones archivadas, sin orden definido."""
+        self._ensure_loaded()
+        for conversation_id in list(self._index):
+            conversation = self.load(conversation_id)
+            if conversation is not None:
+                yield conversation
+    
+    def stats(self) -> Dict:
+        """Retorna el tamaño del archivo en disco."""
+        self._ensure_loaded()
+        segments = self._segments()
+        return {
+            "conversations": len(self._index),
+            "segments": len(segments),
+            "bytes": sum(
+                os.path.getsize(path)
+                for segment in segments
+                for path in (self._segment_path(segment), self._index_path(segment))
+                if os.path.exists(path)
+            )
+        }
+
+def compact(backend, archive: SegmentArchive, older_than_days: int, batch_size: int = 500) -> int:
+    """
+    Mueve al archivo las conversaciones más antiguas que `older_than_days`.
+    
+    Cada lote se anexa y sincroniza en el archivo antes de borrarse del
+    almacenamiento activo, así que una conversación nunca deja de ser visible.
+    Si una conversación se reescribe mientras se compacta, se conserva la
+    versión activa y la copia archivada se anula con una lápida.
+    
+    Args:
+        backend (StorageBackend): Almacenamiento activo
+        archive (SegmentArchive): Archivo de destino
+        older_than_days (int): Antigüedad mínima en días
+        batch_size (int): Conversaciones por lote
+    
+    Returns:
+        int: Cantidad de conversaciones archivadas
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+    candidates = (
+        conversation["metadata"]["conversation_id"]
+        for conversation in backend.iter_conversations()
+        if conversation.get("metadata", {}).get("timestamp", "") < cutoff
+    )
+    archived = 0
+    while True:
+        batch = []
+        for conversation_id in candidates:
+            # El etag se toma antes de leer: si cambia después, la copia archivada es vieja
+            stat = backend.stat(conversation_id)
+            conversation = backend.load(conversation_id)
+            if conversation is not None:
+                batch.append((conversation_id, stat, conversation))
+            if len(batch) >= batch_size:
+                break
+        if not batch:
+            return archived
+        
+        archive.append_many([conversation for _, _, conversation in batch])
+        for conversation_id, stat, _ in batch:
+            if stat is not None and backend.stat(conversation_id) != stat:
+                archive.delete(conversation_id)
+                continue
+            backend.delete(conversation_id)
+            archived += 1
@@ -0,0 +1,144 @@
+"""
+Module for the per-session chatbot state store.
+"""
+import os
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Capacidad y tiempo de inactividad de las sesiones de chat
+SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '10000'))
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', '1800'))
+
+class SessionNotFoundError(KeyError):
+    """La sesión no existe o expiró por inactividad."""
+    pass
+
+class _Session:
+    __slots__ = ("state", "lock", "last_access")
+    
+    def __init__(self, state: Any, now: float):
+        self.state = state
+        self.lock = threading.Lock()
+        self.last_access = now
+
+class SessionStore:
+    """
+    Estado de conversación por sesión con capacidad acotada y expiración por
+    inactividad.
+    
+    Las sesiones se guardan en un OrderedDict en orden de último acceso, así
+    que las expiradas quedan al principio y se descartan sin recorrer el
+    resto. Un lock global protege solo el índice; cada sesión tiene su propio
+    lock para que las peticiones de una sesión se serialicen sin bloquear a
+    las demás. `on_evict` recibe el estado de cada sesión que expira o se
+    descarta por capacidad, para liberar lo que haya dejado en disco.
+    """
+    
+    def __init__(self, factory: Callable[[], Any],
+                 max_sessions: int = SESSION_MAX_COUNT,
+                 ttl_seconds: float = SESSION_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_evict: Optional[Callable[[Any], None]] = None):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+    
+    def _purge_expired(self, now: float, removed: List[Any]) -> None:
+        # Debe llamarse con self._lock tomado
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            removed.append(session.state)
+            self.expired += 1
+    
+    def _notify_evicted(self, removed: List[Any]) -> None:
+        # Fuera de self._lock: on_evict puede tocar el disco
+        if self.on_evict is None:
+            return
+        for state in removed:
+            self.on_evict(state)
+    
+    def create(self) -> Tuple[str, Any]:
+        """
+        Crea una sesión nueva con un estado recién construido.
+        
+        Si se alcanzó la capacidad se descarta la sesión usada hace más tiempo.
+        
+        Returns:
+            Tuple[str, Any]: ID de la sesión y su estado
+        """
+        state = self.factory()
+        session_id = secrets.token_urlsafe(16)
+        removed: List[Any] = []
+        with self._lock:
+            now = self.clock()
+            self._purge_expired(now, removed)
+            while len(self._sessions) >= self.max_sessions:
+                removed.append(self._sessions.popitem(last=False)[1].state)
+                self.evicted += 1
+            self._sessions[session_id] = _Session(state, now)
+            self.created += 1
+        self._notify_evicted(removed)
+        return session_id, state
+    
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Any]:
+        """
+        Entrega el estado de una sesión con su lock tomado.
+        
+        Args:
+            session_id (str): ID retornado por create
+        
+        Yields:
+            Any: Estado de la sesión
+        
+        Raises:
+            SessionNotFoundError: Si la sesión no existe o expiró
+        """
+        removed: List[Any] = []
+        with self._lock:
+            now = self.clock()
+            self._purge_expired(now, removed)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_access = now
+                self._sessions.move_to_end(session_id)
+        self._notify_evicted(removed)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        with session.lock:
+            yield session.state
+    
+    def discard(self, session_id: str) -> None:
+        """Elimina una sesión terminada; no hace nada si no existe."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+    
+    def stats(self) -> Dict:
+        """Retorna los contadores del almacén de sesiones."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted
+            }
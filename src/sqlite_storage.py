@@ -0,0 +1,219 @@
+"""
+SQLite storage backend for conversations with indexed summary columns.
+"""
+import os
+import json
+import sqlite3
+import time
+import threading
+from itertools import islice
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+from storage import StorageBackend, SummaryFilter, summarize_conversation
+
+# Documentos completos y resúmenes en tablas separadas: el listado del
+# historial solo recorre el índice de la tabla de resúmenes.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    document TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS conversation_summaries (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    main_concern TEXT NOT NULL DEFAULT '',
+    urgency_level TEXT NOT NULL DEFAULT 'BAJO'
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_timestamp
+    ON conversation_summaries (timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_summaries_urgency_timestamp
+    ON conversation_summaries (urgency_level, timestamp DESC, id DESC);
+"""
+
+# Índice de texto por trigramas sobre main_concern para búsquedas "contiene".
+# Comparte rowid con conversation_summaries.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE summary_fts USING fts5(main_concern, tokenize='trigram');
+INSERT INTO summary_fts (rowid, main_concern)
+    SELECT rowid, main_concern FROM conversation_summaries;
+"""
+
+# Las búsquedas de menos de 3 caracteres no pueden usar trigramas
+FTS_MIN_QUERY_LENGTH = 3
+
+# Filas del índice por fecha que se revisan antes de recurrir a trigramas
+TEXT_SCAN_BUDGET = 1000
+
+class SQLiteBackend(StorageBackend):
+    """
+    Backend embebido en SQLite. Usa una conexión por hilo y modo WAL para
+    permitir lecturas concurrentes mientras se escribe.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(conversations)")}
+            if "revision" not in columns:
+                conn.execute("ALTER TABLE conversations ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            has_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'summary_fts'"
+            ).fetchone()
+            if not has_fts:
+                conn.executescript(FTS_SCHEMA)
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL: cada commit es durable; save_many amortiza el fsync por lote
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+    
+    def save(self, conversation_data: Dict) -> str:
+        return self.save_many([conversation_data])[0]
+    
+    def save_many(self, conversations: List[Dict]) -> List[str]:
+        # Todo el lote se confirma en una sola transacción (un único fsync)
+        revision = time.time_ns()
+        documents = []
+        summaries = []
+        for conversation_data in conversations:
+            summary = summarize_conversation(conversation_data)
+            document = json.dumps(conversation_data, ensure_ascii=False, separators=(',', ':'))
+            documents.append((summary["id"], document, revision))
+            summaries.append((summary["id"], summary["timestamp"], summary["main_concern"], summary["urgency_level"]))
+        with self._connection() as conn:
+            # La revisión cambia en cada escritura y sirve como etag para la caché
+            conn.executemany(
+                "INSERT OR REPLACE INTO conversations (id, document, revision) VALUES (?, ?, ?)",
+                documents
+            )
+            # UPSERT conserva el rowid, que es la clave del índice de texto
+            conn.executemany(
+                "INSERT INTO conversation_summaries (id, timestamp, main_concern, urgency_level) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                "timestamp = excluded.timestamp, main_concern = excluded.main_concern, "
+                "urgency_level = excluded.urgency_level",
+                summaries
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO summary_fts (rowid, main_concern) "
+                "SELECT rowid, main_concern FROM conversation_summaries WHERE id = ?",
+                [(summary[0],) for summary in summaries]
+            )
+        return [summary[0] for summary in summaries]
+    
+    def stat(self, conversation_id: str) -> Optional[Tuple[Hashable, int]]:
+        row = self._connection().execute(
+            "SELECT revision, length(CAST(document AS BLOB)) FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+    
+    def exists(self, conversation_id: str) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone() is not None
+    
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT document FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def delete(self, conversation_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            conn.execute(
+                "DELETE FROM summary_fts WHERE rowid IN "
+                "(SELECT rowid FROM conversation_summaries WHERE id = ?)", (conversation_id,)
+            )
+            conn.execute("DELETE FROM conversation_summaries WHERE id = ?", (conversation_id,))
+    
+    def iter_conversations(self) -> Iterator[Dict]:
+        # Lectura por bloques de ID: es seguro modificar la tabla mientras se itera
+        last_id = ""
+        while True:
+            rows = self._connection().execute(
+                "SELECT id, document FROM conversations WHERE id > ? ORDER BY id LIMIT 500", (last_id,)
+            ).fetchall()
+            if not rows:
+                return
+            for _, document in rows:
+                yield json.loads(document)
+            last_id = rows[-1][0]
+    
+    def _select_summaries(self, conditions: List[str], params: List,
+                          limit: Optional[int]) -> Iterator[Dict]:
+        query = "SELECT id, timestamp, main_concern, urgency_level FROM conversation_summaries"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params = params + [limit]
+        for row in self._connection().execute(query, params):
+            yield {"id": row[0], "timestamp": row[1], "main_concern": row[2], "urgency_level": row[3]}
+    
+    def iter_summaries(self, after: Optional[Tuple[str, str]] = None,
+                       limit: Optional[int] = None,
+                       filters: Optional[SummaryFilter] = None) -> Iterator[Dict]:
+        # urgency_level y las fechas se resuelven con idx_summaries_urgency_timestamp
+        # o idx_summaries_timestamp sin salir del orden del listado
+        conditions = []
+        params = []
+        if after is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(after)
+        text = filters.main_concern if filters is not None else None
+        if filters is not None:
+            if filters.urgency_level:
+                conditions.append("urgency_level = ?")
+                params.append(filters.urgency_level)
+            if filters.date_from:
+                conditions.append("timestamp >= ?")
+                params.append(filters.date_from)
+            if filters.date_to:
+                conditions.append("timestamp < ?")
+                params.append(filters.date_to)
+        if not text:
+            yield from self._select_summaries(conditions, params, limit)
+            return
+        
+        # Un texto frecuente llena la página recorriendo pocas filas del índice
+        # por fecha; solo si no alcanza se consulta el índice de trigramas, que
+        # materializa todas las coincidencias.
+        if limit is not None:
+            page = []
+            scanned = 0
+            for summary in self._select_summaries(conditions, params, TEXT_SCAN_BUDGET):
+                scanned += 1
+                if filters.matches(summary):
+                    page.append(summary)
+                    if len(page) == limit:
+                        break
+            if len(page) == limit or scanned < TEXT_SCAN_BUDGET:
+                yield from page
+                return
+        
+        if len(text) >= FTS_MIN_QUERY_LENGTH:
+            conditions.append("rowid IN (SELECT rowid FROM summary_fts WHERE summary_fts MATCH ?)")
+            params.append('"' + text.replace('"', '""') + '"')
+            yield from self._select_summaries(conditions, params, limit)
+        else:
+            summaries = self._select_summaries(conditions, params, None)
+            yield from islice(filter(filters.matches, summaries), limit)
+    
+    def close(self) -> None:
+        """Cierra la conexión del hilo actual."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
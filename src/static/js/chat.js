@@ -13,6 +13,7 @@ const typingIndicator = document.getElementById('typing-indicator');
 
 // Variables de estado
 let currentQuestionId = null;
+let sessionId = null;
 
 // Mapeo de IDs de preguntas a sus textos
 const QUESTION_MAP = {
@@ -141,8 +142,9 @@ async function startConversation() {
         });
         
         if (response.ok) {
-            const message = await response.text();
-            await addMessage(message);
+            const data = await response.json();
+            sessionId = data.session_id;
+            await addMessage(data.message);
             setInputEnabled(true);
             loadHistory();
         } else {
@@ -169,10 +171,14 @@ async function sendMessage() {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ message })
+            body: JSON.stringify({ message, session_id: sessionId })
         });
 
-        if (response.ok) {
+        if (response.status === 404) {
+            // La sesión expiró por inactividad: se inicia una conversación nueva
+            await addMessage('La sesión expiró por inactividad. Iniciemos una nueva conversación.');
+            await startConversation();
+        } else if (response.ok) {
             const data = await response.json();
             
             if (data.analysis) {
@@ -7,27 +7,78 @@ document.addEventListener('DOMContentLoaded', function() {
     const conversationTemplate = document.getElementById('conversation-template');
     const conversationModal = document.getElementById('conversation-modal');
     const downloadReportBtn = document.getElementById('download-report');
+    const loadMoreBtn = document.getElementById('load-more');
 
-    let conversations = [];
+    let nextCursor = null;
+    let loadGeneration = 0;
+    let searchTimeout = null;
 
-    // Cargar conversaciones
-    function loadConversations() {
-        fetch('/api/history')
+    // Fecha local en formato ISO sin zona horaria, como los timestamps guardados
+    function toLocalISODate(date) {
+        const pad = n => String(n).padStart(2, '0');
+        return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+    }
+
+    // Parámetros de filtro que se envían al servidor
+    function buildFilterParams() {
+        const params = new URLSearchParams();
+        const searchTerm = searchInput.value.trim();
+        const urgency = urgencyFilter.value;
+        const dateRange = dateFilter.value;
+
+        if (searchTerm) {
+            params.set('main_concern', searchTerm);
+        }
+        if (urgency) {
+            params.set('urgency_level', urgency);
+        }
+        if (dateRange) {
+            const now = new Date();
+            const from = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+            if (dateRange === 'week') {
+                from.setDate(from.getDate() - 7);
+            } else if (dateRange === 'month') {
+                from.setMonth(from.getMonth() - 1);
+            }
+            params.set('from', toLocalISODate(from));
+        }
+        return params;
+    }
+
+    // Cargar una página de conversaciones; las siguientes se piden con "Cargar más"
+    function loadConversations(after = null) {
+        const generation = after ? loadGeneration : ++loadGeneration;
+        const params = buildFilterParams();
+        if (after) {
+            params.set('after', after);
+        }
+        loadMoreBtn.disabled = true;
+        fetch(`/api/history?${params.toString()}`)
             .then(response => response.json())
             .then(data => {
+                // Ignorar respuestas de una búsqueda anterior
+                if (generation !== loadGeneration) {
+                    return;
+                }
                 if (data.status === 'success') {
-                    conversations = data.conversations;
-                    renderConversations(conversations);
+                    renderConversations(data.conversations, Boolean(after));
+                    nextCursor = data.next_cursor || null;
+                    loadMoreBtn.classList.toggle('d-none', !nextCursor);
                 } else {
                     throw new Error(data.error || 'Error al cargar el historial');
                 }
             })
-            .catch(window.utils.handleError);
+            .catch(window.utils.handleError)
+            .finally(() => {
+                loadMoreBtn.disabled = false;
+            });
     }
 
-    // Renderizar conversaciones
-    function renderConversations(conversationsToRender) {
-        conversationList.innerHTML = '';
+    // Renderizar conversaciones (append agrega una página a las ya mostradas)
+    function renderConversations(conversationsToRender, append = false) {
+        if (!append) {
+            conversationList.innerHTML = '';
+        }
         
         conversationsToRender.forEach(conv => {
             const template = conversationTemplate.content.cloneNode(true);
@@ -139,59 +190,25 @@ document.addEventListener('DOMContentLoaded', function() {
             .catch(window.utils.handleError);
     }
 
-    // Filtrar conversaciones
+    // Los filtros se aplican en el servidor: se recarga desde la primera página
     function filterConversations() {
-        const searchTerm = searchInput.value.toLowerCase();
-        const urgency = urgencyFilter.value;
-        const dateRange = dateFilter.value;
-        
-        let filtered = conversations;
-        
-        // Filtrar por búsqueda
-        if (searchTerm) {
-            filtered = filtered.filter(conv => 
-                conv.main_concern.toLowerCase().includes(searchTerm)
-            );
-        }
-        
-        // Filtrar por urgencia
-        if (urgency) {
-            filtered = filtered.filter(conv => 
-                conv.urgency_level === urgency
-            );
-        }
-        
-        // Filtrar por fecha
-        if (dateRange) {
-            const now = new Date();
-            const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-            
-            filtered = filtered.filter(conv => {
-                const convDate = new Date(conv.date);
-                switch(dateRange) {
-                    case 'today':
-                        return convDate >= today;
-                    case 'week':
-                        const weekAgo = new Date(today);
-                        weekAgo.setDate(weekAgo.getDate() - 7);
-                        return convDate >= weekAgo;
-                    case 'month':
-                        const monthAgo = new Date(today);
-                        monthAgo.setMonth(monthAgo.getMonth() - 1);
-                        return convDate >= monthAgo;
-                    default:
-                        return true;
-                }
-            });
-        }
-        
-        renderConversations(filtered);
+        loadConversations();
+    }
+
+    function onSearchInput() {
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(filterConversations, 300);
     }
 
     // Event listeners
-    searchInput.addEventListener('input', filterConversations);
+    searchInput.addEventListener('input', onSearchInput);
     urgencyFilter.addEventListener('change', filterConversations);
     dateFilter.addEventListener('change', filterConversations);
+    loadMoreBtn.addEventListener('click', () => {
+        if (nextCursor) {
+            loadConversations(nextCursor);
+        }
+    });
 
     // Cargar conversaciones al inicio
     loadConversations();
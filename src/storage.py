@@ -3,16 +3,642 @@ Module for handling conversation storage and retrieval.
 """
 import os
 import json
+import base64
+import heapq
+import itertools
+import atexit
+import tempfile
+import threading
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from conversation_cache import ConversationCache
+from write_queue import PersistenceQueue
+from segment_archive import SegmentArchive, compact
+from turn_log import TurnLog
 
 # Definir la estructura del directorio de datos
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
 CONVERSATIONS_DIR = os.path.join(DATA_DIR, 'conversations')
 
+# Backend de almacenamiento: "json" (un archivo por conversación) o "sqlite"
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+SQLITE_DB_PATH = os.getenv('STORAGE_SQLITE_PATH', os.path.join(DATA_DIR, 'conversations.db'))
+
+# Disposición del backend JSON: "sharded" (ab/cd/<id>.json) o "flat" (<id>.json)
+STORAGE_JSON_LAYOUT = os.getenv('STORAGE_JSON_LAYOUT', 'sharded')
+
+# Tamaño máximo de la caché de conversaciones parseadas (0 la desactiva)
+CONVERSATION_CACHE_MAX_BYTES = int(os.getenv('CONVERSATION_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Escritura diferida: save_conversation encola y un hilo escribe por lotes
+STORAGE_WRITE_BEHIND = os.getenv('STORAGE_WRITE_BEHIND', '0') == '1'
+WRITE_QUEUE_MAX_SIZE = int(os.getenv('WRITE_QUEUE_MAX_SIZE', '1000'))
+WRITE_QUEUE_MAX_BATCH = int(os.getenv('WRITE_QUEUE_MAX_BATCH', '256'))
+
+# Log de turnos de las conversaciones en curso
+TURN_LOG_DIR = os.getenv('TURN_LOG_DIR', os.path.join(DATA_DIR, 'turns'))
+
+# Archivo comprimido de conversaciones antiguas
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(DATA_DIR, 'archive'))
+ARCHIVE_SEGMENT_MAX_BYTES = int(os.getenv('ARCHIVE_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+
 # Asegurar que los directorios existan
 os.makedirs(CONVERSATIONS_DIR, exist_ok=True)
 
+def summarize_conversation(conversation: Dict) -> Dict:
+    """
+    Extrae las columnas de resumen que necesita el listado del historial.
+    
+    Args:
+        conversation (Dict): Datos completos de la conversación
+    
+    Returns:
+        Dict: Resumen con id, timestamp, main_concern y urgency_level
+    """
+    metadata = conversation.get("metadata", {})
+    content = conversation.get("conversation", {})
+    analysis = content.get("analysis") or {}
+    return {
+        "id": metadata.get("conversation_id"),
+        "timestamp": metadata.get("timestamp", ""),
+        "main_concern": content.get("responses", {}).get("main_concern", ""),
+        "urgency_level": analysis.get("urgency_level", "BAJO")
+    }
+
+def summary_sort_key(summary: Dict) -> Tuple[str, str]:
+    """Clave de orden de los resúmenes: (timestamp, id), usada también como cursor."""
+    return (summary["timestamp"] or "", summary["id"] or "")
+
+def encode_cursor(summary: Dict) -> str:
+    """
+    Codifica la posición de un resumen como cursor opaco para la paginación.
+    
+    Args:
+        summary (Dict): Último resumen entregado al cliente
+    
+    Returns:
+        str: Cursor seguro para URLs
+    """
+    raw = json.dumps(list(summary_sort_key(summary)), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decodifica un cursor generado por encode_cursor.
+    
+    Args:
+        cursor (str): Cursor recibido del cliente
+    
+    Returns:
+        Tuple[str, str]: Clave (timestamp, id) a partir de la cual continuar
+    
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        timestamp, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (str(timestamp), str(conversation_id))
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor}")
+
+@dataclass
+class SummaryFilter:
+    """
+    Filtros del listado del historial.
+    
+    Las fechas se comparan como timestamps ISO: `date_from` es inclusivo y
+    `date_to` exclusivo. `main_concern` busca el texto sin distinguir
+    mayúsculas en el motivo de consulta.
+    """
+    urgency_level: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    main_concern: Optional[str] = None
+    
+    def is_empty(self) -> bool:
+        """Indica si no hay ningún filtro activo."""
+        return not (self.urgency_level or self.date_from or self.date_to or self.main_concern)
+    
+    def matches(self, summary: Dict) -> bool:
+        """Evalúa el filtro sobre un resumen (para backends sin índices)."""
+        if self.urgency_level and summary["urgency_level"] != self.urgency_level:
+            return False
+        if self.date_from and summary["timestamp"] < self.date_from:
+            return False
+        if self.date_to and summary["timestamp"] >= self.date_to:
+            return False
+        if self.main_concern and self.main_concern.lower() not in (summary["main_concern"] or "").lower():
+            return False
+        return True
+
+class StorageBackend:
+    """
+    Interfaz común para los backends de almacenamiento de conversaciones.
+    """
+    
+    def save(self, conversation_data: Dict) -> str:
+        """Guarda una conversación y retorna su ID."""
+        raise NotImplementedError
+    
+    def save_many(self, conversations: List[Dict]) -> List[str]:
+        """
+        Guarda un lote de conversaciones de forma durable.
+        
+        Los backends pueden sobrescribirlo para confirmar todo el lote con un
+        único fsync o transacción (group commit).
+        """
+        return [self.save(conversation) for conversation in conversations]
+    
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        """Carga una conversación o retorna None si no existe."""
+        raise NotImplementedError
+    
+    def delete(self, conversation_id: str) -> None:
+        """Elimina una conversación; no hace nada si no existe."""
+        raise NotImplementedError
+    
+    def exists(self, conversation_id: str) -> bool:
+        """Indica si la conversación está almacenada."""
+        return self.load(conversation_id) is not None
+    
+    def iter_conversations(self) -> Iterator[Dict]:
+        """Itera sobre todas las conversaciones almacenadas, sin orden definido."""
+        raise NotImplementedError
+    
+    def stat(self, conversation_id: str) -> Optional[Tuple[Hashable, int]]:
+        """
+        Retorna (etag, tamaño en bytes) de una conversación sin leerla.
+        
+        El etag cambia cada vez que la conversación se reescribe. Los backends
+        que no pueden calcularlo retornan None y sus lecturas no se cachean.
+        """
+        return None
+    
+    def iter_summaries(self, after: Optional[Tuple[str, str]] = None,
+                       limit: Optional[int] = None,
+                       filters: Optional[SummaryFilter] = None) -> Iterator[Dict]:
+        """
+        Itera los resúmenes del más reciente al más antiguo.
+        
+        La implementación por defecto recorre todas las conversaciones pero solo
+        retiene `limit` resúmenes a la vez, por lo que la memoria no crece con
+        el tamaño del archivo. Los backends con índices la sobrescriben.
+        
+        Args:
+            after (Optional[Tuple[str, str]]): Clave (timestamp, id) del último
+                resumen ya entregado; solo se retornan los anteriores a ella
+            limit (Optional[int]): Cantidad máxima de resúmenes
+            filters (Optional[SummaryFilter]): Filtros a aplicar
+        
+        Returns:
+            Iterator[Dict]: Resúmenes ordenados por fecha descendente
+        """
+        summaries = (summarize_conversation(conv) for conv in self.iter_conversations())
+        if after is not None:
+            summaries = (s for s in summaries if summary_sort_key(s) < after)
+        if filters is not None and not filters.is_empty():
+            summaries = (s for s in summaries if filters.matches(s))
+        if limit is None:
+            return iter(sorted(summaries, key=summary_sort_key, reverse=True))
+        return iter(heapq.nlargest(limit, summaries, key=summary_sort_key))
+    
+    def list_summaries(self) -> List[Dict]:
+        """Retorna los resúmenes de todas las conversaciones, más recientes primero."""
+        return list(self.iter_summaries())
+
+class JSONFileBackend(StorageBackend):
+    """
+    Backend de archivos: un documento `<id>.json` por conversación.
+    
+    Con la disposición "sharded" el prefijo del ID decide el subdirectorio
+    (`ab/cd/<id>.json`), lo que mantiene cada directorio pequeño. Los archivos
+    de la disposición plana original (`<id>.json` en la raíz) se siguen
+    encontrando de forma transparente hasta que se migran.
+    """
+    
+    def __init__(self, directory: str = CONVERSATIONS_DIR, layout: str = 'flat'):
+        if layout not in ('flat', 'sharded'):
+            raise ValueError(f"Disposición de directorios desconocida: {layout}")
+        self.directory = directory
+        self.layout = layout
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def _flat_path(self, conversation_id: str) -> str:
+        return os.path.join(self.directory, f"{conversation_id}.json")
+    
+    def _sharded_path(self, conversation_id: str) -> str:
+        prefix = conversation_id.lower().ljust(4, '_')
+        return os.path.join(self.directory, prefix[:2], prefix[2:4], f"{conversation_id}.json")
+    
+    def _path(self, conversation_id: str) -> str:
+        """Ruta donde se escribe la conversación según la disposición configurada."""
+        if self.layout == 'sharded':
+            return self._sharded_path(conversation_id)
+        return self._flat_path(conversation_id)
+    
+    def _candidate_paths(self, conversation_id: str) -> List[str]:
+        """Rutas donde puede estar la conversación, en orden de prioridad."""
+        if self.layout == 'sharded':
+            return [self._sharded_path(conversation_id), self._flat_path(conversation_id)]
+        return [self._flat_path(conversation_id), self._sharded_path(conversation_id)]
+    
+    def _write_temp(self, conversation_data: Dict) -> Tuple[str, str, str]:
+        """Escribe la conversación en un archivo temporal sincronizado a disco."""
+        conversation_id = conversation_data['metadata']['conversation_id']
+        path = self._path(conversation_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{conversation_id}.", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(conversation_data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return conversation_id, tmp_path, path
+    
+    @staticmethod
+    def _fsync_directory(directory: str) -> None:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def save(self, conversation_data: Dict) -> str:
+        return self.save_many([conversation_data])[0]
+    
+    def save_many(self, conversations: List[Dict]) -> List[str]:
+        # Cada archivo se escribe a un temporal y se renombra de forma atómica;
+        # cada directorio afectado se sincroniza una sola vez para todo el lote.
+        written = [self._write_temp(conversation) for conversation in conversations]
+        directories = set()
+        for conversation_id, tmp_path, path in written:
+            os.replace(tmp_path, path)
+            directories.add(os.path.dirname(path))
+            # Eliminar la copia en la otra disposición, que quedaría desactualizada
+            for stale_path in self._candidate_paths(conversation_id)[1:]:
+                try:
+                    os.unlink(stale_path)
+                    directories.add(os.path.dirname(stale_path))
+                except FileNotFoundError:
+                    pass
+        for directory in directories:
+            self._fsync_directory(directory)
+        return [conversation_id for conversation_id, _, _ in written]
+    
+    def stat(self, conversation_id: str) -> Optional[Tuple[Hashable, int]]:
+        for path in self._candidate_paths(conversation_id):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return ((st.st_ino, st.st_mtime_ns, st.st_size), st.st_size)
+        return None
+    
+    def exists(self, conversation_id: str) -> bool:
+        return self.stat(conversation_id) is not None
+    
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        for path in self._candidate_paths(conversation_id):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                continue
+        return None
+    
+    def delete(self, conversation_id: str) -> None:
+        for path in self._candidate_paths(conversation_id):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    
+    def iter_paths(self) -> Iterator[str]:
+        """Itera las rutas de todas las conversaciones, en ambas disposiciones."""
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_file() and entry.name.endswith('.json'):
+                yield entry.path
+            elif entry.is_dir() and len(entry.name) == 2:
+                for shard in os.scandir(entry.path):
+                    if shard.is_dir() and len(shard.name) == 2:
+                        for item in os.scandir(shard.path):
+                            if item.name.endswith('.json') and not item.name.startswith('.'):
+                                yield item.path
+    
+    def iter_conversations(self) -> Iterator[Dict]:
+        for path in self.iter_paths():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    yield json.load(f)
+            except FileNotFoundError:
+                # Movida por una migración o reescritura concurrente
+                continue
+    
+    def migrate_to_sharded(self) -> int:
+        """
+        Reubica los archivos de la disposición plana en sus subdirectorios.
+        
+        Es seguro ejecutarla con el servicio en marcha: cada archivo se enlaza
+        primero en su ruta nueva y luego se elimina de la raíz, por lo que
+        siempre es visible en alguna de las dos rutas. Si un worker ya escribió
+        una versión en la ruta nueva, esa versión se conserva.
+        
+        Returns:
+            int: Cantidad de archivos migrados
+        """
+        migrated = 0
+        directories = set()
+        for entry in os.scandir(self.directory):
+            if not (entry.is_file() and entry.name.endswith('.json')) or entry.name.startswith('.'):
+                continue
+            conversation_id = entry.name[:-len('.json')]
+            target = self._sharded_path(conversation_id)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(entry.path, target)
+                migrated += 1
+                directories.add(os.path.dirname(target))
+            except FileExistsError:
+                pass
+            except FileNotFoundError:
+                continue
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+        for directory in directories | {self.directory}:
+            self._fsync_directory(directory)
+        return migrated
+
+def create_backend(name: str) -> StorageBackend:
+    """
+    Crea un backend de almacenamiento a partir de su nombre.
+    
+    Args:
+        name (str): "json" o "sqlite"
+    
+    Returns:
+        StorageBackend: Instancia del backend configurado
+    """
+    if name == 'json':
+        return JSONFileBackend(CONVERSATIONS_DIR, layout=STORAGE_JSON_LAYOUT)
+    if name == 'sqlite':
+        from sqlite_storage import SQLiteBackend
+        return SQLiteBackend(SQLITE_DB_PATH)
+    raise ValueError(f"Backend de almacenamiento desconocido: {name}")
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+_cache = ConversationCache(CONVERSATION_CACHE_MAX_BYTES)
+_write_queue: Optional[PersistenceQueue] = None
+_archive: Optional[SegmentArchive] = None
+_turn_log = TurnLog(TURN_LOG_DIR)
+_save_listeners: List[Callable[[List[Dict]], None]] = []
+
+def add_save_listener(listener: Callable[[List[Dict]], None]) -> None:
+    """
+    Registra una función que recibe cada lote de conversaciones ya guardado.
+    
+    Se usa para mantener datos derivados (por ejemplo, estadísticas) sin
+    volver a leer el almacenamiento. Con escritura diferida se llama desde
+    el hilo escritor.
+    
+    Args:
+        listener (Callable[[List[Dict]], None]): Función a notificar
+    """
+    if listener not in _save_listeners:
+        _save_listeners.append(listener)
+
+def remove_save_listener(listener: Callable[[List[Dict]], None]) -> None:
+    """Deja de notificar a una función registrada con add_save_listener."""
+    if listener in _save_listeners:
+        _save_listeners.remove(listener)
+
+def _write_batch(conversations: List[Dict]) -> List[str]:
+    """Guarda un lote en el backend y notifica a los listeners."""
+    ids = get_backend().save_many(conversations)
+    for listener in list(_save_listeners):
+        # Un error en datos derivados no debe hacer fallar el guardado
+        try:
+            listener(conversations)
+        except Exception as e:
+            print(f"Error al notificar el guardado: {str(e)}")
+    return ids
+
+def get_cache_stats() -> Dict:
+    """Retorna los contadores de la caché de conversaciones."""
+    return _cache.stats()
+
+def enable_write_behind(max_size: int = WRITE_QUEUE_MAX_SIZE,
+                        max_batch: int = WRITE_QUEUE_MAX_BATCH) -> PersistenceQueue:
+    """
+    Activa la escritura diferida de conversaciones.
+    
+    Args:
+        max_size (int): Capacidad de la cola antes de bloquear a los llamadores
+        max_batch (int): Cantidad máxima de conversaciones por lote
+    
+    Returns:
+        PersistenceQueue: Cola de escritura activa
+    """
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = PersistenceQueue(
+            _write_batch,
+            max_size=max_size,
+            max_batch=max_batch
+        )
+    return _write_queue
+
+def disable_write_behind(timeout: Optional[float] = None) -> None:
+    """Escribe lo pendiente y vuelve a la escritura sincrónica."""
+    global _write_queue
+    if _write_queue is not None:
+        _write_queue.stop(timeout)
+        _write_queue = None
+
+def flush_writes(timeout: Optional[float] = None) -> bool:
+    """
+    Espera a que las conversaciones encoladas hasta ahora sean durables.
+    
+    Args:
+        timeout (Optional[float]): Tiempo máximo de espera en segundos
+    
+    Returns:
+        bool: True si no queda nada pendiente, False si venció el tiempo o
+            alguna escritura falló
+    """
+    if _write_queue is None:
+        return True
+    return _write_queue.flush(timeout)
+
+def get_write_queue_stats() -> Optional[Dict]:
+    """Retorna las métricas de la cola de escritura o None si está desactivada."""
+    return _write_queue.stats() if _write_queue is not None else None
+
+if STORAGE_WRITE_BEHIND:
+    enable_write_behind()
+atexit.register(disable_write_behind)
+
+def set_turn_log(turn_log: TurnLog) -> None:
+    """Reemplaza el log de turnos (útil para pruebas)."""
+    global _turn_log
+    _turn_log = turn_log
+
+def append_turns(conversation_id: str, records: List[Dict]) -> bool:
+    """
+    Anexa registros al log de turnos de una conversación en curso.
+    
+    Args:
+        conversation_id (str): ID de la conversación
+        records (List[Dict]): Registros nuevos desde el último checkpoint
+    
+    Returns:
+        bool: True si los registros quedaron en disco
+    """
+    try:
+        _turn_log.append(conversation_id, records)
+        return True
+    except Exception as e:
+        print(f"Error al registrar los turnos de la conversación: {str(e)}")
+        return False
+
+def discard_turns(conversation_id: str) -> None:
+    """
+    Elimina el log de turnos de una conversación abandonada.
+    
+    Args:
+        conversation_id (str): ID de la conversación
+    """
+    try:
+        _turn_log.delete(conversation_id)
+    except Exception as e:
+        print(f"Error al eliminar los turnos de la conversación: {str(e)}")
+
+def sweep_turn_logs(max_age_seconds: float) -> int:
+    """
+    Elimina los logs de turnos de conversaciones abandonadas hace tiempo.
+    
+    Args:
+        max_age_seconds (float): Antigüedad mínima de la última escritura
+    
+    Returns:
+        int: Cantidad de logs eliminados
+    """
+    return _turn_log.sweep(max_age_seconds)
+
+def finalize_conversation(conversation_data: Dict) -> Optional[str]:
+    """
+    Guarda el documento completo de una conversación y descarta su log de turnos.
+    
+    El log solo se elimina después de que el documento es durable.
+    
+    Args:
+        conversation_data (Dict): Documento completo de la conversación
+    
+    Returns:
+        Optional[str]: ID de la conversación o None si hubo un error
+    """
+    conversation_id = save_conversation(conversation_data, wait=True)
+    if conversation_id is not None:
+        _turn_log.delete(conversation_id)
+    return conversation_id
+
+def get_archive() -> SegmentArchive:
+    """Retorna el archivo de conversaciones antiguas."""
+    global _archive
+    if _archive is None:
+        with _backend_lock:
+            if _archive is None:
+                _archive = SegmentArchive(ARCHIVE_DIR, ARCHIVE_SEGMENT_MAX_BYTES)
+    return _archive
+
+def set_archive(archive: SegmentArchive) -> None:
+    """Reemplaza el archivo de conversaciones antiguas (útil para pruebas)."""
+    global _archive
+    with _backend_lock:
+        _archive = archive
+        _cache.clear()
+
+def compact_archive(older_than_days: int) -> int:
+    """
+    Mueve al archivo comprimido las conversaciones más antiguas que el límite.
+    
+    Args:
+        older_than_days (int): Antigüedad mínima en días
+    
+    Returns:
+        int: Cantidad de conversaciones archivadas
+    
+    Raises:
+        RuntimeError: Si quedan escrituras diferidas sin llegar a disco
+    """
+    if not flush_writes():
+        raise RuntimeError("Hay conversaciones encoladas que no se pudieron escribir; no se compacta")
+    return compact(get_backend(), get_archive(), older_than_days)
+
+def get_backend() -> StorageBackend:
+    """Retorna el backend activo, creándolo según STORAGE_BACKEND si hace falta."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(STORAGE_BACKEND)
+    return _backend
+
+def set_backend(backend: StorageBackend) -> None:
+    """Reemplaza el backend activo (útil para migraciones y pruebas)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+        _cache.clear()
+
+def copy_conversations(source: StorageBackend, target: StorageBackend) -> int:
+    """
+    Copia todas las conversaciones de un backend a otro.
+    
+    Args:
+        source (StorageBackend): Backend de origen
+        target (StorageBackend): Backend de destino
+    
+    Returns:
+        int: Cantidad de conversaciones copiadas
+    """
+    copied = 0
+    for conversation in source.iter_conversations():
+        target.save(conversation)
+        copied += 1
+    return copied
+
+def iter_all_conversations() -> Iterator[Dict]:
+    """
+    Itera las conversaciones activas y luego las archivadas, sin repetir IDs.
+    
+    Una conversación puede estar a la vez activa y archivada mientras se
+    compacta o si se volvió a guardar antes de que este proceso viera su
+    copia archivada; en ese caso se usa la activa.
+    
+    Returns:
+        Iterator[Dict]: Conversaciones con la estructura de almacenamiento
+    """
+    backend = get_backend()
+    yield from backend.iter_conversations()
+    for conversation in get_archive().iter_conversations():
+        if not backend.exists(conversation["metadata"]["conversation_id"]):
+            yield conversation
+
+def _archived_only(backend: StorageBackend, summaries: Iterator[Dict]) -> Iterator[Dict]:
+    """Omite los resúmenes archivados de conversaciones que siguen activas."""
+    return (summary for summary in summaries if not backend.exists(summary["id"]))
+
 def get_conversation_history() -> List[Dict]:
     """
     Obtiene el historial de conversaciones.
@@ -20,14 +646,8 @@ def get_conversation_history() -> List[Dict]:
     Returns:
         List[Dict]: Lista de conversaciones ordenadas por fecha
     """
-    conversations = []
     try:
-        for filename in os.listdir(CONVERSATIONS_DIR):
-            if filename.endswith('.json'):
-                file_path = os.path.join(CONVERSATIONS_DIR, filename)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    conversation = json.load(f)
-                    conversations.append(conversation)
+        conversations = list(iter_all_conversations())
         
         # Ordenar por fecha, más reciente primero
         conversations.sort(key=lambda x: x['metadata']['timestamp'], reverse=True)
@@ -36,23 +656,114 @@ def get_conversation_history() -> List[Dict]:
         print(f"Error al cargar el historial: {str(e)}")
         return []
 
-def save_conversation(conversation_data: Dict) -> str:
+def get_conversation_summaries() -> List[Dict]:
+    """
+    Obtiene los resúmenes del historial sin cargar las conversaciones completas
+    cuando el backend lo permite.
+    
+    Returns:
+        List[Dict]: Resúmenes (id, timestamp, main_concern, urgency_level) ordenados por fecha
+    """
+    try:
+        return list(iter_conversation_summaries())
+    except Exception as e:
+        print(f"Error al cargar el historial: {str(e)}")
+        return []
+
+def iter_conversation_summaries(after: Optional[str] = None,
+                                limit: Optional[int] = None,
+                                filters: Optional[SummaryFilter] = None) -> Iterator[Dict]:
     """
-    Guarda una conversación en el sistema de archivos.
+    Itera los resúmenes del historial con paginación por cursor (keyset).
+    
+    Args:
+        after (Optional[str]): Cursor devuelto por encode_cursor para la página anterior
+        limit (Optional[int]): Cantidad máxima de resúmenes a retornar
+        filters (Optional[SummaryFilter]): Filtros por urgencia, fecha y motivo
+    
+    Returns:
+        Iterator[Dict]: Resúmenes ordenados del más reciente al más antiguo
+    
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    after_key = decode_cursor(after) if after else None
+    backend = get_backend()
+    # Las conversaciones activas y las archivadas se intercalan por fecha; si
+    # una está en ambos lados se lista la copia activa. El archivo se lee sin
+    # límite (es perezoso) para que las copias omitidas no acorten la página
+    merged = heapq.merge(
+        backend.iter_summaries(after=after_key, limit=limit, filters=filters),
+        _archived_only(backend, get_archive().iter_summaries(after=after_key, filters=filters)),
+        key=summary_sort_key,
+        reverse=True
+    )
+    return itertools.islice(merged, limit)
+
+def iter_conversation_documents(after: Optional[str] = None,
+                                filters: Optional[SummaryFilter] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    Itera las conversaciones completas en el orden del historial, para exportarlas.
+    
+    Carga un documento por vez sin pasar por la caché, así recorrer todo el
+    historial no desplaza las conversaciones consultadas recientemente.
+    
+    Args:
+        after (Optional[str]): Cursor desde el que continuar
+        filters (Optional[SummaryFilter]): Filtros por urgencia, fecha y motivo
+    
+    Returns:
+        Iterator[Tuple[str, Dict]]: Pares (cursor de la conversación, documento)
+    
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    backend = get_backend()
+    archive = get_archive()
+    for summary in iter_conversation_summaries(after=after, filters=filters):
+        conversation_id = summary["id"]
+        conversation = _write_queue.get_pending(conversation_id) if _write_queue is not None else None
+        if conversation is None:
+            conversation = backend.load(conversation_id)
+        if conversation is None:
+            conversation = archive.load(conversation_id)
+        # Borrada mientras se recorría el historial
+        if conversation is not None:
+            yield encode_cursor(summary), conversation
+
+def _discard_archived(conversation_id: str) -> None:
+    """Anula la copia archivada de una conversación que vuelve a estar activa."""
+    archive = get_archive()
+    if conversation_id in archive:
+        archive.delete(conversation_id)
+
+def save_conversation(conversation_data: Dict, wait: bool = False) -> str:
+    """
+    Guarda una conversación en el backend de almacenamiento configurado.
+    
+    Con la escritura diferida activa, la conversación se encola y la función
+    retorna de inmediato salvo que se pida esperar a que sea durable.
     
     Args:
         conversation_data (Dict): Datos de la conversación
+        wait (bool): Esperar a que la escritura llegue a disco
     
     Returns:
         str: ID de la conversación guardada
     """
     try:
-        conversation_id = conversation_data['metadata']['conversation_id']
-        file_path = os.path.join(CONVERSATIONS_DIR, f"{conversation_id}.json")
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, ensure_ascii=False, indent=2)
+        if _write_queue is not None:
+            future = _write_queue.submit(conversation_data)
+            conversation_id = conversation_data['metadata']['conversation_id']
+            _cache.invalidate(conversation_id)
+            _discard_archived(conversation_id)
+            if wait:
+                future.result()
+            return conversation_id
         
+        conversation_id = _write_batch([conversation_data])[0]
+        _cache.invalidate(conversation_id)
+        _discard_archived(conversation_id)
         return conversation_id
     except Exception as e:
         print(f"Error al guardar la conversación: {str(e)}")
@@ -62,6 +773,12 @@ def load_conversation(conversation_id: str) -> Optional[Dict]:
     """
     Carga una conversación específica.
     
+    Las conversaciones leídas recientemente se sirven desde una caché LRU
+    mientras su etag en el almacenamiento no cambie. Si la conversación no
+    está en el almacenamiento activo se reconstruye desde su log de turnos
+    (conversaciones en curso) o se busca en el archivo comprimido. El diccionario retornado
+    puede estar compartido con la caché: no debe modificarse.
+    
     Args:
         conversation_id (str): ID de la conversación a cargar
     
@@ -69,11 +786,28 @@ def load_conversation(conversation_id: str) -> Optional[Dict]:
         Optional[Dict]: Datos de la conversación o None si no se encuentra
     """
     try:
-        file_path = os.path.join(CONVERSATIONS_DIR, f"{conversation_id}.json")
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        if _write_queue is not None:
+            pending = _write_queue.get_pending(conversation_id)
+            if pending is not None:
+                return pending
+        
+        backend = get_backend()
+        stat = backend.stat(conversation_id) if _cache.max_bytes > 0 else None
+        if stat is None:
+            conversation = backend.load(conversation_id)
+            if conversation is None:
+                conversation = _turn_log.materialize(conversation_id)
+            if conversation is None:
+                conversation = get_archive().load(conversation_id)
+            return conversation
+        
+        etag, size = stat
+        conversation = _cache.get(conversation_id, etag)
+        if conversation is None:
+            conversation = backend.load(conversation_id)
+            if conversation is not None:
+                _cache.put(conversation_id, etag, conversation, size)
+        return conversation
     except Exception as e:
         print(f"Error al cargar la conversación: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
@@ -0,0 +1,111 @@
+"""
+Module for the incrementally updated symptom, risk and urgency state of a conversation.
+"""
+from typing import Dict, List
+
+from prompts import SYMPTOM_WEIGHTS, URGENCY_CRITERIA, TRIAGE_LEXICON
+
+# Peso de cada síntoma sumado en todas las categorías, como en calculate_urgency_level
+SYMPTOM_WEIGHT_TOTALS: Dict[str, int] = {}
+for _category in SYMPTOM_WEIGHTS.values():
+    for _symptom, _weight in _category.items():
+        SYMPTOM_WEIGHT_TOTALS[_symptom] = SYMPTOM_WEIGHT_TOTALS.get(_symptom, 0) + _weight
+
+HIGH_URGENCY_SYMPTOMS = frozenset(URGENCY_CRITERIA["ALTO"]["required"])
+
+# Síntomas que se deducen de la respuesta a una pregunta concreta, en el orden
+# en que se agregan al final de la lista: (ID de pregunta, categoría del
+# léxico, el síntoma se agrega si la categoría aparece, síntoma)
+RESPONSE_RULES = (
+    ("duration", "persistent_duration", True, "persistent_symptoms"),
+    ("daily_impact", "work", True, "work_impact"),
+    ("mood_changes", "affirmative", True, "mood_changes"),
+    ("sleep", "sleep_problem", True, "sleep_changes"),
+    ("support", "support", False, "lack_of_support")
+)
+_RULES_BY_KEY = {rule[0]: (bit, rule) for bit, rule in enumerate(RESPONSE_RULES)}
+
+class SymptomState:
+    """
+    Síntomas, señales de riesgo y urgencia acumulados respuesta a respuesta.
+    
+    Cada respuesta se analiza una sola vez al llegar, así que actualizar el
+    estado cuesta lo que mide el mensaje y no depende del largo de la
+    conversación. El resultado es idéntico a extraer los síntomas de todas
+    las respuestas al final con las mismas reglas.
+    """
+    
+    __slots__ = ("_keyword_symptoms", "_rule_mask", "_weight", "_high_urgency",
+                 "risk", "protective_support", "response_count")
+    
+    def __init__(self):
+        self._keyword_symptoms: List[str] = []
+        self._rule_mask = 0
+        self._weight = 0
+        self._high_urgency = False
+        self.risk = False
+        self.protective_support = False
+        self.response_count = 0
+    
+    @classmethod
+    def from_responses(cls, responses: Dict[str, str]) -> "SymptomState":
+        """
+        Construye el estado a partir de respuestas ya registradas.
+        
+        Args:
+            responses (Dict[str, str]): Respuestas por ID de pregunta
+        
+        Returns:
+            SymptomState: Estado equivalente a haberlas recibido en orden
+        """
+        state = cls()
+        for key, response in responses.items():
+            state.add_response(key, response)
+        return state
+    
+    def _add_symptom_weight(self, symptom: str) -> None:
+        self._weight += SYMPTOM_WEIGHT_TOTALS.get(symptom, 0)
+        if symptom in HIGH_URGENCY_SYMPTOMS:
+            self._high_urgency = True
+    
+    def add_response(self, key: str, response: str) -> None:
+        """
+        Incorpora una respuesta nueva.
+        
+        Args:
+            key (str): ID de la pregunta respondida
+            response (str): Texto de la respuesta
+        """
+        scan = TRIAGE_LEXICON.scan(response)
+        self.response_count += 1
+        for symptom in scan.values("symptom"):
+            if symptom not in self._keyword_symptoms:
+                self._keyword_symptoms.append(symptom)
+                self._add_symptom_weight(symptom)
+        if scan.any("risk"):
+            self.risk = True
+        
+        rule = _RULES_BY_KEY.get(key)
+        if rule is not None:
+            bit, (_, category, when_present, symptom) = rule
+            if scan.any(category) == when_present and not self._rule_mask & (1 << bit):
+                self._rule_mask |= 1 << bit
+                self._add_symptom_weight(symptom)
+        if key == "support" and scan.any("protective_support"):
+            self.protective_support = True
+    
+    @property
+    def symptoms(self) -> List[str]:
+        """Síntomas en el orden en que los reporta extract_symptoms."""
+        return self._keyword_symptoms + [
+            rule[3] for bit, rule in enumerate(RESPONSE_RULES) if self._rule_mask & (1 << bit)
+        ]
+    
+    @property
+    def urgency_level(self) -> str:
+        """Nivel de urgencia actual (BAJO, MEDIO, ALTO), como calculate_urgency_level."""
+        if self._high_urgency:
+            return "ALTO"
+        if self._weight >= URGENCY_CRITERIA["MEDIO"]["threshold"]:
+            return "MEDIO"
+        return "BAJO"
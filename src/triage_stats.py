@@ -0,0 +1,302 @@
+"""
+Module for incrementally maintained triage statistics.
+"""
+import os
+import json
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from prompts import DIAGNOSTIC_CRITERIA
+from chatbot import extract_symptoms
+from scoring_engine import SCORING_ENGINE
+import storage
+
+# Base de datos de estadísticas (derivada: se puede reconstruir en cualquier momento)
+STATS_DB_PATH = os.getenv('STATS_DB_PATH', os.path.join(storage.DATA_DIR, 'stats.db'))
+
+# Largo del prefijo del bucket diario (YYYY-MM-DD) para cada granularidad
+GRANULARITIES = {"day": 10, "month": 7, "year": 4}
+
+# Cada conversación aporta a su bucket diario un conjunto de contadores
+# ("conversations", "urgency:ALTO", "symptom:fatigue", ...). El aporte se guarda
+# por conversación para descontarlo si se vuelve a guardar.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contributions (
+    id TEXT PRIMARY KEY,
+    bucket TEXT NOT NULL,
+    counters TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    bucket TEXT NOT NULL,
+    counter TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (bucket, counter)
+) WITHOUT ROWID;
+"""
+
+def conversations_counters(conversations: List[Dict]) -> List[List[str]]:
+    """
+    Calcula los contadores que aporta cada conversación de un lote.
+    
+    Los síntomas se extraen de las respuestas con las mismas reglas que el
+    chatbot y los diagnósticos de todo el lote se evalúan contra
+    DIAGNOSTIC_CRITERIA con una sola puntuación vectorizada. La urgencia
+    solo se cuenta si la conversación tiene análisis.
+    
+    Args:
+        conversations (List[Dict]): Conversaciones con la estructura de almacenamiento
+    
+    Returns:
+        List[List[str]]: Nombres de los contadores a incrementar, por conversación
+    """
+    contents = [conversation.get("conversation", {}) for conversation in conversations]
+    symptom_sets = [extract_symptoms(content.get("responses", {})) for content in contents]
+    scores = SCORING_ENGINE.score(symptom_sets)
+    
+    result = []
+    for row, (content, symptoms) in enumerate(zip(contents, symptom_sets)):
+        analysis = content.get("analysis")
+        counters = ["conversations"]
+        if analysis:
+            counters.append("analyzed")
+            counters.append(f"urgency:{analysis.get('urgency_level', 'BAJO')}")
+        counters.extend(f"symptom:{symptom}" for symptom in dict.fromkeys(symptoms))
+        counters.extend(f"diagnosis:{condition}" for condition in scores.conditions(row))
+        result.append(counters)
+    return result
+
+def conversation_counters(conversation: Dict) -> List[str]:
+    """
+    Calcula los contadores que aporta una conversación.
+    
+    Args:
+        conversation (Dict): Conversación con la estructura de almacenamiento
+    
+    Returns:
+        List[str]: Nombres de los contadores a incrementar
+    """
+    return conversations_counters([conversation])[0]
+
+def format_counters(counters: Dict[str, int]) -> Dict:
+    """
+    Agrupa los contadores planos por tipo para la API.
+    
+    Args:
+        counters (Dict[str, int]): Contadores por nombre
+    
+    Returns:
+        Dict: Totales, urgencias, síntomas y diagnósticos
+    """
+    result = {
+        "conversations": counters.get("conversations", 0),
+        "analyzed": counters.get("analyzed", 0),
+        "urgency": {},
+        "symptoms": {},
+        "diagnoses": {}
+    }
+    groups = {"urgency": "urgency", "symptom": "symptoms", "diagnosis": "diagnoses"}
+    for name, value in counters.items():
+        kind, _, key = name.partition(":")
+        if kind in groups:
+            result[groups[kind]][key] = value
+    return result
+
+class TriageStats:
+    """
+    Contadores de triage agregados por día en SQLite.
+    
+    Cada guardado aplica la diferencia entre el aporte nuevo de la
+    conversación y el anterior, así que las consultas leen solo los buckets
+    del rango pedido y no dependen de la cantidad de conversaciones.
+    """
+    
+    def __init__(self, db_path: str = STATS_DB_PATH):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Datos derivados: ante una caída se reconstruyen con rebuild()
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _apply(self, conn: sqlite3.Connection, conversations: Iterable[Dict]) -> int:
+        delta = Counter()
+        # Aportes de este lote por ID: una conversación repetida reemplaza a la anterior
+        contributions: Dict[str, tuple] = {}
+        conversations = [
+            conversation for conversation in conversations
+            if conversation.get("metadata", {}).get("conversation_id")
+        ]
+        for conversation, counters in zip(conversations, conversations_counters(conversations)):
+            conversation_id = conversation["metadata"]["conversation_id"]
+            bucket = (conversation["metadata"].get("timestamp") or "")[:10]
+            previous = contributions.get(conversation_id)
+            if previous is None:
+                row = conn.execute(
+                    "SELECT bucket, counters FROM contributions WHERE id = ?", (conversation_id,)
+                ).fetchone()
+                previous = (row[0], json.loads(row[1])) if row is not None else None
+            if previous is not None:
+                for counter in previous[1]:
+                    delta[(previous[0], counter)] -= 1
+            for counter in counters:
+                delta[(bucket, counter)] += 1
+            contributions[conversation_id] = (bucket, counters)
+        
+        conn.executemany(
+            "INSERT OR REPLACE INTO contributions (id, bucket, counters) VALUES (?, ?, ?)",
+            [
+                (conversation_id, bucket, json.dumps(counters, ensure_ascii=False))
+                for conversation_id, (bucket, counters) in contributions.items()
+            ]
+        )
+        changes = [(bucket, counter, value) for (bucket, counter), value in delta.items() if value]
+        conn.executemany(
+            "INSERT INTO rollups (bucket, counter, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (bucket, counter) DO UPDATE SET value = value + excluded.value",
+            changes
+        )
+        conn.executemany(
+            "DELETE FROM rollups WHERE bucket = ? AND counter = ? AND value <= 0",
+            [(bucket, counter) for bucket, counter, _ in changes]
+        )
+        return len(contributions)
+    
+    def record(self, conversations: List[Dict]) -> None:
+        """
+        Actualiza los contadores con un lote de conversaciones guardadas.
+        
+        Args:
+            conversations (List[Dict]): Conversaciones recién guardadas
+        """
+        with self._connection() as conn:
+            self._apply(conn, conversations)
+    
+    def rebuild(self, conversations: Iterable[Dict]) -> int:
+        """
+        Recalcula todos los contadores desde cero en una sola transacción.
+        
+        Args:
+            conversations (Iterable[Dict]): Todas las conversaciones almacenadas
+        
+        Returns:
+            int: Cantidad de conversaciones procesadas
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM contributions")
+            conn.execute("DELETE FROM rollups")
+            total = 0
+            batch = []
+            for conversation in conversations:
+                batch.append(conversation)
+                if len(batch) >= 500:
+                    total += self._apply(conn, batch)
+                    batch = []
+            total += self._apply(conn, batch)
+        return total
+    
+    def query(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+              granularity: str = "day") -> Dict:
+        """
+        Obtiene los contadores agregados por bucket y en total.
+        
+        Las fechas se truncan al día: `date_from` es inclusiva y `date_to`
+        exclusiva, como en el historial.
+        
+        Args:
+            date_from (Optional[str]): Fecha mínima en formato ISO
+            date_to (Optional[str]): Fecha máxima en formato ISO
+            granularity (str): "day", "month" o "year"
+        
+        Returns:
+            Dict: Totales (con tasas de diagnóstico) y serie por bucket
+        
+        Raises:
+            ValueError: Si la granularidad no es válida
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularidad inválida: {granularity}")
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append("bucket >= ?")
+            params.append(date_from[:10])
+        if date_to:
+            conditions.append("bucket < ?")
+            params.append(date_to[:10])
+        query = f"SELECT substr(bucket, 1, {GRANULARITIES[granularity]}) AS period, counter, SUM(value) FROM rollups"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY period, counter ORDER BY period"
+        
+        buckets: Dict[str, Dict[str, int]] = {}
+        totals = Counter()
+        for period, counter, value in self._connection().execute(query, params):
+            buckets.setdefault(period, {})[counter] = value
+            totals[counter] += value
+        
+        summary = format_counters(totals)
+        conversations = summary["conversations"]
+        summary["diagnosis_hit_rates"] = {
+            condition: (summary["diagnoses"].get(condition, 0) / conversations if conversations else 0.0)
+            for condition in DIAGNOSTIC_CRITERIA
+        }
+        return {
+            "granularity": granularity,
+            "totals": summary,
+            "buckets": [dict(bucket=period, **format_counters(counters)) for period, counters in buckets.items()]
+        }
+    
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+_stats: Optional[TriageStats] = None
+_stats_lock = threading.Lock()
+
+def get_stats() -> TriageStats:
+    """Retorna las estadísticas activas, creándolas en el primer uso."""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = TriageStats()
+    return _stats
+
+def set_stats(stats: TriageStats) -> None:
+    """Reemplaza las estadísticas activas (útil para pruebas)."""
+    global _stats
+    with _stats_lock:
+        _stats = stats
+
+def record_saved(conversations: List[Dict]) -> None:
+    """Listener de storage: aplica cada lote guardado a las estadísticas activas."""
+    get_stats().record(conversations)
+
+def enable() -> None:
+    """Mantiene las estadísticas actualizadas en cada save_conversation."""
+    storage.add_save_listener(record_saved)
+
+def rebuild_from_storage() -> int:
+    """
+    Recalcula las estadísticas desde el almacenamiento activo y el archivo.
+    
+    Returns:
+        int: Cantidad de conversaciones procesadas
+    """
+    return get_stats().rebuild(storage.iter_all_conversations())
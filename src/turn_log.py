@@ -0,0 +1,141 @@
+"""
+Module for the append-only per-conversation turn log.
+"""
+import os
+import json
+import time
+from typing import Dict, Iterator, List, Optional
+
+class TurnLog:
+    """
+    Log de solo anexado con un registro JSON por línea para cada conversación
+    en curso (`<id>.jsonl`).
+    
+    Tipos de registro:
+        - meta: {"type": "meta", "conversation_id", "timestamp", "version"}
+        - turn: {"type": "turn", "role", "message"} por entrada de chat_history
+        - response: {"type": "response", "key", "value"} por cambio en responses
+        - analysis: {"type": "analysis", "analysis"} con el análisis final
+    
+    Cada checkpoint escribe solo los registros nuevos con una única llamada a
+    write y un fdatasync, así que su costo no depende del largo de la
+    conversación. Una línea final incompleta (caída durante la escritura) se
+    ignora al leer.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+    
+    def _path(self, conversation_id: str) -> str:
+        return os.path.join(self.directory, f"{conversation_id}.jsonl")
+    
+    def append(self, conversation_id: str, records: List[Dict], sync: bool = True) -> None:
+        """
+        Anexa registros al log de una conversación.
+        
+        Args:
+            conversation_id (str): ID de la conversación
+            records (List[Dict]): Registros a anexar
+            sync (bool): Forzar los datos a disco antes de retornar
+        """
+        if not records:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode('utf-8')
+        fd = os.open(self._path(conversation_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            if sync:
+                os.fdatasync(fd)
+        finally:
+            os.close(fd)
+    
+    def read(self, conversation_id: str) -> Optional[List[Dict]]:
+        """Lee los registros completos del log o None si no existe."""
+        try:
+            with open(self._path(conversation_id), 'r', encoding='utf-8') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        records = []
+        for line in data.split("\n"):
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Solo puede quedar truncada la última línea
+                break
+        return records
+    
+    def materialize(self, conversation_id: str) -> Optional[Dict]:
+        """
+        Reconstruye el documento completo de la conversación a partir del log.
+        
+        Args:
+            conversation_id (str): ID de la conversación
+        
+        Returns:
+            Optional[Dict]: Documento con la estructura de almacenamiento o None
+        """
+        records = self.read(conversation_id)
+        if records is None:
+            return None
+        metadata = {"conversation_id": conversation_id, "timestamp": "", "version": "1.0"}
+        responses: Dict[str, str] = {}
+        chat_history: List[Dict] = []
+        analysis = None
+        for record in records:
+            record_type = record.get("type")
+            if record_type == "meta":
+                metadata.update({k: v for k, v in record.items() if k != "type"})
+            elif record_type == "turn":
+                chat_history.append({"role": record["role"], "message": record["message"]})
+            elif record_type == "response":
+                responses[record["key"]] = record["value"]
+            elif record_type == "analysis":
+                analysis = record["analysis"]
+        conversation = {"responses": responses, "chat_history": chat_history}
+        if analysis is not None:
+            conversation["analysis"] = analysis
+        return {"metadata": metadata, "conversation": conversation}
+    
+    def delete(self, conversation_id: str) -> None:
+        """Elimina el log de una conversación, si existe."""
+        try:
+            os.unlink(self._path(conversation_id))
+        except FileNotFoundError:
+            pass
+    
+    def sweep(self, max_age_seconds: float) -> int:
+        """
+        Elimina los logs sin escrituras en los últimos `max_age_seconds`.
+        
+        Quedan logs huérfanos cuando el proceso se reinicia con conversaciones
+        a medio terminar, cuyas sesiones ya no existen.
+        
+        Args:
+            max_age_seconds (float): Antigüedad mínima de la última escritura
+        
+        Returns:
+            int: Cantidad de logs eliminados
+        """
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for conversation_id in list(self.iter_ids()):
+            try:
+                if os.stat(self._path(conversation_id)).st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            self.delete(conversation_id)
+            removed += 1
+        return removed
+    
+    def iter_ids(self) -> Iterator[str]:
+        """Itera los IDs de las conversaciones con log abierto."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".jsonl"):
+                yield name[:-len(".jsonl")]
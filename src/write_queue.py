@@ -0,0 +1,224 @@
+"""
+Module for write-behind persistence of conversations with group commit.
+"""
+import copy
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class PersistenceQueue:
+    """
+    Cola acotada de escrituras diferidas con un hilo escritor en segundo plano.
+    
+    El escritor toma un lote de hasta `max_batch` conversaciones (esperando como
+    máximo `flush_interval` segundos a que se acumulen) y lo entrega completo a
+    `write_batch`, de modo que un solo fsync o una sola transacción cubren
+    todo el lote. Si la cola está llena, `submit` bloquea al llamador.
+    
+    Si un lote falla, sus conversaciones siguen visibles con get_pending y se
+    reintentan junto con el lote siguiente o, si no llega ninguno, cada
+    `retry_interval` segundos; el último error queda en stats(). Mientras
+    haya lotes fallidos, flush no da por durables sus conversaciones.
+    """
+    
+    def __init__(self, write_batch: Callable[[List[Dict]], None], max_size: int = 1000,
+                 max_batch: int = 256, flush_interval: float = 0.005, retry_interval: float = 1.0):
+        self._write_batch = write_batch
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_size)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        
+        # Última versión encolada de cada conversación, para lecturas consistentes
+        self._pending: Dict[str, tuple] = {}
+        # Conversaciones de lotes fallidos que esperan un reintento
+        self._failed: Dict[str, tuple] = {}
+        self._condition = threading.Condition()
+        # Serializa la asignación de secuencia y el encolado para mantener el orden FIFO
+        self._enqueue_lock = threading.Lock()
+        self._submitted = 0
+        # Secuencia del último lote intentado y hasta la que todo es durable
+        self._attempted = 0
+        self._completed = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        
+        # Métricas
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self.last_batch_size = 0
+    
+    def start(self) -> None:
+        """Inicia el hilo escritor si no está en ejecución."""
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+                self._thread.start()
+    
+    def submit(self, conversation_data: Dict) -> Future:
+        """
+        Encola una copia de una conversación para ser escrita.
+        
+        La copia se toma al encolar, así los cambios que el llamador haga
+        después sobre el diccionario no alteran lo que se escribe.
+        
+        Args:
+            conversation_data (Dict): Datos de la conversación
+        
+        Returns:
+            Future: Se resuelve con el ID de la conversación cuando la escritura es durable
+        """
+        self.start()
+        conversation_data = copy.deepcopy(conversation_data)
+        conversation_id = conversation_data['metadata']['conversation_id']
+        future: Future = Future()
+        with self._enqueue_lock:
+            with self._condition:
+                self._submitted += 1
+                seq = self._submitted
+                self._pending[conversation_id] = (seq, conversation_data)
+            self._queue.put((seq, conversation_id, conversation_data, future))
+        return future
+    
+    def get_pending(self, conversation_id: str) -> Optional[Dict]:
+        """Retorna la versión encolada y aún no escrita de una conversación, si existe."""
+        with self._condition:
+            entry = self._pending.get(conversation_id)
+        return entry[1] if entry else None
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que todas las escrituras encoladas hasta ahora sean durables.
+        
+        Args:
+            timeout (Optional[float]): Tiempo máximo de espera en segundos
+        
+        Returns:
+            bool: True si se completaron, False si venció el tiempo o alguna
+                escritura falló (y sigue esperando un reintento)
+        """
+        with self._condition:
+            target = self._submitted
+            self._condition.wait_for(
+                lambda: self._completed >= target or (self._attempted >= target and bool(self._failed)),
+                timeout=timeout
+            )
+            return self._completed >= target
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        self.flush(timeout)
+        with self._condition:
+            self._stopping = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+        with self._condition:
+            if self._failed:
+                logger.error(f"{len(self._failed)} conversaciones no se pudieron escribir: {self.last_error}")
+    
+    def stats(self) -> Dict:
+        """Retorna las métricas de la cola."""
+        with self._condition:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "pending": len(self._pending),
+                "flushes": self.flushes,
+                "written": self.written,
+                "failed": self.failed,
+                "retrying": len(self._failed),
+                "last_error": self.last_error,
+                "last_batch_size": self.last_batch_size,
+                "last_flush_seconds": self.last_flush_seconds,
+                "avg_flush_seconds": self.total_flush_seconds / self.flushes if self.flushes else 0.0
+            }
+    
+    def _collect_batch(self, first) -> List[tuple]:
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+    
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                retrying = bool(self._failed)
+            try:
+                first = self._queue.get(timeout=self.retry_interval) if retrying else self._queue.get()
+            except queue.Empty:
+                first = ()
+            if first is None:
+                if self._stopping:
+                    return
+                continue
+            batch = self._collect_batch(first) if first else []
+            
+            # Solo se escribe la última versión de cada conversación: primero las
+            # que esperan reintento y encima las del lote, que son más nuevas
+            with self._condition:
+                retry, self._failed = self._failed, {}
+            latest: Dict[str, Dict] = {conversation_id: entry[1] for conversation_id, entry in retry.items()}
+            for _, conversation_id, conversation_data, _ in batch:
+                latest[conversation_id] = conversation_data
+            last_seq = batch[-1][0] if batch else max(entry[0] for entry in retry.values())
+            
+            start = time.perf_counter()
+            error: Optional[BaseException] = None
+            try:
+                self._write_batch(list(latest.values()))
+            except Exception as e:
+                error = e
+                logger.error(f"Error al escribir lote de {len(latest)} conversaciones: {str(e)}")
+            elapsed = time.perf_counter() - start
+            
+            with self._condition:
+                self.flushes += 1
+                self.last_batch_size = len(latest)
+                self.last_flush_seconds = elapsed
+                self.total_flush_seconds += elapsed
+                if error is None:
+                    self.written += len(latest)
+                    self.last_error = None
+                else:
+                    self.failed += len(latest)
+                    self.last_error = str(error)
+                for conversation_id in latest:
+                    entry = self._pending.get(conversation_id)
+                    # Una versión encolada después de este lote sigue pendiente
+                    if entry is None or entry[0] > last_seq:
+                        continue
+                    if error is None:
+                        del self._pending[conversation_id]
+                    else:
+                        self._failed[conversation_id] = entry
+                self._attempted = max(self._attempted, last_seq)
+                # Un lote exitoso incluye los reintentos: todo lo intentado es durable
+                if error is None:
+                    self._completed = self._attempted
+                self._condition.notify_all()
+            
+            for _, conversation_id, _, future in batch:
+                if error is None:
+                    future.set_result(conversation_id)
+                else:
+                    future.set_exception(error)
@@ -0,0 +1,83 @@
+"""
+Utilidades compartidas por los tests de almacenamiento.
+"""
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+import triage_stats
+from segment_archive import SegmentArchive
+from sqlite_storage import SQLiteBackend
+from triage_stats import TriageStats
+
+DEFAULT_TIMESTAMP = "2025-01-01T10:00:00"
+
+def days_ago(days: float) -> str:
+    """Timestamp ISO de hace `days` días."""
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+def make_conversation(conversation_id: str, timestamp: str = DEFAULT_TIMESTAMP, main_concern: str = "",
+                      urgency_level: Optional[str] = None, responses: Optional[Dict[str, str]] = None,
+                      conditions: Iterable[str] = (), analysis: Optional[Dict] = None) -> Dict:
+    """
+    Crea una conversación con la estructura de almacenamiento.
+    
+    Args:
+        conversation_id (str): ID de la conversación
+        timestamp (str): Fecha ISO de la conversación
+        main_concern (str): Motivo de consulta, si no se indican responses
+        urgency_level (Optional[str]): Urgencia del análisis guardado (None = sin análisis)
+        responses (Optional[Dict[str, str]]): Respuestas completas
+        conditions (Iterable[str]): Condiciones de los diagnósticos guardados
+        analysis (Optional[Dict]): Campos adicionales del análisis guardado
+    
+    Returns:
+        Dict: Conversación lista para guardar
+    """
+    conversation = {
+        "metadata": {"conversation_id": conversation_id, "timestamp": timestamp, "version": "1.0"},
+        "conversation": {"responses": dict(responses) if responses is not None else {"main_concern": main_concern}}
+    }
+    if urgency_level:
+        stored = {"urgency_level": urgency_level}
+        if conditions:
+            stored["preliminary_diagnoses"] = [
+                {"condition": condition, "confidence": "50%"} for condition in conditions
+            ]
+        stored.update(analysis or {})
+        conversation["conversation"]["analysis"] = stored
+    return conversation
+
+class TemporaryStorageMixin:
+    """
+    Reemplaza el backend y el archivo de storage, y las estadísticas que
+    se actualizan al guardar, por unos en un directorio temporal mientras
+    dura cada test, y restaura los originales al terminar.
+    """
+    
+    def setUp(self):
+        """Configura backend y archivo temporales."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.previous_backend = storage._backend
+        self.previous_archive = storage._archive
+        self.previous_stats = triage_stats._stats
+        self.backend = self.create_backend()
+        storage.set_backend(self.backend)
+        storage.set_archive(SegmentArchive(os.path.join(self.tmpdir, "archive")))
+        triage_stats.set_stats(TriageStats(os.path.join(self.tmpdir, "stats.db")))
+    
+    def create_backend(self) -> storage.StorageBackend:
+        """Backend de la prueba (por defecto SQLite)."""
+        return SQLiteBackend(os.path.join(self.tmpdir, "conversations.db"))
+    
+    def tearDown(self):
+        """Restaura el backend, el archivo y las estadísticas originales."""
+        triage_stats.set_stats(self.previous_stats)
+        storage.set_backend(self.previous_backend)
+        storage.set_archive(self.previous_archive)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
@@ -0,0 +1,80 @@
+"""
+Tests para la caché de análisis por contenido.
+"""
+import unittest
+import sys
+import os
+import copy
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analysis_cache import AnalysisCache, ANALYSIS_CACHE, RULES_VERSION, analysis_key, rules_version
+from prompts import SYMPTOM_WEIGHTS, DIAGNOSTIC_CRITERIA
+from chatbot import ChatBot
+
+RESPONSES = {"main_concern": "Me siento triste", "duration": "Hace meses"}
+
+class TestAnalysisCache(unittest.TestCase):
+    """Pruebas de la caché LRU y de sus claves."""
+    
+    def test_lru_eviction(self):
+        """Test de desalojo del análisis usado hace más tiempo."""
+        cache = AnalysisCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"], stats["hits"], stats["misses"]), (2, 1, 2, 1))
+    
+    def test_key_normalization(self):
+        """Test de que mayúsculas y espacios extremos no cambian la clave, pero el orden sí."""
+        self.assertEqual(analysis_key(RESPONSES),
+                         analysis_key({"main_concern": "  ME SIENTO TRISTE ", "duration": "hace meses"}))
+        reordered = {"duration": "Hace meses", "main_concern": "Me siento triste"}
+        self.assertNotEqual(analysis_key(RESPONSES), analysis_key(reordered))
+        self.assertEqual(analysis_key(RESPONSES)[0], RULES_VERSION)
+    
+    def test_rules_version_changes_with_tables(self):
+        """Test de que cambiar un peso o un criterio cambia la versión y la clave."""
+        weights = copy.deepcopy(SYMPTOM_WEIGHTS)
+        weights["mood"]["depressed"] += 1
+        version = rules_version(weights, DIAGNOSTIC_CRITERIA)
+        self.assertNotEqual(version, rules_version(SYMPTOM_WEIGHTS, DIAGNOSTIC_CRITERIA))
+        self.assertNotEqual(analysis_key(RESPONSES, version), analysis_key(RESPONSES))
+
+class TestChatBotAnalysisCache(unittest.TestCase):
+    """Pruebas de la caché en el análisis del chatbot."""
+    
+    def analyze(self, responses):
+        chatbot = ChatBot()
+        chatbot.start_conversation()
+        for key, value in responses.items():
+            chatbot._set_response(key, value)
+        return chatbot, chatbot._analyze_responses()
+    
+    def test_repeated_analysis_is_a_lookup(self):
+        """Test de que respuestas idénticas reutilizan el análisis."""
+        ANALYSIS_CACHE.clear()
+        first_bot, first = self.analyze(RESPONSES)
+        hits = ANALYSIS_CACHE.hits
+        second_bot, second = self.analyze(RESPONSES)
+        self.assertEqual(second, first)
+        self.assertEqual(second_bot.analysis, first_bot.analysis)
+        self.assertEqual(ANALYSIS_CACHE.hits, hits + 1)
+        
+        # Cada sesión recibe su copia: modificarla no altera la caché
+        self.assertIsNot(second_bot.analysis.main_concerns, first_bot.analysis.main_concerns)
+        second_bot.analysis.recommendations.append("Otra")
+        second["main_concerns"].append("Otra")
+        third_bot, third = self.analyze(RESPONSES)
+        self.assertEqual(third, first)
+        self.assertEqual(third_bot.analysis, first_bot.analysis)
+        
+        _, other = self.analyze({"main_concern": "Pienso en morir"})
+        self.assertEqual(other["urgency_level"], "ALTO")
+        self.assertNotEqual(first["urgency_level"], "ALTO")
+
+if __name__ == '__main__':
+    unittest.main()
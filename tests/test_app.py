@@ -0,0 +1,228 @@
+"""
+Tests para la API HTTP del sistema de triage.
+"""
+import unittest
+import sys
+import os
+import gzip
+import json
+import shutil
+import tempfile
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from sqlite_storage import SQLiteBackend
+import triage_stats
+from triage_stats import TriageStats
+from turn_log import TurnLog
+import app as app_module
+from app import app
+import llm_integration
+from llm_integration import LLMClient
+from llm_retry import RetryPolicy
+
+class TestHistoryAPI(unittest.TestCase):
+    """Pruebas del endpoint de historial."""
+    
+    def setUp(self):
+        """Configura un backend temporal con conversaciones de prueba."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.previous_backend = storage._backend
+        storage.set_backend(SQLiteBackend(os.path.join(self.tmpdir, "conversations.db")))
+        self.previous_stats = triage_stats._stats
+        triage_stats.set_stats(TriageStats(os.path.join(self.tmpdir, "stats.db")))
+        for i in range(5):
+            storage.save_conversation({
+                "metadata": {"conversation_id": f"id{i}", "timestamp": f"2025-01-0{i + 1}T10:00:00"},
+                "conversation": {
+                    "responses": {"main_concern": f"motivo {i}"},
+                    "analysis": {"urgency_level": "ALTO" if i % 2 else "BAJO"}
+                }
+            })
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        """Restaura el backend original."""
+        triage_stats.set_stats(self.previous_stats)
+        storage.set_backend(self.previous_backend)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_history_pagination(self):
+        """Test de que el historial se recorre completo siguiendo next_cursor."""
+        ids = []
+        url = '/api/history?limit=2'
+        while url:
+            data = self.client.get(url).get_json()
+            self.assertEqual(data["status"], "success")
+            self.assertLessEqual(len(data["conversations"]), 2)
+            ids.extend(c["id"] for c in data["conversations"])
+            url = f'/api/history?limit=2&after={data["next_cursor"]}' if data["next_cursor"] else None
+        self.assertEqual(ids, ["id4", "id3", "id2", "id1", "id0"])
+    
+    def test_history_filters(self):
+        """Test de filtros del historial aplicados en el servidor."""
+        response = self.client.get('/api/history?urgency_level=alto&from=2025-01-02&to=2025-01-05')
+        self.assertEqual([c["id"] for c in response.get_json()["conversations"]], ["id3", "id1"])
+        response = self.client.get('/api/history?main_concern=motivo%203')
+        self.assertEqual([c["id"] for c in response.get_json()["conversations"]], ["id3"])
+    
+    def test_history_invalid_filters(self):
+        """Test de que filtros inválidos retornan 400."""
+        self.assertEqual(self.client.get('/api/history?urgency_level=URGENTE').status_code, 400)
+        self.assertEqual(self.client.get('/api/history?from=ayer').status_code, 400)
+    
+    def test_export_stream(self):
+        """Test de exportación NDJSON con filtros y compresión opcional."""
+        response = self.client.get('/api/export?urgency_level=BAJO')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.get_data().splitlines()
+        self.assertEqual([json.loads(l)["conversation"]["metadata"]["conversation_id"] for l in lines],
+                         ["id4", "id2", "id0"])
+        
+        response = self.client.get('/api/export?gzip=1')
+        self.assertEqual(len(gzip.decompress(response.get_data()).splitlines()), 5)
+        self.assertEqual(self.client.get('/api/export?after=invalido').status_code, 400)
+    
+    def test_stats(self):
+        """Test de estadísticas actualizadas al guardar."""
+        response = self.client.get('/api/stats?granularity=month')
+        stats = response.get_json()["stats"]
+        self.assertEqual(stats["totals"]["urgency"], {"ALTO": 2, "BAJO": 3})
+        self.assertEqual([b["bucket"] for b in stats["buckets"]], ["2025-01"])
+        self.assertEqual(self.client.get('/api/stats?granularity=hora').status_code, 400)
+    
+    def test_history_invalid_cursor(self):
+        """Test de que un cursor inválido retorna 400."""
+        response = self.client.get('/api/history?after=invalido')
+        self.assertEqual(response.status_code, 400)
+
+class TestChatSessionsAPI(unittest.TestCase):
+    """Pruebas de las sesiones de chat independientes."""
+    
+    def setUp(self):
+        """Configura almacenamiento temporal para los checkpoints."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.previous_backend = storage._backend
+        self.previous_turn_log = storage._turn_log
+        self.previous_stats = triage_stats._stats
+        storage.set_backend(SQLiteBackend(os.path.join(self.tmpdir, "conversations.db")))
+        storage.set_turn_log(TurnLog(os.path.join(self.tmpdir, "turns")))
+        triage_stats.set_stats(TriageStats(os.path.join(self.tmpdir, "stats.db")))
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        """Restaura el estado global."""
+        triage_stats.set_stats(self.previous_stats)
+        storage.set_turn_log(self.previous_turn_log)
+        storage.set_backend(self.previous_backend)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def start(self):
+        response = self.client.post('/api/start')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()["session_id"]
+    
+    def test_sessions_do_not_share_state(self):
+        """Test de que dos conversaciones simultáneas no se pisan."""
+        first = self.start()
+        second = self.start()
+        self.client.post('/api/chat', json={"message": "Me siento triste", "session_id": first})
+        self.client.post('/api/chat', json={"message": "Tengo miedo", "session_id": second})
+        with app_module.sessions.session(first) as chatbot:
+            self.assertEqual(chatbot.responses["main_concern"], "Me siento triste")
+        with app_module.sessions.session(second) as chatbot:
+            self.assertEqual(chatbot.responses["main_concern"], "Tengo miedo")
+    
+    def test_chat_requires_valid_session(self):
+        """Test de que /api/chat exige una sesión existente."""
+        self.assertEqual(self.client.post('/api/chat', json={"message": "Hola"}).status_code, 400)
+        response = self.client.post('/api/chat', json={"message": "Hola", "session_id": "desconocida"})
+        self.assertEqual(response.status_code, 404)
+    
+    def parse_events(self, response):
+        """Convierte una respuesta de Server-Sent Events en una lista de (evento, datos)."""
+        events = []
+        for block in response.get_data(as_text=True).strip().split("\n\n"):
+            event, data = block.split("\n")
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+        return events
+    
+    def test_chat_event_stream(self):
+        """Test del modo streaming sin LLM: el mensaje fijo en un fragmento."""
+        session_id = self.start()
+        response = self.client.post('/api/chat', json={"message": "Me siento triste", "session_id": session_id},
+                                    headers={"Accept": "text/event-stream"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = self.parse_events(response)
+        self.assertEqual([event for event, _ in events], ["chunk", "done"])
+        self.assertEqual(events[0][1]["text"], events[1][1]["message"])
+        with app_module.sessions.session(session_id) as chatbot:
+            self.assertEqual(chatbot.chat_history[-1], ("ASSISTANT", events[1][1]["message"]))
+    
+    def test_chat_event_stream_with_llm_replies(self):
+        """Test de que la pregunta redactada por el LLM llega en fragmentos y queda en el historial."""
+        class StreamingTransport:
+            def stream(self, model_name, prompt, timeout=None):
+                yield "Entiendo. "
+                yield "¿Desde cuándo te sientes así?"
+            
+            def close(self):
+                pass
+        llm_integration.start_client(LLMClient(transport_factory=StreamingTransport))
+        self.addCleanup(llm_integration.close_client)
+        
+        session_id = self.start()
+        with mock.patch('chatbot.LLM_REPLIES', True):
+            response = self.client.post('/api/chat', json={
+                "message": "Me siento triste", "session_id": session_id, "stream": True
+            })
+        events = self.parse_events(response)
+        self.assertEqual([event for event, _ in events], ["chunk", "chunk", "done"])
+        self.assertEqual(events[2][1]["message"], "Entiendo. ¿Desde cuándo te sientes así?")
+        with app_module.sessions.session(session_id) as chatbot:
+            self.assertEqual(chatbot.chat_history[-1][1], "Entiendo. ¿Desde cuándo te sientes así?")
+    
+    def test_chat_event_stream_falls_back_to_fixed_question(self):
+        """Test de que si el LLM no responde se envía la pregunta fija."""
+        class UnavailableTransport:
+            def stream(self, model_name, prompt, timeout=None):
+                raise ConnectionError("sin conexión")
+            
+            def close(self):
+                pass
+        llm_integration.start_client(LLMClient(transport_factory=UnavailableTransport,
+                                               retry_policy=RetryPolicy(max_attempts=1)))
+        self.addCleanup(llm_integration.close_client)
+        
+        session_id = self.start()
+        fixed = self.client.post('/api/chat', json={"message": "Me siento triste", "session_id": self.start()})
+        with mock.patch('chatbot.LLM_REPLIES', True):
+            response = self.client.post('/api/chat', json={
+                "message": "Me siento triste", "session_id": session_id, "stream": True
+            })
+        events = self.parse_events(response)
+        self.assertEqual([event for event, _ in events], ["chunk", "done"])
+        self.assertEqual(events[1][1]["message"], fixed.get_json()["message"])
+    
+    def test_llm_client_started_only_with_llm_replies(self):
+        """Test de que la aplicación abre el cliente del LLM al iniciar solo si redacta preguntas."""
+        with mock.patch.object(llm_integration, 'start_client') as start_client, \
+                mock.patch.object(app_module.atexit, 'register') as register:
+            app_module.start_llm_client(llm_replies=False)
+            start_client.assert_not_called()
+            app_module.start_llm_client(llm_replies=True)
+            start_client.assert_called_once_with()
+            register.assert_called_once_with(llm_integration.close_client)
+            # Un error al conectar no impide iniciar la aplicación
+            start_client.side_effect = RuntimeError("sin clave")
+            app_module.start_llm_client(llm_replies=True)
+    
+    def test_chat_event_stream_requires_valid_session(self):
+        """Test de que una sesión inexistente responde 404 también en modo streaming."""
+        response = self.client.post('/api/chat', json={"message": "Hola", "session_id": "x", "stream": True})
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests para el triage por lotes de cuestionarios.
+"""
+import unittest
+import sys
+import os
+import io
+import json
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_triage import triage_record, run_batch
+from chatbot import ChatBot
+
+INTAKE = {
+    "main_concern": "Me siento triste y sin ganas de nada",
+    "duration": "Hace dos semanas",
+    "daily_impact": "No puedo concentrarme en el trabajo",
+    "sleep": "Duermo muy poco",
+    "support": "No tengo a nadie"
+}
+
+def run_lines(lines, **kwargs):
+    """Ejecuta un lote sobre líneas en memoria y retorna los registros de salida."""
+    output = io.BytesIO()
+    totals = run_batch(io.BytesIO("".join(lines).encode('utf-8')), output, **kwargs)
+    return totals, [json.loads(line) for line in output.getvalue().splitlines()]
+
+class TestBatchTriage(unittest.TestCase):
+    """Pruebas del análisis por lotes."""
+    
+    def test_matches_chatbot_analysis(self):
+        """Test de que el lote produce el mismo análisis que el chatbot."""
+        chatbot = ChatBot()
+        chatbot.start_conversation()
+        for key, value in INTAKE.items():
+            chatbot._set_response(key, value)
+        expected = chatbot._analyze_responses()
+        
+        result = triage_record({"id": "a1", "responses": INTAKE})
+        self.assertEqual(result["id"], "a1")
+        analysis = result["analysis"]
+        self.assertEqual(analysis["urgency_level"], expected["urgency_level"])
+        self.assertEqual(analysis["main_concerns"], expected["main_concerns"])
+        self.assertEqual([d["condition"] for d in analysis["preliminary_diagnoses"]],
+                         [d["condition"] for d in expected["preliminary_diagnoses"]])
+        self.assertEqual(triage_record(INTAKE)["analysis"], analysis)
+    
+    def test_invalid_lines_do_not_stop_the_batch(self):
+        """Test de que las líneas inválidas se informan con su número."""
+        totals, records = run_lines([
+            json.dumps(INTAKE) + "\n",
+            "no es json\n",
+            "\n",
+            json.dumps({"responses": ["lista"]}) + "\n",
+            json.dumps({"responses": {"duration": "Hace un mes"}})
+        ], workers=1)
+        self.assertEqual(totals, {"processed": 2, "errors": 2})
+        self.assertEqual([record["line"] for record in records], [1, 2, 4, 5])
+        self.assertIn("error", records[1])
+        self.assertIn("error", records[2])
+        self.assertEqual(records[3]["symptoms"], ["persistent_symptoms"])
+    
+    def test_pool_preserves_order(self):
+        """Test de que el pool conserva el orden de la entrada."""
+        lines = [json.dumps({"id": index, "responses": INTAKE}) + "\n" for index in range(50)]
+        totals, records = run_lines(lines, workers=2, chunk_lines=7)
+        self.assertEqual(totals["processed"], 50)
+        self.assertEqual([record["id"] for record in records], list(range(50)))
+        self.assertEqual([record["line"] for record in records], list(range(1, 51)))
+        self.assertEqual(records, run_lines(lines, workers=1)[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,11 @@ Tests para el sistema de triage en salud mental.
 import unittest
 import sys
 import os
+import gc
+import tracemalloc
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from chatbot import ChatBot
+from chatbot import ChatBot, QUESTION_MAP
 from diagnosis_parser import AnalysisResult, DiagnosisResult
 
 class TestChatBot(unittest.TestCase):
@@ -121,5 +123,53 @@ class TestChatBot(unittest.TestCase):
         # Verificar que se identificaron los factores protectores
         self.assertTrue(any("apoyo" in factor.lower() for factor in analysis["protective_factors"]))
 
+class TestCompactSession(unittest.TestCase):
+    """Pruebas de la representación compacta del estado de la sesión."""
+    
+    def setUp(self):
+        """Inicia una conversación con algunas respuestas."""
+        self.chatbot = ChatBot()
+        self.chatbot.start_conversation()
+        for message in ["Me siento triste", "Hace dos semanas", "No puedo trabajar"]:
+            self.chatbot.process_message(message)
+    
+    def test_state_has_no_instance_dict(self):
+        """Test de que el chatbot usa __slots__."""
+        self.assertFalse(hasattr(self.chatbot, '__dict__'))
+    
+    def test_topics_and_history_views(self):
+        """Test de que la máscara y el historial compacto se ven como antes."""
+        covered = self.chatbot.covered_topics
+        self.assertEqual([topic for topic, value in covered.items() if value],
+                         ["main_concern", "duration", "daily_impact"])
+        history = self.chatbot.chat_history
+        self.assertEqual(history[0][0], "SYSTEM")
+        self.assertEqual(history[1], ("USER", "Me siento triste"))
+        self.assertEqual(history[2], ("ASSISTANT", QUESTION_MAP["duration"]))
+        # Los textos de las preguntas no se copian en cada sesión
+        other = ChatBot()
+        other.start_conversation()
+        other.process_message("Otra preocupación")
+        self.assertIs(other.chat_history[2][1], history[2][1])
+    
+    def test_memory_per_session(self):
+        """Test de que cada sesión ocupa menos de 2 KB sin contar el texto del usuario."""
+        messages = ["Me siento triste", "Hace dos semanas", "No puedo trabajar", "Sí", "Duermo mal"]
+        sessions = []
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for _ in range(200):
+            chatbot = ChatBot()
+            chatbot.start_conversation()
+            for message in messages:
+                chatbot.process_message(message)
+            sessions.append(chatbot)
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        self.assertLess(allocated / len(sessions), 2048)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
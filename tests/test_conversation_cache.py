@@ -0,0 +1,85 @@
+"""
+Tests para la caché LRU de conversaciones.
+"""
+import unittest
+import sys
+import os
+import json
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from conversation_cache import ConversationCache
+from storage import JSONFileBackend
+from helpers import TemporaryStorageMixin
+
+class TestConversationCache(unittest.TestCase):
+    """Pruebas de la caché en memoria."""
+    
+    def test_hit_miss_and_etag_change(self):
+        """Test de aciertos, fallos e invalidación por etag."""
+        cache = ConversationCache(max_bytes=1000)
+        self.assertIsNone(cache.get("a", 1))
+        cache.put("a", 1, {"x": 1}, 10)
+        self.assertEqual(cache.get("a", 1), {"x": 1})
+        self.assertIsNone(cache.get("a", 2))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["invalidations"]), (1, 2, 1))
+        self.assertEqual(stats["entries"], 0)
+    
+    def test_eviction_by_bytes(self):
+        """Test de desalojo LRU al superar el límite de bytes."""
+        cache = ConversationCache(max_bytes=100)
+        cache.put("a", 1, {}, 40)
+        cache.put("b", 1, {}, 40)
+        cache.get("a", 1)  # "b" pasa a ser la menos usada
+        cache.put("c", 1, {}, 40)
+        self.assertIsNone(cache.get("b", 1))
+        self.assertIsNotNone(cache.get("a", 1))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.stats()["bytes"], 100)
+
+class TestLoadConversationCaching(TemporaryStorageMixin, unittest.TestCase):
+    """Pruebas de la caché integrada en storage.load_conversation."""
+    
+    def create_backend(self):
+        return JSONFileBackend(os.path.join(self.tmpdir, "conversations"))
+    
+    def setUp(self):
+        """Configura un backend temporal con una conversación guardada."""
+        super().setUp()
+        self.conversation = {
+            "metadata": {"conversation_id": "abc", "timestamp": "2025-01-01T10:00:00"},
+            "conversation": {"responses": {"main_concern": "original"}}
+        }
+        storage.save_conversation(self.conversation)
+    
+    def test_repeated_loads_hit_cache(self):
+        """Test de que la segunda lectura no vuelve a parsear el archivo."""
+        first = storage.load_conversation("abc")
+        hits = storage.get_cache_stats()["hits"]
+        self.assertIs(storage.load_conversation("abc"), first)
+        self.assertEqual(storage.get_cache_stats()["hits"], hits + 1)
+    
+    def test_external_write_invalidates(self):
+        """Test de que una escritura de otro proceso invalida la entrada."""
+        storage.load_conversation("abc")
+        # Simular otro worker reescribiendo el archivo directamente
+        self.conversation["conversation"]["responses"]["main_concern"] = "modificado por otro proceso"
+        path = os.path.join(self.backend.directory, "abc.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.conversation, f)
+        os.replace(tmp_path, path)
+        loaded = storage.load_conversation("abc")
+        self.assertEqual(loaded["conversation"]["responses"]["main_concern"], "modificado por otro proceso")
+    
+    def test_save_invalidates(self):
+        """Test de que save_conversation invalida la entrada en caché."""
+        storage.load_conversation("abc")
+        self.conversation["conversation"]["responses"]["main_concern"] = "actualizado"
+        storage.save_conversation(self.conversation)
+        loaded = storage.load_conversation("abc")
+        self.assertEqual(loaded["conversation"]["responses"]["main_concern"], "actualizado")
+
+if __name__ == '__main__':
+    unittest.main()
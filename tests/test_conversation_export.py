@@ -0,0 +1,86 @@
+"""
+Tests para la exportación de conversaciones en NDJSON.
+"""
+import unittest
+import sys
+import os
+import io
+import gzip
+import json
+import zlib
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+import conversation_export
+from helpers import TemporaryStorageMixin, make_conversation
+
+class TestConversationExport(TemporaryStorageMixin, unittest.TestCase):
+    """Pruebas de la exportación en streaming."""
+    
+    def setUp(self):
+        """Configura un backend temporal con conversaciones de prueba."""
+        super().setUp()
+        for i in range(6):
+            storage.save_conversation(make_conversation(
+                f"id{i}", f"2025-01-0{i + 1}T10:00:00", f"motivo {i}", "ALTO" if i % 2 else "BAJO"
+            ))
+    
+    def read_ids(self, data):
+        return [json.loads(line)["conversation"]["metadata"]["conversation_id"] for line in data.splitlines()]
+    
+    def test_export_all_in_history_order(self):
+        """Test de que se exportan todas las conversaciones, de la más reciente a la más antigua."""
+        output = io.BytesIO()
+        count, cursor = conversation_export.write_export(output)
+        self.assertEqual(count, 6)
+        self.assertEqual(self.read_ids(output.getvalue()), ["id5", "id4", "id3", "id2", "id1", "id0"])
+        self.assertEqual(storage.decode_cursor(cursor), ("2025-01-01T10:00:00", "id0"))
+    
+    def test_export_filters_and_resume(self):
+        """Test de filtros y de continuación desde el cursor de una línea."""
+        filters = storage.SummaryFilter(urgency_level="ALTO")
+        lines = list(conversation_export.iter_ndjson(filters=filters))
+        self.assertEqual(self.read_ids(b"".join(lines)), ["id5", "id3", "id1"])
+        
+        after = json.loads(lines[0])["cursor"]
+        rest = b"".join(conversation_export.iter_ndjson(after=after, filters=filters))
+        self.assertEqual(self.read_ids(rest), ["id3", "id1"])
+    
+    def test_gzip_stream(self):
+        """Test de que la salida comprimida es gzip válido y se puede leer por partes."""
+        output = io.BytesIO()
+        conversation_export.write_export(output, compress=True)
+        self.assertEqual(len(self.read_ids(gzip.decompress(output.getvalue()))), 6)
+        
+        # Con bloques pequeños, un prefijo de la descarga ya contiene líneas completas
+        chunks = list(conversation_export.iter_gzip(conversation_export.iter_ndjson(), chunk_bytes=1))
+        partial = zlib.decompressobj(31).decompress(b"".join(chunks[:2]))
+        self.assertTrue(partial.endswith(b"\n"))
+    
+    def test_last_exported_cursor_skips_truncated_line(self):
+        """Test de que una línea final incompleta no se toma como exportada."""
+        path = os.path.join(self.tmpdir, "export.ndjson")
+        lines = list(conversation_export.iter_ndjson())
+        with open(path, 'wb') as f:
+            f.write(lines[0] + lines[1] + lines[2][:10])
+        cursor, valid_bytes = conversation_export.last_exported_cursor(path)
+        self.assertEqual(cursor, json.loads(lines[1])["cursor"])
+        self.assertEqual(valid_bytes, len(lines[0]) + len(lines[1]))
+    
+    def test_last_exported_cursor_reads_from_the_end(self):
+        """Test de la búsqueda hacia atrás con bloques más cortos que las líneas."""
+        path = os.path.join(self.tmpdir, "export.ndjson")
+        lines = list(conversation_export.iter_ndjson())
+        for tail, expected in ((b"", 3), (lines[3][:10], 3), (b"no es json\n", 3), (b"\n", 3)):
+            with open(path, 'wb') as f:
+                f.write(b"".join(lines[:3]) + tail)
+            cursor, valid_bytes = conversation_export.last_exported_cursor(path, block_bytes=7)
+            self.assertEqual(cursor, json.loads(lines[expected - 1])["cursor"])
+            self.assertEqual(valid_bytes, sum(len(line) for line in lines[:expected]))
+        for content in (b"", lines[0][:10], b"no es json\n"):
+            with open(path, 'wb') as f:
+                f.write(content)
+            self.assertEqual(conversation_export.last_exported_cursor(path, block_bytes=7), (None, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests para el buscador compilado de palabras clave.
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from keyword_matcher import KeywordMatcher, Lexicon
+from prompts import SYMPTOM_KEYWORDS
+from chatbot import extract_symptoms
+
+def legacy_extract_symptoms(responses):
+    """Implementación anterior con búsquedas `in` por palabra, como referencia."""
+    symptoms = []
+    for response in responses.values():
+        response_lower = response.lower()
+        for keyword, symptom in SYMPTOM_KEYWORDS.items():
+            if keyword in response_lower and symptom not in symptoms:
+                symptoms.append(symptom)
+    if "duration" in responses:
+        if any(term in responses["duration"].lower() for term in ["semana", "mes"]):
+            symptoms.append("persistent_symptoms")
+    if "daily_impact" in responses and "trabajo" in responses["daily_impact"].lower():
+        symptoms.append("work_impact")
+    if "mood_changes" in responses and "sí" in responses["mood_changes"].lower():
+        symptoms.append("mood_changes")
+    if "sleep" in responses:
+        sleep_problems = ["mal", "poco", "mucho", "problema", "no duermo", "casi no", "dificultad"]
+        if any(term in responses["sleep"].lower() for term in sleep_problems):
+            symptoms.append("sleep_changes")
+    if "support" in responses and all(term not in responses["support"].lower() for term in ["sí", "si", "familia", "amigo"]):
+        symptoms.append("lack_of_support")
+    return symptoms
+
+class TestKeywordMatcher(unittest.TestCase):
+    """Pruebas del buscador compilado."""
+    
+    def test_overlapping_and_prefix_keywords(self):
+        """Test de palabras que se solapan o son prefijo de otras."""
+        matcher = KeywordMatcher(["sol", "soledad", "edad", "no duermo", "duermo", "a"])
+        self.assertEqual(matcher.find_all("mucha soledad, no duermo"),
+                         {"sol", "soledad", "edad", "no duermo", "duermo", "a"})
+        self.assertEqual(matcher.find_all("solo"), {"sol"})
+        self.assertEqual(matcher.find_all(""), frozenset())
+        self.assertEqual(KeywordMatcher([]).find_all("texto"), frozenset())
+    
+    def test_lexicon_categories(self):
+        """Test de consultas por categoría sobre un único análisis."""
+        lexicon = Lexicon({
+            "symptom": {"triste": "depressed_mood", "sol": "isolation", "deprimid": "depressed_mood"},
+            "emotion": ["triste", "miedo"],
+            "pair": ["mal", "dorm"]
+        })
+        scan = lexicon.scan("Me siento SOLA, triste y deprimida")
+        self.assertEqual(scan.values("symptom"), ["depressed_mood", "isolation", "depressed_mood"])
+        self.assertTrue(scan.any("emotion"))
+        self.assertFalse(scan.all("pair"))
+        self.assertTrue(lexicon.scan("dormí mal").all("pair"))
+        self.assertFalse(scan.any("desconocida"))
+    
+    def test_lexicon_remembers_scanned_texts(self):
+        """Test de que un texto ya analizado no se vuelve a recorrer."""
+        lexicon = Lexicon({"emotion": ["triste"]}, cache_size=2)
+        lexicon.scan("Estoy triste")
+        lexicon.scan("estoy TRISTE")
+        self.assertEqual((lexicon.cache_hits, lexicon.cache_misses), (1, 1))
+        # Solo se guardan hashes, no los textos
+        self.assertNotIn("estoy triste", repr(lexicon._scans))
+        lexicon.scan("uno")
+        lexicon.scan("dos")
+        self.assertEqual(len(lexicon._scans), 2)
+    
+    def test_extract_symptoms_matches_previous_rules(self):
+        """Test de que extract_symptoms conserva el resultado y el orden anteriores."""
+        samples = [
+            {"main_concern": "Me siento triste y sola", "duration": "Hace meses",
+             "daily_impact": "No puedo ir al trabajo", "mood_changes": "Sí, bastante",
+             "sleep": "Duermo mal", "support": "No tengo a nadie"},
+            {"main_concern": "Tengo miedo y ataques de pánico", "support": "Mi familia"},
+            {"main_concern": "Pienso en morir, no quiero trabajar", "sleep": "casi no duermo",
+             "self_harm": "A veces pienso en hacerme daño"},
+            {"main_concern": "Estoy cansado, sin energía ni ganas de nada"},
+            {}
+        ]
+        for responses in samples:
+            self.assertEqual(extract_symptoms(responses), legacy_extract_symptoms(responses))
+
+if __name__ == '__main__':
+    unittest.main()
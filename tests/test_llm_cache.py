@@ -0,0 +1,147 @@
+"""
+Tests para la caché de respuestas del LLM.
+"""
+import unittest
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from llm_cache import ResponseCache, response_key
+
+class FakeClock:
+    """Reloj manual para los vencimientos."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+class TestResponseKey(unittest.TestCase):
+    """Pruebas de la clave por contenido."""
+    
+    def test_key_covers_provider_model_prompt_and_config(self):
+        """Test de que la clave cambia con el proveedor, el modelo, el prompt o la configuración."""
+        key = response_key("gemini", "gemini-pro", "hola", {"temperature": 0, "top_k": 1})
+        self.assertEqual(key, response_key("gemini", "gemini-pro", "hola", {"top_k": 1, "temperature": 0}))
+        self.assertNotEqual(key, response_key("fake", "gemini-pro", "hola", {"temperature": 0, "top_k": 1}))
+        self.assertNotEqual(key, response_key("gemini", "gemini-1.5", "hola", {"temperature": 0, "top_k": 1}))
+        self.assertNotEqual(key, response_key("gemini", "gemini-pro", "hola ", {"temperature": 0, "top_k": 1}))
+        self.assertNotEqual(key, response_key("gemini", "gemini-pro", "hola", {"temperature": 1, "top_k": 1}))
+        self.assertEqual(response_key("gemini", "gemini-pro", "hola"),
+                         response_key("gemini", "gemini-pro", "hola", {}))
+
+class TestResponseCache(unittest.TestCase):
+    """Pruebas de los niveles en memoria y en disco."""
+    
+    def setUp(self):
+        """Crea un directorio temporal para el nivel en disco."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "llm_cache.db")
+        self.clock = FakeClock()
+    
+    def tearDown(self):
+        """Elimina el directorio temporal."""
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def make_cache(self, **kwargs):
+        options = {"db_path": self.db_path, "ttl": 0, "clock": self.clock}
+        options.update(kwargs)
+        return ResponseCache(**options)
+    
+    def test_memory_lru_eviction(self):
+        """Test de desalojo en memoria de la respuesta usada hace más tiempo."""
+        cache = self.make_cache(max_entries=2, db_path=None)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        self.assertEqual(cache.get("a"), "1")
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"], stats["hits"], stats["misses"]), (2, 1, 1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+        self.assertIsNone(stats["disk_entries"])
+    
+    def test_disk_tier_survives_restart(self):
+        """Test de que otra instancia lee las respuestas del disco y las sube a memoria."""
+        self.make_cache().put("a", "respuesta")
+        cache = self.make_cache()
+        self.assertEqual(cache.get("a"), "respuesta")
+        self.assertEqual(cache.get("a"), "respuesta")
+        stats = cache.stats()
+        self.assertEqual((stats["disk_hits"], stats["memory_hits"], stats["disk_entries"]), (1, 1, 1))
+    
+    def test_ttl_expires_both_tiers(self):
+        """Test de que una respuesta vencida es un fallo en memoria y en disco."""
+        cache = self.make_cache(ttl=60)
+        cache.put("a", "respuesta")
+        self.clock.now += 59
+        self.assertEqual(cache.get("a"), "respuesta")
+        self.clock.now += 1
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(self.make_cache(ttl=60).get("a"))
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["disk_entries"]), (1, 0))
+        self.assertGreaterEqual(stats["expirations"], 2)
+    
+    def test_disk_size_eviction_keeps_recently_used(self):
+        """Test de que el disco desaloja las respuestas usadas hace más tiempo al superar max_bytes."""
+        cache = self.make_cache(max_entries=0, max_bytes=25)
+        for key in ("a", "b"):
+            cache.put(key, "x" * 10)
+            self.clock.now += 1
+        self.assertEqual(cache.get("a"), "x" * 10)
+        self.clock.now += 1
+        cache.put("c", "x" * 10)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "x" * 10)
+        self.assertEqual(cache.get("c"), "x" * 10)
+        stats = cache.stats()
+        self.assertEqual((stats["disk_evictions"], stats["disk_bytes"]), (1, 20))
+    
+    def test_disk_totals_follow_writes(self):
+        """Test de que la cantidad y los bytes en disco siguen a inserciones, reemplazos y borrados."""
+        cache = self.make_cache()
+        cache.put("a", "x" * 10)
+        cache.put("b", "x" * 5)
+        cache.put("a", "x" * 3)
+        stats = cache.stats()
+        self.assertEqual((stats["disk_entries"], stats["disk_bytes"]), (2, 8))
+        cache.clear()
+        stats = cache.stats()
+        self.assertEqual((stats["disk_entries"], stats["disk_bytes"]), (0, 0))
+    
+    def test_totals_initialized_from_existing_table(self):
+        """Test de que una base creada sin la tabla de totales los calcula al abrirse."""
+        self.make_cache().put("a", "x" * 10)
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("DROP TABLE totals")
+        conn.close()
+        stats = self.make_cache().stats()
+        self.assertEqual((stats["disk_entries"], stats["disk_bytes"]), (1, 10))
+    
+    def test_expired_responses_are_swept_periodically(self):
+        """Test de que el disco barre las vencidas como mucho una vez por sweep_interval."""
+        cache = self.make_cache(ttl=60, sweep_interval=120, max_entries=0)
+        cache.put("a", "respuesta")
+        self.clock.now += 61
+        cache.put("b", "respuesta")
+        self.assertEqual(cache.stats()["disk_entries"], 2)
+        self.clock.now += 59
+        cache.put("c", "respuesta")
+        stats = cache.stats()
+        self.assertEqual((stats["disk_entries"], stats["expirations"]), (2, 1))
+    
+    def test_clear(self):
+        """Test de que clear vacía ambos niveles."""
+        cache = self.make_cache()
+        cache.put("a", "respuesta")
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+
+if __name__ == '__main__':
+    unittest.main()
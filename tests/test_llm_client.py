@@ -0,0 +1,502 @@
+"""
+Tests para el cliente LLM compartido y su pool de conexiones.
+"""
+import unittest
+import sys
+import os
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+from concurrent import futures
+from typing import Optional
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import grpc
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", FutureWarning)
+    import llm_integration
+from google.ai import generativelanguage as glm
+from llm_integration import GeminiTransport, LLMClient, AsyncGeminiTransport, AsyncLLMClient
+from llm_retry import RetryPolicy, CircuitBreaker, CircuitOpenError
+from llm_cache import ResponseCache
+from google.api_core import exceptions as api_exceptions
+
+def start_fake_gemini(reply: str = "respuesta"):
+    """Levanta un servidor gRPC local que imita GenerateContent de Gemini."""
+    def generate_content(request, context):
+        text = f"{reply} ({request.model}: {request.contents[0].parts[0].text})"
+        return glm.GenerateContentResponse(candidates=[glm.Candidate(
+            content=glm.Content(parts=[glm.Part(text=text)], role="model"),
+            finish_reason=glm.Candidate.FinishReason.STOP
+        )])
+    def stream_generate_content(request, context):
+        # Una respuesta por palabra, como los fragmentos parciales de Gemini
+        text = generate_content(request, context).candidates[0].content.parts[0].text
+        for word in text.split(" "):
+            yield glm.GenerateContentResponse(candidates=[glm.Candidate(
+                content=glm.Content(parts=[glm.Part(text=word + " ")], role="model")
+            )])
+    method = grpc.unary_unary_rpc_method_handler(
+        generate_content,
+        request_deserializer=glm.GenerateContentRequest.deserialize,
+        response_serializer=glm.GenerateContentResponse.serialize
+    )
+    stream_method = grpc.unary_stream_rpc_method_handler(
+        stream_generate_content,
+        request_deserializer=glm.GenerateContentRequest.deserialize,
+        response_serializer=glm.GenerateContentResponse.serialize
+    )
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(
+        "google.ai.generativelanguage.v1beta.GenerativeService",
+        {"GenerateContent": method, "StreamGenerateContent": stream_method}
+    ),))
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, f"127.0.0.1:{port}"
+
+class FakeTransport:
+    """Transporte en memoria que registra las llamadas."""
+    
+    def __init__(self, failures: int = 0, delay: float = 0.0, break_after: Optional[int] = None):
+        self.failures = failures
+        self.delay = delay
+        self.break_after = break_after
+        self.prompts = []
+        self.closed = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+    
+    def generate(self, model_name, prompt, timeout=None):
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("sin conexión")
+            return f"{model_name}: {prompt}"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+    
+    def stream(self, model_name, prompt, timeout=None):
+        # Los fragmentos son las palabras de la respuesta de generate
+        words = self.generate(model_name, prompt, timeout).split(" ")
+        for index, word in enumerate(words):
+            if index == self.break_after:
+                raise ConnectionError("conexión cortada")
+            yield word if index == len(words) - 1 else word + " "
+    
+    def close(self):
+        self.closed = True
+
+class AsyncFakeTransport:
+    """Transporte asíncrono en memoria que registra las llamadas en curso."""
+    
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.prompts = []
+        self.closed = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    async def generate(self, model_name, prompt, timeout=None):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("sin conexión")
+            return f"{model_name}: {prompt}"
+        finally:
+            self.in_flight -= 1
+    
+    async def close(self):
+        self.closed = True
+
+class TestLLMClient(unittest.TestCase):
+    """Pruebas del ciclo de vida y los reintentos del cliente."""
+    
+    def test_transport_is_opened_once_and_reused(self):
+        """Test de que todas las llamadas comparten el mismo transporte."""
+        created = []
+        def factory():
+            created.append(FakeTransport())
+            return created[-1]
+        client = LLMClient("modelo", transport_factory=factory)
+        self.assertFalse(client.started)
+        self.assertEqual(client.generate("hola"), "modelo: hola")
+        self.assertEqual(client.generate("chau"), "modelo: chau")
+        self.assertEqual(len(created), 1)
+        self.assertEqual(created[0].prompts, ["hola", "chau"])
+    
+    def test_close_releases_transport(self):
+        """Test de que close cierra el transporte y una llamada posterior lo reabre."""
+        transports = []
+        def factory():
+            transports.append(FakeTransport())
+            return transports[-1]
+        with LLMClient(transport_factory=factory) as client:
+            self.assertTrue(client.started)
+        self.assertTrue(transports[0].closed)
+        self.assertFalse(client.started)
+        client.generate("hola")
+        self.assertEqual(len(transports), 2)
+    
+    def test_retries_then_fails(self):
+        """Test de los reintentos y del error cuando se agotan."""
+        transport = FakeTransport(failures=1)
+        client = LLMClient(transport_factory=lambda: transport)
+        self.assertTrue(client.generate("hola", retry_delay=0).endswith("hola"))
+        self.assertEqual(client.stats()["retries"], 1)
+        
+        transport.failures = 3
+        with self.assertRaises(RuntimeError):
+            client.generate("hola", max_retries=3, retry_delay=0)
+        self.assertEqual(client.stats()["failures"], 1)
+    
+    def test_non_retryable_error_is_not_retried(self):
+        """Test de que un error del pedido falla sin reintentar ni abrir el circuito."""
+        class RejectingTransport(FakeTransport):
+            def generate(self, model_name, prompt, timeout=None):
+                self.prompts.append(prompt)
+                raise api_exceptions.InvalidArgument("prompt inválido")
+        transport = RejectingTransport()
+        client = LLMClient(transport_factory=lambda: transport, breaker=CircuitBreaker(failure_threshold=1))
+        with self.assertRaises(RuntimeError):
+            client.generate("hola", retry_delay=0)
+        self.assertEqual(len(transport.prompts), 1)
+        self.assertEqual(client.stats()["failures_by_reason"], {"non_retryable": 1})
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_deadline_limits_retries(self):
+        """Test de que no se reintenta si la espera supera el plazo de la llamada."""
+        transport = FakeTransport(failures=5)
+        client = LLMClient(transport_factory=lambda: transport,
+                           retry_policy=RetryPolicy(max_attempts=5, base_delay=1.0, jitter=0))
+        started = time.monotonic()
+        with self.assertRaises(RuntimeError):
+            client.generate("hola", deadline=0.5)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(client.stats()["failures_by_reason"], {"deadline": 1})
+    
+    def test_open_circuit_fails_fast(self):
+        """Test de que con el circuito abierto las llamadas fallan sin llegar al transporte."""
+        transport = FakeTransport(failures=2)
+        client = LLMClient(transport_factory=lambda: transport,
+                           breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        with self.assertRaises(CircuitOpenError):
+            client.generate("hola", max_retries=5, retry_delay=0)
+        self.assertEqual(len(transport.prompts), 2)
+        with self.assertRaises(CircuitOpenError):
+            client.generate("chau")
+        self.assertEqual(len(transport.prompts), 2)
+        stats = client.stats()
+        self.assertEqual(stats["retries_by_error"], {"ConnectionError": 2})
+        self.assertEqual(stats["failures_by_reason"], {"circuit_open": 2})
+        self.assertEqual(stats["circuit"]["transitions"], {"closed->open": 1})
+    
+    def test_factory_error_is_runtime_error(self):
+        """Test de que un error al abrir el transporte se informa como RuntimeError."""
+        def factory():
+            raise ValueError("sin credenciales")
+        with self.assertRaises(RuntimeError):
+            LLMClient(transport_factory=factory).start()
+    
+    def test_concurrency_is_capped(self):
+        """Test de que no hay más llamadas en curso que el límite configurado."""
+        transport = FakeTransport(delay=0.01)
+        client = LLMClient(max_concurrency=2, transport_factory=lambda: transport)
+        threads = [threading.Thread(target=client.generate, args=(str(i),)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(transport.prompts), 8)
+        self.assertLessEqual(transport.max_in_flight, 2)
+        self.assertEqual(client.stats()["calls"], 8)
+
+class TestLLMClientStream(unittest.TestCase):
+    """Pruebas de las respuestas en streaming."""
+    
+    def test_stream_yields_chunks_in_order(self):
+        """Test de que los fragmentos reconstruyen la respuesta completa."""
+        client = LLMClient("modelo", transport_factory=FakeTransport)
+        chunks = list(client.stream("hola que tal"))
+        self.assertEqual(chunks, ["modelo: ", "hola ", "que ", "tal"])
+        self.assertEqual(client.stats()["calls"], 1)
+    
+    def test_stream_retries_before_first_chunk(self):
+        """Test de que un fallo antes de entregar texto se reintenta."""
+        transport = FakeTransport(failures=1)
+        client = LLMClient("modelo", transport_factory=lambda: transport)
+        self.assertEqual("".join(client.stream("hola", retry_delay=0)), "modelo: hola")
+        self.assertEqual(client.stats()["retries"], 1)
+    
+    def test_stream_interrupted_after_text_is_not_retried(self):
+        """Test de que un corte después de entregar texto termina el stream con error."""
+        transport = FakeTransport(break_after=2)
+        client = LLMClient("modelo", transport_factory=lambda: transport)
+        chunks = []
+        with self.assertRaises(RuntimeError):
+            for chunk in client.stream("hola que tal", retry_delay=0):
+                chunks.append(chunk)
+        self.assertEqual(chunks, ["modelo: ", "hola "])
+        self.assertEqual(len(transport.prompts), 1)
+        self.assertEqual(client.stats()["failures_by_reason"], {"interrupted": 1})
+    
+    def test_closing_stream_releases_slot(self):
+        """Test de que dejar de leer el stream libera el cupo de concurrencia."""
+        client = LLMClient("modelo", max_concurrency=1, transport_factory=FakeTransport)
+        stream = client.stream("hola que tal")
+        next(stream)
+        stream.close()
+        self.assertEqual(client.generate("chau"), "modelo: chau")
+    
+    def test_send_prompt_stream(self):
+        """Test de send_prompt con stream sobre el cliente compartido."""
+        llm_integration.start_client(LLMClient("modelo", transport_factory=FakeTransport))
+        self.addCleanup(llm_integration.close_client)
+        self.assertEqual(list(llm_integration.send_prompt("hola", stream=True)), ["modelo: ", "hola"])
+
+class TestLLMClientCache(unittest.TestCase):
+    """Pruebas de la caché de respuestas en los clientes."""
+    
+    def test_repeated_prompt_is_served_from_cache(self):
+        """Test de que un prompt repetido no llega al transporte salvo que se pida."""
+        transport = FakeTransport()
+        client = LLMClient("modelo", transport_factory=lambda: transport, cache=ResponseCache(db_path=None))
+        self.assertEqual(client.generate("hola"), "modelo: hola")
+        self.assertEqual(client.generate("hola"), "modelo: hola")
+        self.assertEqual(len(transport.prompts), 1)
+        client.generate("hola", use_cache=False)
+        self.assertEqual(len(transport.prompts), 2)
+        self.assertEqual(client.stats()["calls"], 2)
+        self.assertEqual(client.cache.stats()["hit_ratio"], 0.5)
+    
+    def test_generation_config_is_sent_and_keyed(self):
+        """Test de que la configuración de generación llega al transporte y separa las entradas."""
+        class ConfigTransport(FakeTransport):
+            def generate(self, model_name, prompt, timeout=None, generation_config=None):
+                self.prompts.append((prompt, generation_config))
+                return f"{prompt} {generation_config['temperature']}"
+        transport = ConfigTransport()
+        cache = ResponseCache(db_path=None)
+        cold = LLMClient("modelo", transport_factory=lambda: transport, cache=cache,
+                         generation_config={"temperature": 0})
+        warm = LLMClient("modelo", transport_factory=lambda: transport, cache=cache,
+                         generation_config={"temperature": 1})
+        self.assertEqual(cold.generate("hola"), "hola 0")
+        self.assertEqual(warm.generate("hola"), "hola 1")
+        self.assertEqual(cold.generate("hola"), "hola 0")
+        self.assertEqual(transport.prompts, [("hola", {"temperature": 0}), ("hola", {"temperature": 1})])
+    
+    def test_providers_do_not_share_cached_responses(self):
+        """Test de que las respuestas del proveedor falso no se sirven a un cliente de Gemini."""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        db_path = os.path.join(tmpdir, "llm_cache.db")
+        fake_transport = FakeTransport()
+        real_transport = FakeTransport()
+        fake = LLMClient("modelo", transport_factory=lambda: fake_transport,
+                         cache=ResponseCache(db_path=db_path), provider="fake")
+        real = LLMClient("modelo", transport_factory=lambda: real_transport,
+                         cache=ResponseCache(db_path=db_path), provider="gemini")
+        fake.generate("hola")
+        real.generate("hola")
+        self.assertEqual((len(fake_transport.prompts), len(real_transport.prompts)), (1, 1))
+        self.assertEqual(real.cache.stats()["disk_entries"], 2)
+    
+    def test_failures_are_not_cached(self):
+        """Test de que un error no deja nada en la caché."""
+        transport = FakeTransport(failures=1)
+        client = LLMClient("modelo", transport_factory=lambda: transport, cache=ResponseCache(db_path=None),
+                           retry_policy=RetryPolicy(max_attempts=1))
+        with self.assertRaises(RuntimeError):
+            client.generate("hola")
+        self.assertEqual(client.generate("hola"), "modelo: hola")
+        self.assertEqual(len(transport.prompts), 2)
+    
+    def test_stream_is_cached_only_when_complete(self):
+        """Test de que solo un stream leído completo se guarda y luego se entrega entero."""
+        transport = FakeTransport()
+        client = LLMClient("modelo", transport_factory=lambda: transport, cache=ResponseCache(db_path=None))
+        stream = client.stream("hola que tal")
+        next(stream)
+        stream.close()
+        self.assertEqual(list(client.stream("hola que tal")), ["modelo: ", "hola ", "que ", "tal"])
+        self.assertEqual(list(client.stream("hola que tal")), ["modelo: hola que tal"])
+        self.assertEqual(len(transport.prompts), 2)
+    
+    def test_async_client_uses_cache(self):
+        """Test de la caché en el cliente asíncrono."""
+        transport = AsyncFakeTransport()
+        client = AsyncLLMClient("modelo", transport_factory=lambda: transport, cache=ResponseCache(db_path=None))
+        async def run():
+            return [await client.generate("hola") for _ in range(3)]
+        self.assertEqual(asyncio.run(run()), ["modelo: hola"] * 3)
+        self.assertEqual(len(transport.prompts), 1)
+    
+    def test_async_client_uses_disk_tier_off_the_event_loop(self):
+        """Test de que el cliente asíncrono lee y escribe el disco fuera del event loop."""
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        cache = ResponseCache(db_path=os.path.join(tmpdir, "llm_cache.db"))
+        threads = []
+        for name in ("get_disk", "put"):
+            original = getattr(cache, name)
+            def record(*args, original=original):
+                threads.append(threading.get_ident())
+                return original(*args)
+            setattr(cache, name, record)
+        transport = AsyncFakeTransport()
+        client = AsyncLLMClient("modelo", transport_factory=lambda: transport, cache=cache)
+        async def run():
+            return [await client.generate("hola") for _ in range(2)], threading.get_ident()
+        responses, loop_thread = asyncio.run(run())
+        self.assertEqual(responses, ["modelo: hola"] * 2)
+        self.assertEqual(len(transport.prompts), 1)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+        self.assertEqual(cache.stats()["disk_entries"], 1)
+
+class TestSharedClient(unittest.TestCase):
+    """Pruebas de los ganchos de inicio y cierre del cliente compartido."""
+    
+    def tearDown(self):
+        """Cierra el cliente compartido."""
+        llm_integration.close_client()
+    
+    def test_start_send_and_close(self):
+        """Test de send_prompt con el cliente instalado al iniciar."""
+        transport = FakeTransport()
+        client = llm_integration.start_client(LLMClient("modelo", transport_factory=lambda: transport))
+        self.assertIs(llm_integration.get_client(), client)
+        self.assertEqual(llm_integration.send_prompt("hola"), "modelo: hola")
+        llm_integration.close_client()
+        self.assertTrue(transport.closed)
+
+class TestAsyncLLMClient(unittest.IsolatedAsyncioTestCase):
+    """Pruebas del cliente asíncrono."""
+    
+    async def asyncTearDown(self):
+        """Cierra el cliente asíncrono compartido."""
+        await llm_integration.close_async_client()
+    
+    async def test_concurrency_is_capped(self):
+        """Test de que el semáforo limita las llamadas en curso."""
+        transport = AsyncFakeTransport(delay=0.01)
+        client = AsyncLLMClient(max_concurrency=3, transport_factory=lambda: transport)
+        results = await asyncio.gather(*(client.generate(str(i)) for i in range(20)))
+        self.assertEqual(len(results), 20)
+        self.assertEqual(transport.max_in_flight, 3)
+        self.assertEqual(client.stats()["in_flight"], 0)
+    
+    async def test_retries_then_fails(self):
+        """Test de los reintentos y del error cuando se agotan."""
+        transport = AsyncFakeTransport(failures=1)
+        client = AsyncLLMClient("modelo", transport_factory=lambda: transport)
+        self.assertEqual(await client.generate("hola", retry_delay=0), "modelo: hola")
+        transport.failures = 2
+        with self.assertRaises(RuntimeError):
+            await client.generate("hola", max_retries=2, retry_delay=0)
+        self.assertEqual(client.stats()["retries"], 2)
+        self.assertEqual(client.stats()["failures"], 1)
+    
+    async def test_backoff_is_cancellable_and_frees_slot(self):
+        """Test de que cancelar durante la espera entre reintentos no retiene el cupo."""
+        transport = AsyncFakeTransport(failures=1)
+        client = AsyncLLMClient(max_concurrency=1, transport_factory=lambda: transport)
+        task = asyncio.create_task(client.generate("hola", retry_delay=60))
+        while client.retries == 0:
+            await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(await asyncio.wait_for(client.generate("chau"), 1), "gemini-pro: chau")
+    
+    async def test_send_prompt_async_uses_shared_client(self):
+        """Test de send_prompt_async con el cliente instalado al iniciar."""
+        transport = AsyncFakeTransport()
+        await llm_integration.start_async_client(
+            AsyncLLMClient("modelo", transport_factory=lambda: transport)
+        )
+        self.assertEqual(await llm_integration.send_prompt_async("hola"), "modelo: hola")
+        await llm_integration.close_async_client()
+        self.assertTrue(transport.closed)
+
+class TestAsyncClientEventLoops(unittest.TestCase):
+    """Pruebas del cliente asíncrono usado desde varios event loops."""
+    
+    def test_client_rebinds_to_new_event_loop(self):
+        """Test de que el cliente se puede usar desde event loops sucesivos."""
+        created = []
+        def factory():
+            created.append(AsyncFakeTransport())
+            return created[-1]
+        client = AsyncLLMClient(transport_factory=factory)
+        self.assertTrue(asyncio.run(client.generate("uno")).endswith("uno"))
+        self.assertTrue(asyncio.run(client.generate("dos")).endswith("dos"))
+        self.assertEqual(len(created), 2)
+
+class TestGeminiTransport(unittest.TestCase):
+    """Pruebas del pool de conexiones contra un servidor gRPC local."""
+    
+    def setUp(self):
+        """Levanta el servidor falso."""
+        self.server, self.target = start_fake_gemini()
+    
+    def tearDown(self):
+        """Detiene el servidor falso."""
+        self.server.stop(None)
+    
+    def test_calls_over_pool(self):
+        """Test de llamadas sucesivas sobre un pool de dos canales."""
+        channels = [grpc.insecure_channel(self.target) for _ in range(2)]
+        transport = GeminiTransport(channels=channels)
+        try:
+            for _ in range(4):
+                self.assertEqual(
+                    transport.generate("gemini-pro", "hola"),
+                    "respuesta (models/gemini-pro: hola)"
+                )
+        finally:
+            transport.close()
+    
+    def test_stream_over_pool(self):
+        """Test del streaming contra el servidor local."""
+        transport = GeminiTransport(channels=[grpc.insecure_channel(self.target)])
+        try:
+            chunks = list(transport.stream("gemini-pro", "hola"))
+        finally:
+            transport.close()
+        self.assertEqual(chunks, ["respuesta ", "(models/gemini-pro: ", "hola) "])
+    
+    def test_async_calls_over_pool(self):
+        """Test del transporte asíncrono contra el servidor local."""
+        async def run():
+            transport = AsyncGeminiTransport(channels=[grpc.aio.insecure_channel(self.target)])
+            try:
+                return await asyncio.gather(*(transport.generate("gemini-pro", str(i)) for i in range(3)))
+            finally:
+                await transport.close()
+        self.assertEqual(asyncio.run(run())[2], "respuesta (models/gemini-pro: 2)")
+    
+    def test_gemini_pool_opens_without_network(self):
+        """Test de que el pool contra Gemini se crea sin conectarse todavía."""
+        transport = GeminiTransport(api_key="clave", pool_size=3)
+        self.assertEqual(len(transport._clients), 3)
+        transport.close()
+
+if __name__ == '__main__':
+    unittest.main()
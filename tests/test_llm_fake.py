@@ -0,0 +1,112 @@
+"""
+Tests para el proveedor LLM falso local.
+"""
+import unittest
+import sys
+import os
+import asyncio
+import time
+import warnings
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", FutureWarning)
+    import llm_integration
+from google.api_core import exceptions as api_exceptions
+from llm_integration import LLMClient, AsyncLLMClient, create_transport, create_async_transport
+from llm_fake import FakeProfile, FakeLLMTransport, AsyncFakeLLMTransport, fake_reply, parse_prompt_responses
+from llm_retry import RetryPolicy
+from prompts import format_analysis_prompt, get_reply_prompt, REQUIRED_TOPICS
+from diagnosis_parser import parse_llm_response
+from chatbot import ChatBot
+
+INSTANT = FakeProfile(latency_median=0, chunk_delay=0, chunk_chars=10)
+RESPONSES = {"main_concern": "Tengo ataques de pánico y mucho miedo", "sleep": "Duermo muy mal"}
+
+class TestFakeReplies(unittest.TestCase):
+    """Pruebas de las respuestas simuladas."""
+    
+    def test_analysis_reply_has_expected_shape(self):
+        """Test de que el análisis simulado pasa process_response y parse_llm_response."""
+        prompt = format_analysis_prompt(RESPONSES)
+        self.assertEqual(parse_prompt_responses(prompt), RESPONSES)
+        reply = fake_reply(prompt)
+        data = llm_integration.process_response(reply)
+        for field in ("urgency_level", "main_concerns", "recommendations", "risk_factors", "protective_factors"):
+            self.assertIn(field, data)
+        self.assertIsNotNone(parse_llm_response(reply))
+    
+    def test_reply_prompt_asks_the_question(self):
+        """Test de que a un prompt de respuesta contesta con la pregunta pedida."""
+        covered = {topic: False for topic in REQUIRED_TOPICS}
+        prompt = get_reply_prompt("Me siento triste", [], covered, {}, "¿Desde cuándo?")
+        self.assertTrue(fake_reply(prompt).endswith("¿Desde cuándo?"))
+
+class TestFakeTransport(unittest.TestCase):
+    """Pruebas de latencia, errores y fragmentos."""
+    
+    def test_stream_chunking(self):
+        """Test de que la respuesta se entrega en fragmentos del tamaño configurado."""
+        transport = FakeLLMTransport(INSTANT)
+        chunks = list(transport.stream("modelo", "hola"))
+        self.assertTrue(all(len(chunk) <= 10 for chunk in chunks))
+        self.assertEqual("".join(chunks), transport.generate("modelo", "hola"))
+        self.assertEqual(transport.provider.stats(), {"calls": 2, "errors": 0})
+    
+    def test_latency_distribution(self):
+        """Test de que la latencia sorteada es reproducible con semilla y se aplica."""
+        profile = FakeProfile(latency_median=0.01, latency_sigma=0.5, chunk_delay=0)
+        first = [FakeLLMTransport(profile, seed=7).provider.plan("x", None)[0] for _ in range(2)]
+        self.assertEqual(first[0], first[1])
+        fixed = FakeLLMTransport(FakeProfile(latency_median=0.02, latency_sigma=0, chunk_delay=0))
+        started = time.monotonic()
+        fixed.generate("modelo", "hola")
+        self.assertGreaterEqual(time.monotonic() - started, 0.02)
+    
+    def test_errors_and_timeouts(self):
+        """Test de los errores transitorios y del vencimiento del plazo."""
+        failing = FakeLLMTransport(FakeProfile(latency_median=0, error_rate=1.0))
+        with self.assertRaises(api_exceptions.ServiceUnavailable):
+            failing.generate("modelo", "hola")
+        slow = FakeLLMTransport(FakeProfile(latency_median=10, latency_sigma=0))
+        with self.assertRaises(api_exceptions.DeadlineExceeded):
+            slow.generate("modelo", "hola", timeout=0.01)
+    
+    def test_client_retries_fake_errors(self):
+        """Test de que el cliente reintenta los errores simulados y abre el circuito como con Gemini."""
+        transport = FakeLLMTransport(FakeProfile(latency_median=0, error_rate=1.0))
+        client = LLMClient(transport_factory=lambda: transport,
+                           retry_policy=RetryPolicy(max_attempts=2, base_delay=0))
+        with self.assertRaises(RuntimeError):
+            client.generate("hola")
+        self.assertEqual(transport.provider.stats()["calls"], 2)
+        self.assertEqual(client.stats()["retries_by_error"], {"ServiceUnavailable": 1})
+    
+    def test_async_transport(self):
+        """Test del transporte asíncrono a través del cliente."""
+        client = AsyncLLMClient(transport_factory=lambda: AsyncFakeLLMTransport(INSTANT))
+        reply = asyncio.run(client.generate(format_analysis_prompt(RESPONSES)))
+        self.assertIsNotNone(parse_llm_response(reply))
+
+class TestProviderSelection(unittest.TestCase):
+    """Pruebas de la elección del proveedor."""
+    
+    def test_create_transport_by_name(self):
+        """Test de los nombres de proveedor."""
+        self.assertIsInstance(create_transport("fake"), FakeLLMTransport)
+        self.assertIsInstance(create_async_transport("fake"), AsyncFakeLLMTransport)
+        with self.assertRaises(ValueError):
+            create_transport("otro")
+    
+    def test_chatbot_replies_offline(self):
+        """Test de una conversación con respuestas del LLM sin red."""
+        llm_integration.start_client(LLMClient(transport_factory=lambda: FakeLLMTransport(INSTANT)))
+        self.addCleanup(llm_integration.close_client)
+        chatbot = ChatBot()
+        chatbot.start_conversation()
+        events = list(chatbot.stream_message("Me siento triste", llm_replies=True))
+        self.assertGreater(len(events), 2)
+        self.assertTrue(events[-1][1]["message"].startswith("Gracias por contármelo"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests para la política de reintentos y el circuit breaker de las llamadas al LLM.
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from google.api_core import exceptions as api_exceptions
+from llm_retry import RetryPolicy, CircuitBreaker, CircuitOpenError
+
+class FakeClock:
+    """Reloj manual para el circuit breaker."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class TestRetryPolicy(unittest.TestCase):
+    """Pruebas de la espera entre reintentos."""
+    
+    def test_exponential_backoff_with_cap(self):
+        """Test de que la espera se duplica hasta el tope sin jitter."""
+        policy = RetryPolicy(base_delay=0.5, max_delay=3.0, jitter=0)
+        self.assertEqual([policy.backoff(attempt) for attempt in range(1, 6)], [0.5, 1.0, 2.0, 3.0, 3.0])
+    
+    def test_jitter_reduces_delay_within_bounds(self):
+        """Test de que el jitter descuenta como máximo la fracción configurada."""
+        policy = RetryPolicy(base_delay=2.0, jitter=0.5)
+        self.assertEqual(policy.backoff(1, rng=lambda: 0.0), 2.0)
+        self.assertEqual(policy.backoff(1, rng=lambda: 0.999999), 2.0 * (1 - 0.5 * 0.999999))
+    
+    def test_only_transient_errors_are_retried(self):
+        """Test de los errores reintentables."""
+        policy = RetryPolicy(jitter=0)
+        self.assertIsNotNone(policy.next_delay(api_exceptions.ServiceUnavailable("caído"), 1, None))
+        self.assertIsNotNone(policy.next_delay(ConnectionError(), 1, None))
+        self.assertIsNone(policy.next_delay(api_exceptions.InvalidArgument("prompt"), 1, None))
+        self.assertIsNone(policy.next_delay(ValueError(), 1, None))
+    
+    def test_attempts_and_deadline_stop_retries(self):
+        """Test de que no se reintenta sin intentos ni tiempo disponible."""
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, jitter=0, deadline=5.0)
+        error = TimeoutError()
+        self.assertIsNone(policy.next_delay(error, 3, None))
+        deadline_at = policy.deadline_at(100.0)
+        self.assertEqual(deadline_at, 105.0)
+        self.assertEqual(policy.next_delay(error, 1, deadline_at, now=103.0), 1.0)
+        self.assertIsNone(policy.next_delay(error, 2, deadline_at, now=103.0))
+    
+    def test_overrides(self):
+        """Test de que los valores por llamada reemplazan solo lo indicado."""
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, deadline=30.0)
+        changed = policy.with_overrides(max_attempts=5)
+        self.assertEqual((changed.max_attempts, changed.base_delay, changed.deadline), (5, 1.0, 30.0))
+        self.assertIs(policy.with_overrides(), policy)
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Pruebas de los estados del circuito."""
+    
+    def setUp(self):
+        """Crea un circuito con reloj manual."""
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=self.clock)
+    
+    def test_opens_after_consecutive_failures(self):
+        """Test de que los fallos seguidos abren el circuito y un éxito los reinicia."""
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.assertEqual(self.breaker.stats()["rejected"], 1)
+    
+    def test_half_open_allows_one_probe(self):
+        """Test de la llamada de prueba después de la espera."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 10
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.stats()["transitions"], {
+            "closed->open": 1, "open->half_open": 1, "half_open->closed": 1
+        })
+    
+    def test_failed_probe_reopens(self):
+        """Test de que una prueba fallida vuelve a abrir el circuito."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 10
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now = 15
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+    
+    def test_released_probe_can_be_retried(self):
+        """Test de que una prueba cancelada libera el paso a otra."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now = 10
+        self.breaker.before_call()
+        self.breaker.release()
+        self.breaker.before_call()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Tests para el flujo de preguntas basado en tablas.
+"""
+import unittest
+import sys
+import os
+import json
+import random
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from question_flow import QuestionFlow, DEFAULT_FLOW_CONFIG, QUESTION_FLOW, load_flow
+from prompts import get_next_question
+from chatbot import ChatBot, QUESTION_MAP
+
+def legacy_next_question(answered, risk):
+    """Selección lineal anterior, como referencia."""
+    sequence = DEFAULT_FLOW_CONFIG["sequence"]
+    if not answered:
+        return sequence[0]
+    if "self_harm" not in answered and risk:
+        return "self_harm"
+    for question in sequence:
+        if question not in answered:
+            return question
+    return None
+
+class TestQuestionFlow(unittest.TestCase):
+    """Pruebas del flujo compilado."""
+    
+    def test_matches_linear_selection(self):
+        """Test de equivalencia con la selección lineal sobre todos los estados."""
+        sequence = DEFAULT_FLOW_CONFIG["sequence"]
+        for mask in range(1 << len(sequence)):
+            answered = {question for index, question in enumerate(sequence) if mask & (1 << index)}
+            # El riesgo sale de las respuestas: sin respuestas no hay señal
+            for risk in ((False, True) if answered else (False,)):
+                self.assertEqual(
+                    QUESTION_FLOW.next_question(QUESTION_FLOW.mask_of(answered), ("risk",) if risk else ()),
+                    legacy_next_question(answered, risk)
+                )
+    
+    def test_ignores_unknown_answers(self):
+        """Test de que respuestas ajenas al flujo no cambian la máscara."""
+        self.assertEqual(QUESTION_FLOW.mask_of(["otra_cosa"]), 0)
+    
+    def test_invalid_config(self):
+        """Test de configuraciones inválidas."""
+        with self.assertRaises(ValueError):
+            QuestionFlow.from_config({"sequence": []})
+        with self.assertRaises(ValueError):
+            QuestionFlow.from_config({"sequence": ["a", "a"]})
+        with self.assertRaises(ValueError):
+            QuestionFlow.from_config({"sequence": ["a"], "priority": [{"signal": "risk", "question": "b"}]})
+        with self.assertRaises(ValueError):
+            QuestionFlow.from_config({"priority": []})
+    
+    def test_load_from_file(self):
+        """Test de carga de un flujo alternativo desde JSON."""
+        config = {"sequence": ["main_concern", "self_harm", "sleep"],
+                  "priority": [{"signal": "risk", "question": "sleep"}]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "flow.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(config, f)
+            flow = load_flow(path)
+        mask = flow.mask_of(["main_concern"])
+        self.assertEqual(flow.next_question(mask), "self_harm")
+        self.assertEqual(flow.next_question(mask, ("risk",)), "sleep")
+        self.assertIsNone(flow.next_question(flow.mask_of(config["sequence"])))
+
+class TestChatBotFlow(unittest.TestCase):
+    """Pruebas del flujo dentro del chatbot."""
+    
+    def test_conversation_follows_flow(self):
+        """Test de que el chatbot y prompts.get_next_question eligen lo mismo."""
+        rng = random.Random(15)
+        for _ in range(20):
+            chatbot = ChatBot()
+            chatbot.start_conversation()
+            while True:
+                message = rng.choice(["Estoy bien", "Pienso en morir", "Me cuesta dormir", "No sé"])
+                response = chatbot.process_message(message)
+                if "analysis" in response:
+                    self.assertIsNone(get_next_question(chatbot.responses))
+                    break
+                expected_after = get_next_question(chatbot.responses)
+                self.assertEqual(response["message"], QUESTION_MAP[expected_after])
+                self.assertEqual(chatbot._current_question, expected_after)
+    
+    def test_risk_jumps_to_self_harm(self):
+        """Test del salto prioritario a la pregunta de autolesión."""
+        responses = {"main_concern": "Me siento muy mal, a veces pienso en la muerte"}
+        self.assertEqual(get_next_question(responses), "self_harm")
+        responses["self_harm"] = "No"
+        self.assertEqual(get_next_question(responses), "duration")
+
+if __name__ == '__main__':
+    unittest.main()
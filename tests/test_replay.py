@@ -0,0 +1,107 @@
+"""
+Tests para el reanálisis de conversaciones guardadas con las reglas actuales.
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+import replay
+from replay import replay_conversations, replay_payload
+from chatbot import rule_based_analysis
+from symptom_state import SymptomState
+from helpers import TemporaryStorageMixin, make_conversation
+
+PANIC = {"main_concern": "Tengo ataques de pánico y mucho miedo"}
+SAD = {"main_concern": "Me siento triste", "duration": "Hace meses"}
+
+def current_analysis(responses):
+    """Análisis del chatbot con las reglas actuales."""
+    analysis = rule_based_analysis(SymptomState.from_responses(responses))
+    return analysis["urgency_level"], [d["condition"] for d in analysis["preliminary_diagnoses"]]
+
+class TestReplay(unittest.TestCase):
+    """Pruebas del reporte de diferencias."""
+    
+    def test_payload_extracts_stored_analysis(self):
+        """Test de los datos que se envían a los procesos."""
+        payload = replay_payload(make_conversation("a", responses=PANIC, urgency_level="ALTO",
+                                                   conditions=["Trastorno de Pánico"]))
+        self.assertEqual(payload, ("a", PANIC, "ALTO", ("Trastorno de Pánico",)))
+        self.assertEqual(replay_payload(make_conversation("b", responses=SAD))[2:], (None, ()))
+    
+    def test_unchanged_conversations_produce_no_diff(self):
+        """Test de que un análisis vigente no cuenta como cambio."""
+        urgency, conditions = current_analysis(PANIC)
+        conversation = make_conversation("a", responses=PANIC, urgency_level=urgency, conditions=conditions)
+        report = replay_conversations([conversation], workers=1)
+        self.assertEqual(report["changed"], 0)
+        self.assertEqual(report["urgency_transitions"], {urgency: {urgency: 1}})
+        self.assertEqual(report["diagnoses"], {})
+        self.assertEqual(report["samples"], [])
+    
+    def test_reports_urgency_transitions_and_diagnosis_changes(self):
+        """Test de las transiciones de urgencia y los diagnósticos ganados o perdidos."""
+        urgency, conditions = current_analysis(PANIC)
+        conversations = [
+            make_conversation("a", responses=PANIC, urgency_level="ALTO", conditions=["Depresión Mayor"]),
+            make_conversation("b", responses=PANIC, urgency_level="ALTO"),
+            make_conversation("c", responses=SAD)
+        ]
+        report = replay_conversations(conversations, workers=1, chunk_size=2)
+        self.assertEqual(report["conversations"], 3)
+        self.assertEqual(report["analyzed"], 2)
+        self.assertEqual(report["changed"], 2)
+        self.assertEqual(report["urgency_transitions"], {"ALTO": {urgency: 2}})
+        self.assertEqual(report["diagnoses"]["Depresión Mayor"], {"gained": 0, "lost": 1})
+        for condition in conditions:
+            self.assertEqual(report["diagnoses"][condition], {"gained": 2, "lost": 0})
+        self.assertEqual(report["samples"][0], {
+            "conversation_id": "a",
+            "urgency": ["ALTO", urgency],
+            "gained": conditions,
+            "lost": ["Depresión Mayor"]
+        })
+    
+    def test_sample_limit(self):
+        """Test de que los ejemplos se limitan sin afectar los contadores."""
+        conversations = [make_conversation(str(i), responses=PANIC, urgency_level="ALTO") for i in range(5)]
+        report = replay_conversations(conversations, workers=1, chunk_size=2, sample_limit=3)
+        self.assertEqual(report["changed"], 5)
+        self.assertEqual(len(report["samples"]), 3)
+    
+    def test_large_sample_limit_reaches_workers(self):
+        """Test de que un límite mayor al predeterminado también se aplica dentro de cada bloque."""
+        count = replay.REPLAY_SAMPLE_LIMIT + 5
+        conversations = [make_conversation(str(i), responses=PANIC, urgency_level="ALTO") for i in range(count)]
+        for workers in (1, 2):
+            report = replay_conversations(conversations, workers=workers, chunk_size=count, sample_limit=count)
+            self.assertEqual(len(report["samples"]), count)
+    
+    def test_pool_matches_in_process(self):
+        """Test de que el reporte en paralelo coincide con el secuencial."""
+        conversations = [
+            make_conversation(str(i), responses=PANIC if i % 2 else SAD, urgency_level="MEDIO",
+                              conditions=["Depresión Mayor"])
+            for i in range(40)
+        ]
+        sequential = replay_conversations(conversations, workers=1, chunk_size=7)
+        parallel = replay_conversations(conversations, workers=2, chunk_size=7)
+        for field in ("conversations", "analyzed", "changed", "urgency_transitions", "diagnoses"):
+            self.assertEqual(parallel[field], sequential[field])
+
+class TestReplayStorage(TemporaryStorageMixin, unittest.TestCase):
+    """Pruebas del reanálisis del almacenamiento activo y el archivo."""
+    
+    def test_replay_storage_reads_backend(self):
+        """Test de que se reanalizan las conversaciones guardadas."""
+        storage.save_conversation(make_conversation("a", responses=PANIC, urgency_level="ALTO"))
+        storage.save_conversation(make_conversation("b", responses=SAD))
+        report = replay.replay_storage(workers=1)
+        self.assertEqual(report["conversations"], 2)
+        self.assertEqual(report["analyzed"], 1)
+        self.assertIn("Conversaciones: 2", replay.format_report(report))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Tests para el motor vectorizado de urgencia y criterios diagnósticos.
+"""
+import unittest
+import sys
+import os
+import random
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scoring_engine import ScoringEngine, SCORING_ENGINE
+from prompts import (
+    SYMPTOM_WEIGHTS,
+    DIAGNOSTIC_CRITERIA,
+    SYMPTOM_KEYWORDS,
+    calculate_urgency_level,
+    validate_diagnosis
+)
+
+def legacy_diagnoses(symptoms):
+    """Diagnósticos calculados criterio por criterio, como referencia."""
+    result = []
+    for condition, criteria in DIAGNOSTIC_CRITERIA.items():
+        if validate_diagnosis(symptoms, criteria):
+            relevant = criteria.get("required_symptoms", []) + criteria.get("additional_symptoms", [])
+            matched = [s for s in symptoms if s in relevant]
+            result.append({
+                "condition": condition,
+                "confidence": len(matched) / len(relevant) * 100,
+                "key_indicators": matched
+            })
+    return result
+
+class TestScoringEngine(unittest.TestCase):
+    """Pruebas del motor compilado."""
+    
+    def test_matches_rule_functions(self):
+        """Test de equivalencia con calculate_urgency_level y validate_diagnosis."""
+        vocabulary = list(SCORING_ENGINE.symptoms) + list(SYMPTOM_KEYWORDS.values()) + ["desconocido"]
+        rng = random.Random(17)
+        symptom_sets = [[rng.choice(vocabulary) for _ in range(rng.randint(0, 12))] for _ in range(2000)]
+        scores = SCORING_ENGINE.score(symptom_sets)
+        self.assertEqual(len(scores), len(symptom_sets))
+        for row, symptoms in enumerate(symptom_sets):
+            self.assertEqual(scores.urgency_level(row), calculate_urgency_level(symptoms, SYMPTOM_WEIGHTS), symptoms)
+            self.assertEqual(scores.diagnoses(row, symptoms), legacy_diagnoses(symptoms), symptoms)
+    
+    def test_repeated_symptoms_count_twice(self):
+        """Test de que un síntoma repetido suma su peso dos veces."""
+        engine = ScoringEngine(
+            weights={"mood": {"a": 5}},
+            criteria={"X": {"required_symptoms": ["a"], "additional_symptoms": ["b"], "minimum_symptoms": 2}},
+            urgency_criteria={"ALTO": {"required": ["c"]}, "MEDIO": {"threshold": 10}}
+        )
+        scores = engine.score([["a"], ["a", "a"], ["c"], []])
+        self.assertEqual([scores.urgency_level(row) for row in range(4)], ["BAJO", "MEDIO", "ALTO", "BAJO"])
+        self.assertEqual(scores.conditions(0), [])
+        self.assertEqual(scores.conditions(1), ["X"])
+        self.assertEqual(scores.diagnoses(1, ["a", "a"])[0]["confidence"], 100.0)
+    
+    def test_empty_batch(self):
+        """Test de un lote vacío."""
+        self.assertEqual(len(SCORING_ENGINE.score([])), 0)
+
+if __name__ == '__main__':
+    unittest.main()
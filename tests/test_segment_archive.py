@@ -0,0 +1,144 @@
+"""
+Tests para el archivo comprimido de conversaciones.
+"""
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from storage import JSONFileBackend
+from segment_archive import SegmentArchive
+from helpers import TemporaryStorageMixin, days_ago, make_conversation
+
+# Análisis típico guardado con cada conversación archivada
+TYPICAL_ANALYSIS = {
+    "main_concerns": ["Depressed Mood", "Sleep Changes"],
+    "recommendations": [
+        "Programar una evaluación profesional cuando sea conveniente",
+        "Mantener registro de síntomas y su frecuencia"
+    ],
+    "risk_factors": [],
+    "protective_factors": []
+}
+
+def old_conversation(conversation_id, days, urgency_level="BAJO"):
+    """Crea una conversación de hace `days` días con un análisis típico."""
+    responses = {"main_concern": f"Me siento triste ({conversation_id})", "sleep": "Duermo mal"}
+    return make_conversation(conversation_id, days_ago(days), responses=responses,
+                             urgency_level=urgency_level, analysis=TYPICAL_ANALYSIS)
+
+class TestSegmentArchive(unittest.TestCase):
+    """Pruebas del archivo de segmentos."""
+    
+    def setUp(self):
+        """Crea un directorio temporal."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.archive = SegmentArchive(os.path.join(self.tmpdir, "archive"), max_segment_bytes=2000)
+    
+    def tearDown(self):
+        """Elimina los archivos temporales."""
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_append_and_load(self):
+        """Test de lectura individual tras anexar varios lotes y segmentos."""
+        conversations = [old_conversation(f"id{i}", i) for i in range(30)]
+        for start in range(0, 30, 5):
+            self.archive.append_many(conversations[start:start + 5])
+        self.assertGreater(self.archive.stats()["segments"], 1)
+        self.assertEqual(self.archive.load("id17"), conversations[17])
+        self.assertIsNone(self.archive.load("no-existe"))
+        # Otro proceso ve los mismos datos leyendo solo los índices
+        self.assertEqual(SegmentArchive(self.archive.directory).load("id3"), conversations[3])
+    
+    def test_compression_ratio(self):
+        """Test de que el archivo ocupa mucho menos que los JSON con indentación."""
+        conversations = [old_conversation(f"id{i}", i) for i in range(50)]
+        self.archive.append_many(conversations)
+        pretty_bytes = sum(len(json.dumps(c, ensure_ascii=False, indent=2).encode('utf-8')) for c in conversations)
+        self.assertLess(self.archive.stats()["bytes"], pretty_bytes / 2)
+    
+    def test_summaries_and_tombstones(self):
+        """Test de listado ordenado y de lápidas."""
+        self.archive.append_many([old_conversation(f"id{i}", i) for i in range(5)])
+        self.archive.delete("id1")
+        ids = [s["id"] for s in self.archive.iter_summaries()]
+        self.assertEqual(ids, ["id0", "id2", "id3", "id4"])
+        page = list(self.archive.iter_summaries(after=storage.summary_sort_key(
+            self.archive.iter_summaries().__next__()), limit=2))
+        self.assertEqual([s["id"] for s in page], ["id2", "id3"])
+        self.assertIsNone(self.archive.load("id1"))
+    
+    def test_contains_sees_other_writers(self):
+        """Test de que la pertenencia relee los índices si otra instancia anexó después."""
+        reader = SegmentArchive(self.archive.directory)
+        self.assertNotIn("id0", reader)
+        self.archive.append_many([old_conversation("id0", 0)])
+        self.assertIn("id0", reader)
+    
+    def test_contains_refreshes_only_after_appends(self):
+        """Test de que una búsqueda fallida no relee los índices si nadie anexó nada."""
+        self.archive.append_many([old_conversation("id0", 0)])
+        reader = SegmentArchive(self.archive.directory)
+        self.assertIn("id0", reader)
+        with mock.patch.object(reader, "refresh", wraps=reader.refresh) as refresh:
+            self.assertNotIn("nueva", reader)
+            self.assertNotIn("nueva", reader)
+            self.assertEqual(refresh.call_count, 0)
+            # Anexos al segmento activo y a uno nuevo (max_segment_bytes=2000)
+            for i in range(1, 25):
+                self.archive.append_many([old_conversation(f"id{i}", i)])
+                self.assertIn(f"id{i}", reader)
+            self.assertGreater(self.archive.stats()["segments"], 1)
+            self.assertEqual(refresh.call_count, 24)
+
+class TestCompaction(TemporaryStorageMixin, unittest.TestCase):
+    """Pruebas de la compactación desde el almacenamiento activo."""
+    
+    def create_backend(self):
+        return JSONFileBackend(os.path.join(self.tmpdir, "hot"), layout='sharded')
+    
+    def test_compact_moves_old_conversations(self):
+        """Test de que las conversaciones antiguas siguen visibles tras archivarse."""
+        for i in range(6):
+            storage.save_conversation(old_conversation(f"id{i}", i * 10))
+        self.assertEqual(storage.compact_archive(15), 4)
+        self.assertEqual(len(list(self.backend.iter_conversations())), 2)
+        self.assertEqual(storage.load_conversation("id5")["metadata"]["conversation_id"], "id5")
+        self.assertEqual([s["id"] for s in storage.iter_conversation_summaries(limit=10)],
+                         ["id0", "id1", "id2", "id3", "id4", "id5"])
+        self.assertEqual(len(storage.get_conversation_history()), 6)
+    
+    def test_resave_reactivates_archived_conversation(self):
+        """Test de que guardar una conversación archivada anula la copia archivada."""
+        storage.save_conversation(old_conversation("old", 100))
+        storage.compact_archive(30)
+        conversation = storage.load_conversation("old")
+        conversation = json.loads(json.dumps(conversation))
+        conversation["conversation"]["analysis"]["urgency_level"] = "ALTO"
+        storage.save_conversation(conversation)
+        summaries = list(storage.iter_conversation_summaries())
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]["urgency_level"], "ALTO")
+    
+    def test_live_and_archived_copy_listed_once(self):
+        """Test de que una conversación activa y archivada a la vez se lista una vez (la activa)."""
+        storage.save_conversation(old_conversation("old", 100))
+        storage.save_conversation(old_conversation("new", 1))
+        archived = old_conversation("old", 100, urgency_level="ALTO")
+        # La copia archivada es más reciente: igual se lista la activa
+        archived["metadata"]["timestamp"] = days_ago(0)
+        storage.get_archive().append_many([archived])
+        summaries = list(storage.iter_conversation_summaries(limit=10))
+        self.assertEqual([s["id"] for s in summaries], ["new", "old"])
+        self.assertEqual(summaries[1]["urgency_level"], "BAJO")
+        self.assertIn("old", storage.get_archive())
+        self.assertEqual(len(storage.get_conversation_history()), 2)
+        self.assertEqual(len(list(storage.iter_all_conversations())), 2)
+
+if __name__ == '__main__':
+    unittest.main()
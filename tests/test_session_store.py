@@ -0,0 +1,109 @@
+"""
+Tests para el almacén de sesiones del chatbot.
+"""
+import unittest
+import sys
+import os
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from session_store import SessionStore, SessionNotFoundError
+
+class FakeClock:
+    """Reloj controlado por el test."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class TestSessionStore(unittest.TestCase):
+    """Pruebas de creación, expiración y capacidad de las sesiones."""
+    
+    def setUp(self):
+        """Crea un almacén pequeño con reloj controlado."""
+        self.clock = FakeClock()
+        self.store = SessionStore(dict, max_sessions=3, ttl_seconds=10, clock=self.clock)
+    
+    def test_sessions_are_isolated(self):
+        """Test de que cada sesión tiene su propio estado."""
+        first, _ = self.store.create()
+        second, _ = self.store.create()
+        self.assertNotEqual(first, second)
+        with self.store.session(first) as state:
+            state["responses"] = "uno"
+        with self.store.session(second) as state:
+            self.assertEqual(state, {})
+        with self.store.session(first) as state:
+            self.assertEqual(state["responses"], "uno")
+        with self.assertRaises(SessionNotFoundError):
+            with self.store.session("no-existe"):
+                pass
+    
+    def test_idle_sessions_expire(self):
+        """Test de expiración por inactividad, renovada con cada acceso."""
+        active, _ = self.store.create()
+        idle, _ = self.store.create()
+        self.clock.now = 8
+        with self.store.session(active):
+            pass
+        self.clock.now = 12
+        with self.store.session(active):
+            pass
+        with self.assertRaises(SessionNotFoundError):
+            with self.store.session(idle):
+                pass
+        self.assertEqual(self.store.stats()["expired"], 1)
+    
+    def test_capacity_evicts_least_recently_used(self):
+        """Test de que al llenarse se descarta la sesión usada hace más tiempo."""
+        ids = [self.store.create()[0] for _ in range(3)]
+        with self.store.session(ids[0]):
+            pass
+        newest, _ = self.store.create()
+        self.assertEqual(len(self.store), 3)
+        with self.assertRaises(SessionNotFoundError):
+            with self.store.session(ids[1]):
+                pass
+        with self.store.session(ids[0]), self.store.session(newest):
+            pass
+        self.assertEqual(self.store.stats()["evicted"], 1)
+    
+    def test_on_evict_receives_expired_and_evicted_states(self):
+        """Test de que on_evict recibe el estado de las sesiones expiradas y desalojadas."""
+        evicted = []
+        store = SessionStore(dict, max_sessions=2, ttl_seconds=10, clock=self.clock, on_evict=evicted.append)
+        first, first_state = store.create()
+        first_state["id"] = "first"
+        second, second_state = store.create()
+        second_state["id"] = "second"
+        store.create()
+        self.assertEqual(evicted, [{"id": "first"}])
+        self.clock.now = 20
+        with self.assertRaises(SessionNotFoundError):
+            with store.session(second):
+                pass
+        self.assertEqual(len(evicted), 3)
+        self.assertIn({"id": "second"}, evicted)
+    
+    def test_session_lock_serializes_requests(self):
+        """Test de que las peticiones de una misma sesión no se intercalan."""
+        session_id, _ = self.store.create()
+        
+        def increment():
+            for _ in range(200):
+                with self.store.session(session_id) as state:
+                    value = state.get("count", 0)
+                    state["count"] = value + 1
+        
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self.store.session(session_id) as state:
+            self.assertEqual(state["count"], 800)
+
+if __name__ == '__main__':
+    unittest.main()
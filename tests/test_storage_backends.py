@@ -0,0 +1,193 @@
+"""
+Tests para los backends de almacenamiento de conversaciones.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from storage import JSONFileBackend, copy_conversations
+import sqlite_storage
+from sqlite_storage import SQLiteBackend
+from helpers import TemporaryStorageMixin, make_conversation
+
+class BackendTestMixin:
+    """Pruebas comunes a todos los backends."""
+    
+    def setUp(self):
+        """Configuración inicial para cada test."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.backend = self.create_backend()
+    
+    def tearDown(self):
+        """Elimina los archivos temporales."""
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_save_and_load(self):
+        """Test de guardado y carga de una conversación."""
+        conversation = make_conversation("abc", "2025-01-01T10:00:00", "Me siento triste", "MEDIO")
+        self.assertEqual(self.backend.save(conversation), "abc")
+        self.assertEqual(self.backend.load("abc"), conversation)
+        self.assertIsNone(self.backend.load("no-existe"))
+    
+    def test_save_overwrites(self):
+        """Test de que guardar de nuevo reemplaza la conversación."""
+        self.backend.save(make_conversation("abc", "2025-01-01T10:00:00", "antes"))
+        self.backend.save(make_conversation("abc", "2025-01-01T10:00:00", "después", "ALTO"))
+        summaries = self.backend.list_summaries()
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]["main_concern"], "después")
+        self.assertEqual(summaries[0]["urgency_level"], "ALTO")
+    
+    def test_list_summaries_sorted(self):
+        """Test de que los resúmenes se ordenan del más reciente al más antiguo."""
+        self.backend.save(make_conversation("a", "2025-01-01T10:00:00"))
+        self.backend.save(make_conversation("b", "2025-01-03T10:00:00"))
+        self.backend.save(make_conversation("c", "2025-01-02T10:00:00"))
+        summaries = self.backend.list_summaries()
+        self.assertEqual([s["id"] for s in summaries], ["b", "c", "a"])
+        self.assertEqual(summaries[0]["urgency_level"], "BAJO")
+
+    def test_iter_summaries_keyset_pagination(self):
+        """Test de paginación por cursor sin repetir ni saltar resúmenes."""
+        for i in range(7):
+            self.backend.save(make_conversation(f"id{i}", f"2025-01-0{i + 1}T10:00:00"))
+        # Dos conversaciones con el mismo timestamp se desempatan por id
+        self.backend.save(make_conversation("id7", "2025-01-07T10:00:00"))
+        
+        seen = []
+        after = None
+        while True:
+            page = list(self.backend.iter_summaries(after=after, limit=3))
+            if not page:
+                break
+            seen.extend(s["id"] for s in page)
+            after = storage.summary_sort_key(page[-1])
+        self.assertEqual(seen, ["id7", "id6", "id5", "id4", "id3", "id2", "id1", "id0"])
+
+    def test_iter_summaries_filters(self):
+        """Test de filtros por urgencia, rango de fechas y texto del motivo."""
+        self.backend.save(make_conversation("a", "2025-01-01T10:00:00", "Ansiedad en el trabajo", "ALTO"))
+        self.backend.save(make_conversation("b", "2025-01-02T10:00:00", "Problemas para dormir", "MEDIO"))
+        self.backend.save(make_conversation("c", "2025-01-03T10:00:00", "Mucha ANSIEDAD", "ALTO"))
+        self.backend.save(make_conversation("d", "2025-01-04T10:00:00", "Tristeza", "BAJO"))
+        
+        def ids(**kwargs):
+            filters = storage.SummaryFilter(**kwargs)
+            return [s["id"] for s in self.backend.iter_summaries(filters=filters)]
+        
+        self.assertEqual(ids(urgency_level="ALTO"), ["c", "a"])
+        self.assertEqual(ids(date_from="2025-01-02", date_to="2025-01-04"), ["c", "b"])
+        self.assertEqual(ids(main_concern="ansiedad"), ["c", "a"])
+        self.assertEqual(ids(main_concern="me"), [])
+        self.assertEqual(ids(main_concern="te", urgency_level="BAJO"), ["d"])
+        self.assertEqual(ids(urgency_level="ALTO", date_from="2025-01-02"), ["c"])
+        
+        # Los filtros se combinan con la paginación por cursor
+        page = list(self.backend.iter_summaries(limit=1, filters=storage.SummaryFilter(urgency_level="ALTO")))
+        after = storage.summary_sort_key(page[0])
+        rest = self.backend.iter_summaries(after=after, filters=storage.SummaryFilter(urgency_level="ALTO"))
+        self.assertEqual([s["id"] for s in rest], ["a"])
+    
+    def test_filters_follow_updates_and_deletes(self):
+        """Test de que los filtros reflejan reescrituras y borrados."""
+        self.backend.save(make_conversation("a", "2025-01-01T10:00:00", "insomnio"))
+        self.backend.save(make_conversation("a", "2025-01-01T10:00:00", "ansiedad"))
+        self.backend.save(make_conversation("b", "2025-01-02T10:00:00", "ansiedad"))
+        filters = storage.SummaryFilter(main_concern="insomnio")
+        self.assertEqual(list(self.backend.iter_summaries(filters=filters)), [])
+        self.backend.delete("b")
+        filters = storage.SummaryFilter(main_concern="ansiedad")
+        self.assertEqual([s["id"] for s in self.backend.iter_summaries(filters=filters)], ["a"])
+
+class TestJSONFileBackend(BackendTestMixin, unittest.TestCase):
+    """Pruebas del backend de archivos JSON."""
+    
+    def create_backend(self):
+        return JSONFileBackend(self.tmpdir)
+
+class TestShardedJSONFileBackend(BackendTestMixin, unittest.TestCase):
+    """Pruebas del backend de archivos JSON con subdirectorios por prefijo."""
+    
+    def create_backend(self):
+        return JSONFileBackend(self.tmpdir, layout='sharded')
+    
+    def test_sharded_path(self):
+        """Test de que el prefijo del ID decide el subdirectorio."""
+        self.backend.save(make_conversation("abcdef", "2025-01-01T10:00:00"))
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, "ab", "cd", "abcdef.json")))
+    
+    def test_migration_from_flat_layout(self):
+        """Test de migración de archivos planos sin perder visibilidad."""
+        flat = JSONFileBackend(self.tmpdir, layout='flat')
+        flat.save(make_conversation("aaaa1", "2025-01-01T10:00:00", "viejo"))
+        flat.save(make_conversation("bbbb2", "2025-01-02T10:00:00", "otro"))
+        # Antes de migrar, el backend particionado encuentra los archivos planos
+        self.assertEqual(self.backend.load("aaaa1")["conversation"]["responses"]["main_concern"], "viejo")
+        # Un worker reescribe una conversación antes de la migración
+        self.backend.save(make_conversation("bbbb2", "2025-01-02T10:00:00", "nuevo"))
+        
+        self.assertEqual(self.backend.migrate_to_sharded(), 1)
+        self.assertEqual([p for p in os.listdir(self.tmpdir) if p.endswith('.json')], [])
+        self.assertEqual(self.backend.load("bbbb2")["conversation"]["responses"]["main_concern"], "nuevo")
+        self.assertEqual(len(self.backend.list_summaries()), 2)
+
+class TestSQLiteBackend(BackendTestMixin, unittest.TestCase):
+    """Pruebas del backend SQLite."""
+    
+    def create_backend(self):
+        return SQLiteBackend(os.path.join(self.tmpdir, "conversations.db"))
+    
+    def test_copy_from_json(self):
+        """Test de migración desde el backend de archivos JSON."""
+        source = JSONFileBackend(os.path.join(self.tmpdir, "json"))
+        source.save(make_conversation("a", "2025-01-01T10:00:00", "uno"))
+        source.save(make_conversation("b", "2025-01-02T10:00:00", "dos"))
+        self.assertEqual(copy_conversations(source, self.backend), 2)
+        self.assertEqual(self.backend.load("a")["conversation"]["responses"]["main_concern"], "uno")
+    
+    def test_text_filter_uses_trigram_index(self):
+        """Test de búsqueda por texto cuando el recorrido por fecha no llena la página."""
+        self.backend.save(make_conversation("a", "2025-01-01T10:00:00", "Ataques de PÁNICO"))
+        self.backend.save(make_conversation("b", "2025-01-02T10:00:00", "insomnio"))
+        self.backend.save(make_conversation("c", "2025-01-03T10:00:00", "duelo"))
+        with mock.patch.object(sqlite_storage, 'TEXT_SCAN_BUDGET', 1):
+            summaries = self.backend.iter_summaries(limit=10, filters=storage.SummaryFilter(main_concern="pánico"))
+            self.assertEqual([s["id"] for s in summaries], ["a"])
+            summaries = self.backend.iter_summaries(limit=10, filters=storage.SummaryFilter(main_concern="io"))
+            self.assertEqual([s["id"] for s in summaries], ["b"])
+    
+    def test_text_index_built_for_existing_database(self):
+        """Test de que el índice de texto se crea al abrir una base anterior."""
+        self.backend.save(make_conversation("a", "2025-01-01T10:00:00", "ansiedad"))
+        conn = self.backend._connection()
+        conn.execute("DROP TABLE summary_fts")
+        conn.commit()
+        reopened = SQLiteBackend(os.path.join(self.tmpdir, "conversations.db"))
+        filters = storage.SummaryFilter(main_concern="siedad")
+        self.assertEqual([s["id"] for s in reopened.iter_summaries(filters=filters)], ["a"])
+
+class TestStorageFacade(TemporaryStorageMixin, unittest.TestCase):
+    """Pruebas de las funciones del módulo storage sobre el backend activo."""
+    
+    def test_facade_delegates_to_backend(self):
+        """Test de que las funciones del módulo usan el backend configurado."""
+        storage.save_conversation(make_conversation("x", "2025-01-01T10:00:00", "hola"))
+        self.assertEqual(storage.load_conversation("x")["metadata"]["conversation_id"], "x")
+        self.assertEqual(len(storage.get_conversation_history()), 1)
+        self.assertEqual(storage.get_conversation_summaries()[0]["main_concern"], "hola")
+
+    def test_cursor_round_trip(self):
+        """Test de codificación y decodificación de cursores."""
+        summary = {"id": "x", "timestamp": "2025-01-01T10:00:00"}
+        self.assertEqual(storage.decode_cursor(storage.encode_cursor(summary)),
+                         ("2025-01-01T10:00:00", "x"))
+        with self.assertRaises(ValueError):
+            storage.decode_cursor("no-es-un-cursor")
+
+if __name__ == '__main__':
+    unittest.main()
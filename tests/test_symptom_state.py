@@ -0,0 +1,87 @@
+"""
+Tests para el estado incremental de síntomas, riesgo y urgencia.
+"""
+import unittest
+import sys
+import os
+import random
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from symptom_state import SymptomState
+from prompts import SYMPTOM_KEYWORDS, SYMPTOM_WEIGHTS, REQUIRED_TOPICS, calculate_urgency_level
+from chatbot import ChatBot
+from test_keyword_matcher import legacy_extract_symptoms
+
+class TestSymptomState(unittest.TestCase):
+    """Pruebas del estado acumulado respuesta a respuesta."""
+    
+    def test_matches_full_extraction(self):
+        """Test de equivalencia con extraer todo al final sobre respuestas aleatorias."""
+        rng = random.Random(14)
+        words = list(SYMPTOM_KEYWORDS) + ["semana", "trabajo", "sí", "mal", "familia", "nada", "bien"]
+        for _ in range(300):
+            keys = rng.sample(REQUIRED_TOPICS, rng.randint(0, len(REQUIRED_TOPICS)))
+            responses = {key: " ".join(rng.choice(words) for _ in range(rng.randint(0, 4))) for key in keys}
+            state = SymptomState()
+            for key, response in responses.items():
+                state.add_response(key, response)
+            symptoms = legacy_extract_symptoms(responses)
+            self.assertEqual(state.symptoms, symptoms, responses)
+            self.assertEqual(state.urgency_level, calculate_urgency_level(symptoms, SYMPTOM_WEIGHTS), responses)
+    
+    def test_risk_and_protective_support(self):
+        """Test de señales de riesgo y red de apoyo."""
+        state = SymptomState.from_responses({"main_concern": "Estoy en crisis"})
+        self.assertTrue(state.risk)
+        self.assertFalse(state.protective_support)
+        state.add_response("support", "Sí, mis amigos")
+        self.assertTrue(state.protective_support)
+        self.assertNotIn("lack_of_support", state.symptoms)
+
+class TestChatBotLiveUrgency(unittest.TestCase):
+    """Pruebas de la urgencia disponible en cada turno."""
+    
+    def test_urgency_updates_each_turn(self):
+        """Test de que cada pregunta informa la urgencia acumulada."""
+        chatbot = ChatBot()
+        chatbot.start_conversation()
+        response = chatbot.process_message("Me siento bien")
+        self.assertEqual(response["urgency_level"], "BAJO")
+        response = chatbot.process_message("A veces pienso en morir")
+        self.assertEqual(response["urgency_level"], "ALTO")
+        self.assertEqual(chatbot.urgency_level, "ALTO")
+    
+    def test_replaced_response_is_recomputed(self):
+        """Test de que reemplazar una respuesta recalcula el estado."""
+        chatbot = ChatBot()
+        chatbot.start_conversation()
+        chatbot._set_response("main_concern", "Pienso en morir")
+        self.assertEqual(chatbot.urgency_level, "ALTO")
+        chatbot._set_response("main_concern", "Estoy bien")
+        self.assertEqual(chatbot.urgency_level, "BAJO")
+    
+    def test_analysis_reads_incremental_state(self):
+        """Test de que el análisis final coincide con la extracción completa."""
+        chatbot = ChatBot()
+        chatbot.start_conversation()
+        for message in ["Me siento triste y sola", "Hace dos semanas", "No puedo trabajar",
+                        "Sí, cambio mucho", "Duermo mal", "No tengo a nadie"]:
+            chatbot.process_message(message)
+        analysis = chatbot._analyze_responses()
+        symptoms = legacy_extract_symptoms(chatbot.responses)
+        self.assertEqual(analysis["urgency_level"], calculate_urgency_level(symptoms, SYMPTOM_WEIGHTS))
+    
+    def test_outside_edit_with_same_count_is_recomputed(self):
+        """Test de que editar self.responses por fuera, sin cambiar la cantidad, recalcula el estado."""
+        chatbot = ChatBot()
+        chatbot.start_conversation()
+        chatbot._set_response("main_concern", "Pienso en morir")
+        self.assertEqual(chatbot.urgency_level, "ALTO")
+        chatbot.responses["main_concern"] = "Estoy bien"
+        self.assertEqual(chatbot.urgency_level, "BAJO")
+        chatbot.responses = {"main_concern": "Pienso en morir"}
+        chatbot._set_response("sleep", "Duermo bien")
+        self.assertEqual(chatbot.urgency_level, "ALTO")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests para las estadísticas de triage mantenidas de forma incremental.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+import triage_stats
+from triage_stats import TriageStats
+from helpers import TemporaryStorageMixin, make_conversation
+
+PANIC = {"main_concern": "Tengo ataques de pánico y mucho miedo"}
+SAD = {"main_concern": "Me siento triste", "duration": "Hace meses"}
+
+class TestTriageStats(unittest.TestCase):
+    """Pruebas de los contadores agregados."""
+    
+    def setUp(self):
+        """Crea una base de estadísticas temporal."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.stats = TriageStats(os.path.join(self.tmpdir, "stats.db"))
+    
+    def tearDown(self):
+        """Elimina los archivos temporales."""
+        self.stats.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_record_counts_urgency_symptoms_and_diagnoses(self):
+        """Test de los contadores que aporta cada conversación."""
+        self.stats.record([
+            make_conversation("a", "2025-01-01T10:00:00", responses=PANIC, urgency_level="MEDIO"),
+            make_conversation("b", "2025-01-02T10:00:00", responses=SAD)
+        ])
+        totals = self.stats.query()["totals"]
+        self.assertEqual(totals["conversations"], 2)
+        self.assertEqual(totals["analyzed"], 1)
+        self.assertEqual(totals["urgency"], {"MEDIO": 1})
+        self.assertEqual(totals["symptoms"]["panic_attacks"], 1)
+        self.assertEqual(totals["symptoms"]["depressed_mood"], 1)
+        self.assertEqual(totals["diagnoses"], {"Trastorno de Pánico": 1})
+        self.assertEqual(totals["diagnosis_hit_rates"]["Trastorno de Pánico"], 0.5)
+    
+    def test_resave_replaces_previous_contribution(self):
+        """Test de que volver a guardar una conversación no la cuenta dos veces."""
+        self.stats.record([make_conversation("a", "2025-01-01T10:00:00", responses=SAD)])
+        self.stats.record([make_conversation("a", "2025-01-01T10:00:00", responses=PANIC, urgency_level="ALTO")])
+        self.stats.record([
+            make_conversation("b", "2025-01-03T10:00:00", responses=SAD, urgency_level="BAJO"),
+            make_conversation("b", "2025-01-03T10:00:00", responses=SAD, urgency_level="MEDIO")
+        ])
+        totals = self.stats.query()["totals"]
+        self.assertEqual(totals["conversations"], 2)
+        self.assertEqual(totals["urgency"], {"ALTO": 1, "MEDIO": 1})
+        self.assertEqual(totals["symptoms"]["depressed_mood"], 1)
+    
+    def test_buckets_and_date_range(self):
+        """Test de la serie por bucket y del filtro por fechas."""
+        self.stats.record([
+            make_conversation("a", "2025-01-01T10:00:00", responses=SAD),
+            make_conversation("b", "2025-01-01T12:00:00", responses=SAD),
+            make_conversation("c", "2025-02-10T10:00:00", responses=PANIC)
+        ])
+        daily = self.stats.query()["buckets"]
+        self.assertEqual([(b["bucket"], b["conversations"]) for b in daily],
+                         [("2025-01-01", 2), ("2025-02-10", 1)])
+        monthly = self.stats.query(date_from="2025-02-01", granularity="month")
+        self.assertEqual([(b["bucket"], b["conversations"]) for b in monthly["buckets"]], [("2025-02", 1)])
+        with self.assertRaises(ValueError):
+            self.stats.query(granularity="hour")
+    
+    def test_rebuild_matches_incremental(self):
+        """Test de que la reconstrucción coincide con los contadores incrementales."""
+        conversations = [
+            make_conversation("a", "2025-01-01T10:00:00", responses=SAD, urgency_level="BAJO"),
+            make_conversation("b", "2025-01-02T10:00:00", responses=PANIC, urgency_level="ALTO")
+        ]
+        self.stats.record(conversations[:1])
+        self.stats.record(conversations[1:])
+        incremental = self.stats.query()
+        self.assertEqual(self.stats.rebuild(conversations), 2)
+        self.assertEqual(self.stats.query(), incremental)
+
+class TestStatsListener(TemporaryStorageMixin, unittest.TestCase):
+    """Pruebas de la actualización en cada save_conversation."""
+    
+    def setUp(self):
+        """Configura backend y estadísticas temporales."""
+        super().setUp()
+        self.previous_stats = triage_stats._stats
+        triage_stats.set_stats(TriageStats(os.path.join(self.tmpdir, "stats.db")))
+        storage.add_save_listener(triage_stats.record_saved)
+    
+    def tearDown(self):
+        """Restaura el estado global."""
+        storage.remove_save_listener(triage_stats.record_saved)
+        triage_stats.set_stats(self.previous_stats)
+        super().tearDown()
+    
+    def test_save_conversation_updates_stats(self):
+        """Test de que guardar actualiza los contadores y la reconstrucción coincide."""
+        storage.save_conversation(make_conversation("a", "2025-01-01T10:00:00", responses=PANIC, urgency_level="ALTO"))
+        storage.save_conversation(make_conversation("b", "2025-01-02T10:00:00", responses=SAD, urgency_level="BAJO"))
+        stats = triage_stats.get_stats().query()
+        self.assertEqual(stats["totals"]["urgency"], {"ALTO": 1, "BAJO": 1})
+        self.assertEqual(triage_stats.rebuild_from_storage(), 2)
+        self.assertEqual(triage_stats.get_stats().query(), stats)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests para el log de turnos de conversaciones en curso.
+"""
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from chatbot import ChatBot
+from storage import JSONFileBackend
+from turn_log import TurnLog
+
+class TestTurnLog(unittest.TestCase):
+    """Pruebas del log de turnos y de los checkpoints del chatbot."""
+    
+    def setUp(self):
+        """Configura almacenamiento temporal."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.previous_backend = storage._backend
+        self.previous_turn_log = storage._turn_log
+        self.turn_log = TurnLog(os.path.join(self.tmpdir, "turns"))
+        storage.set_backend(JSONFileBackend(os.path.join(self.tmpdir, "conversations")))
+        storage.set_turn_log(self.turn_log)
+    
+    def tearDown(self):
+        """Restaura la configuración original."""
+        storage.set_backend(self.previous_backend)
+        storage.set_turn_log(self.previous_turn_log)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+    
+    def test_truncated_last_record_is_ignored(self):
+        """Test de que una escritura interrumpida solo pierde el último turno."""
+        self.turn_log.append("abc", [
+            {"type": "meta", "conversation_id": "abc", "timestamp": "2025-01-01T10:00:00"},
+            {"type": "response", "key": "main_concern", "value": "hola"}
+        ])
+        with open(os.path.join(self.turn_log.directory, "abc.jsonl"), 'a', encoding='utf-8') as f:
+            f.write('{"type": "response", "key": "dura')
+        document = self.turn_log.materialize("abc")
+        self.assertEqual(document["conversation"]["responses"], {"main_concern": "hola"})
+        self.assertEqual(document["metadata"]["timestamp"], "2025-01-01T10:00:00")
+    
+    def test_checkpoint_appends_only_new_records(self):
+        """Test de que cada checkpoint escribe solo lo nuevo y la lectura lo reconstruye."""
+        bot = ChatBot()
+        bot.start_conversation()
+        self.assertTrue(bot.checkpoint())
+        bot.process_message("Me siento muy triste")
+        bot.checkpoint()
+        first_size = len(self.turn_log.read(bot.conversation_id))
+        bot.process_message("Hace dos semanas")
+        bot.checkpoint()
+        records = self.turn_log.read(bot.conversation_id)
+        # Un turno de usuario, una pregunta y una respuesta nueva
+        self.assertEqual(len(records) - first_size, 3)
+        
+        document = storage.load_conversation(bot.conversation_id)
+        self.assertEqual(document["conversation"]["responses"], bot.responses)
+        self.assertEqual(len(document["conversation"]["chat_history"]), len(bot.chat_history))
+    
+    def test_finalize_replaces_log_with_document(self):
+        """Test de que al finalizar queda el documento completo y se borra el log."""
+        bot = ChatBot()
+        bot.start_conversation()
+        for message in ["Me siento mal", "Hace un mes", "No puedo trabajar", "Sí", "Duermo mal",
+                        "Tengo familia", "No", "No", "No", "Camino"]:
+            result = bot.process_message(message)
+            bot.checkpoint()
+        self.assertIn("analysis", result)
+        storage.finalize_conversation(bot.to_document())
+        self.assertIsNone(self.turn_log.read(bot.conversation_id))
+        document = storage.load_conversation(bot.conversation_id)
+        self.assertEqual(document["conversation"]["analysis"]["urgency_level"], result["analysis"]["urgency_level"])
+    
+    def test_sweep_removes_only_stale_logs(self):
+        """Test de que el barrido elimina solo los logs sin escrituras recientes."""
+        self.turn_log.append("viejo", [{"type": "meta", "conversation_id": "viejo"}])
+        self.turn_log.append("nuevo", [{"type": "meta", "conversation_id": "nuevo"}])
+        old = os.path.join(self.turn_log.directory, "viejo.jsonl")
+        os.utime(old, (0, 0))
+        self.assertEqual(storage.sweep_turn_logs(3600), 1)
+        self.assertEqual(list(self.turn_log.iter_ids()), ["nuevo"])
+
+if __name__ == '__main__':
+    unittest.main()
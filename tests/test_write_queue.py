@@ -0,0 +1,154 @@
+"""
+Tests para la escritura diferida de conversaciones.
+"""
+import unittest
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from storage import JSONFileBackend
+from write_queue import PersistenceQueue
+from helpers import TemporaryStorageMixin, make_conversation
+
+class TestPersistenceQueue(unittest.TestCase):
+    """Pruebas de la cola de escritura."""
+    
+    def test_group_commit_batches_and_coalesces(self):
+        """Test de que varias escrituras se agrupan y solo se escribe la última versión."""
+        batches = []
+        entered = threading.Event()
+        release = threading.Event()
+        
+        def write_batch(batch):
+            entered.set()
+            release.wait(5)
+            batches.append([c["conversation"]["responses"]["main_concern"] for c in batch])
+        
+        write_queue = PersistenceQueue(write_batch, max_batch=100)
+        first = write_queue.submit(make_conversation("a", main_concern="v0"))
+        self.assertTrue(entered.wait(5))
+        # Mientras el primer lote está bloqueado se acumulan más escrituras
+        futures = [write_queue.submit(make_conversation("a" if i % 2 else "b", main_concern=f"v{i}")) for i in range(1, 6)]
+        self.assertEqual(write_queue.get_pending("a")["conversation"]["responses"]["main_concern"], "v5")
+        release.set()
+        self.assertTrue(write_queue.flush(5))
+        for future in [first] + futures:
+            self.assertIn(future.result(5), ("a", "b"))
+        self.assertEqual(batches[0], ["v0"])
+        self.assertEqual(sorted(batches[1]), ["v4", "v5"])
+        stats = write_queue.stats()
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["written"], 3)
+        write_queue.stop(5)
+    
+    def test_failed_batch_propagates_error(self):
+        """Test de que un error de escritura llega al llamador que espera."""
+        def write_batch(batch):
+            raise OSError("disco lleno")
+        
+        write_queue = PersistenceQueue(write_batch)
+        future = write_queue.submit(make_conversation("a"))
+        with self.assertRaises(OSError):
+            future.result(5)
+        self.assertEqual(write_queue.stats()["failed"], 1)
+        self.assertEqual(write_queue.stats()["last_error"], "disco lleno")
+        write_queue.stop(5)
+    
+    def test_failed_batch_is_retried(self):
+        """Test de que un lote fallido sigue legible y se reintenta sin otra escritura."""
+        written = []
+        attempts = []
+        
+        def write_batch(batch):
+            attempts.append(len(batch))
+            if len(attempts) == 1:
+                raise OSError("disco lleno")
+            written.extend(c["metadata"]["conversation_id"] for c in batch)
+        
+        write_queue = PersistenceQueue(write_batch, retry_interval=0.01)
+        with self.assertRaises(OSError):
+            write_queue.submit(make_conversation("a", main_concern="hola")).result(5)
+        self.assertEqual(write_queue.get_pending("a")["conversation"]["responses"]["main_concern"], "hola")
+        write_queue.flush(5)
+        for _ in range(500):
+            if written:
+                break
+            time.sleep(0.01)
+        self.assertEqual(written, ["a"])
+        self.assertIsNone(write_queue.get_pending("a"))
+        stats = write_queue.stats()
+        self.assertEqual((stats["retrying"], stats["last_error"]), (0, None))
+        write_queue.stop(5)
+    
+    def test_flush_does_not_report_failed_writes(self):
+        """Test de que flush no da por durable un lote fallido hasta que el reintento lo escribe."""
+        healthy = threading.Event()
+        
+        def write_batch(batch):
+            if not healthy.is_set():
+                raise OSError("disco lleno")
+        
+        write_queue = PersistenceQueue(write_batch, retry_interval=0.01)
+        write_queue.submit(make_conversation("a"))
+        self.assertFalse(write_queue.flush(5))
+        self.assertEqual(write_queue.stats()["retrying"], 1)
+        healthy.set()
+        for _ in range(500):
+            if write_queue.flush(5):
+                break
+            time.sleep(0.01)
+        self.assertTrue(write_queue.flush(0))
+        self.assertEqual(write_queue.stats()["retrying"], 0)
+        write_queue.stop(5)
+    
+    def test_submit_snapshots_conversation(self):
+        """Test de que modificar el diccionario después de encolarlo no cambia lo escrito."""
+        written = []
+        release = threading.Event()
+        
+        def write_batch(batch):
+            release.wait(5)
+            written.extend(c["conversation"]["responses"]["main_concern"] for c in batch)
+        
+        write_queue = PersistenceQueue(write_batch)
+        conversation = make_conversation("a", main_concern="antes")
+        future = write_queue.submit(conversation)
+        conversation["conversation"]["responses"]["main_concern"] = "después"
+        release.set()
+        future.result(5)
+        self.assertEqual(written, ["antes"])
+        write_queue.stop(5)
+
+class TestWriteBehindStorage(TemporaryStorageMixin, unittest.TestCase):
+    """Pruebas de save_conversation con escritura diferida."""
+    
+    def setUp(self):
+        """Configura un backend temporal con escritura diferida."""
+        super().setUp()
+        storage.enable_write_behind()
+    
+    def create_backend(self):
+        return JSONFileBackend(os.path.join(self.tmpdir, "conversations"))
+    
+    def tearDown(self):
+        """Restaura la configuración original."""
+        storage.disable_write_behind(5)
+        super().tearDown()
+    
+    def test_read_your_writes_and_durability(self):
+        """Test de lectura de escrituras pendientes y espera de durabilidad."""
+        storage.save_conversation(make_conversation("abc", main_concern="hola"))
+        self.assertEqual(storage.load_conversation("abc")["conversation"]["responses"]["main_concern"], "hola")
+        self.assertTrue(storage.flush_writes(5))
+        self.assertTrue(os.path.exists(os.path.join(self.backend.directory, "abc.json")))
+        
+        storage.save_conversation(make_conversation("def", main_concern="chau"), wait=True)
+        self.assertEqual(JSONFileBackend(self.backend.directory).load("def")["conversation"]["responses"]["main_concern"], "chau")
+        # No quedan archivos temporales tras el renombrado atómico
+        self.assertEqual(sorted(os.listdir(self.backend.directory)), ["abc.json", "def.json"])
+
+if __name__ == '__main__':
+    unittest.main()